@@ -0,0 +1,81 @@
+"""Memory used by a catalogue of ``DefectChargeState`` objects, compared with
+the same objects stored with a per-instance ``__dict__``.
+
+Run from the root of the repository (so that ``py_sc_fermi`` is importable
+without installing it) with
+
+    python -m benchmarks.charge_state_memory [--n 1000000]
+"""
+
+import argparse
+import tracemalloc
+from typing import Callable, List
+from py_sc_fermi.defect_charge_state import DefectChargeState
+from py_sc_fermi.defect_species import DefectSpecies
+
+
+class DictDefectChargeState(object):
+    """``DefectChargeState`` with the same attributes, held in a per-instance
+    ``__dict__`` rather than ``__slots__``, so that only the ``__slots__`` are
+    compared"""
+
+    def __init__(self, charge, degeneracy=1, energy=None, element_changes=None):
+        self._charge = charge
+        self._degeneracy = degeneracy
+        self._energy = energy
+        self._fixed_concentration = None
+        self._element_changes = dict(element_changes) if element_changes else None
+        self._reference_energy = energy
+        self._version = 0
+
+
+class DictDefectSpecies(object):
+    """``DefectSpecies`` with a per-instance ``__dict__``"""
+
+    def __init__(self, name, nsites, charge_states):
+        self._name = name
+        self._nsites = nsites
+        self._charge_states = charge_states
+        self._fixed_concentration = None
+        self._partition = None
+
+
+def build_catalogue(n: int, charge_state: Callable, species: Callable) -> List:
+    """``n`` charge states, three to a defect species, as built by a
+    high-throughput screening before any filtering"""
+    catalogue = []
+    for i in range(0, n, 3):
+        charge_states = {
+            q: charge_state(q, degeneracy=1 + q % 2, energy=0.1 * (i % 50) + q)
+            for q in range(min(3, n - i))
+        }
+        catalogue.append(species(f"defect_{i // 3}", 1, charge_states))
+    return catalogue
+
+
+def measure(n: int, charge_state: Callable, species: Callable) -> int:
+    """bytes allocated by a catalogue of ``n`` charge states"""
+    tracemalloc.start()
+    catalogue = build_catalogue(n, charge_state, species)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del catalogue
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--n", type=int, default=1_000_000, help="number of charge states"
+    )
+    args = parser.parse_args()
+    dict_size = measure(args.n, DictDefectChargeState, DictDefectSpecies)
+    slots_size = measure(args.n, DefectChargeState, DefectSpecies)
+    print(f"{args.n} charge states")
+    print(f"  with __dict__:   {dict_size / 2 ** 20:8.1f} MiB")
+    print(f"  with __slots__:  {slots_size / 2 ** 20:8.1f} MiB")
+    print(f"  reduction:       {1 - slots_size / dict_size:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
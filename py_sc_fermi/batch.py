@@ -0,0 +1,517 @@
+import os
+import sys
+import numpy as np
+from copy import copy
+from multiprocessing import Pool, shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+from py_sc_fermi.dos import DOS
+from py_sc_fermi.defect_system import DefectSystem
+from py_sc_fermi.compiled_defect_system import CompiledDefectSystem
+from py_sc_fermi.results import SCFermiSolution
+from py_sc_fermi.defect_charge_state import kboltz
+from py_sc_fermi.solvers import RootResult, vectorised_illinois
+
+OVERRIDES = ("temperature", "chemical_potentials", "fixed_concentrations")
+
+# state of each worker process, set once by ``_init_worker``
+_worker: Dict[str, Any] = {}
+
+
+class SharedDOS(object):
+    """The energies and normalised density-of-states of a ``DOS``, placed once
+    in a block of ``multiprocessing.shared_memory`` so that worker processes
+    can rebuild the ``DOS`` without the arrays being pickled or copied.
+
+    Only the name and size of the shared memory block are pickled when a
+    ``SharedDOS`` is sent to another process. The block is released by
+    :meth:`close` (or on leaving a ``with`` block) in the process that
+    created it.
+
+    Args:
+        dos (DOS): ``DOS`` to share
+    """
+
+    def __init__(self, dos: DOS):
+        self.size = len(dos.edos)
+        self.bandgap = dos.bandgap
+        self.nelect = dos.nelect
+        self.spin_polarised = dos.spin_polarised
+        self.quadrature = dos.quadrature
+        shm = shared_memory.SharedMemory(create=True, size=2 * self.size * 8)
+        self._shm: Optional[shared_memory.SharedMemory] = shm
+        self.name = shm.name
+        edos, dos_data = self._arrays(shm)
+        edos[:] = dos.edos
+        dos_data[:] = dos.dos
+        self._owner = True
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shm"] = None
+        state["_owner"] = False
+        return state
+
+    def _arrays(
+        self, shm: shared_memory.SharedMemory
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """views of the energies and density-of-states in shared memory"""
+        buffer = np.ndarray((2, self.size), dtype=float, buffer=shm.buf)
+        return buffer[0], buffer[1]
+
+    def attach(self) -> DOS:
+        """build a ``DOS`` whose arrays are views of the shared memory block.
+        The ``DOS`` keeps this ``SharedDOS`` alive, and :meth:`close` must not
+        be called while the ``DOS`` is in use.
+
+        Returns:
+            DOS: ``DOS`` backed by shared memory
+        """
+        shm = self._shm
+        if shm is None:
+            if sys.version_info >= (3, 13):
+                shm = shared_memory.SharedMemory(name=self.name, track=False)
+            else:
+                shm = shared_memory.SharedMemory(name=self.name)
+            self._shm = shm
+        edos, dos = self._arrays(shm)
+        attached = DOS._from_normalised(
+            dos=dos,
+            edos=edos,
+            bandgap=self.bandgap,
+            nelect=self.nelect,
+            spin_polarised=self.spin_polarised,
+            quadrature=self.quadrature,
+        )
+        # the arrays do not keep the memory mapped by themselves
+        attached._owner = self
+        return attached
+
+    def close(self) -> None:
+        """release the shared memory block, and free it if this is the
+        ``SharedDOS`` that created it"""
+        if self._shm is not None:
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self) -> "SharedDOS":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def solve_batch(
+    defect_system: DefectSystem,
+    overrides: List[Dict[str, Any]],
+    processes: Optional[int] = None,
+    chunksize: Optional[int] = None,
+) -> List[SCFermiSolution]:
+    """Solve a ``DefectSystem`` for its self-consistent Fermi energy once for
+    each of a list of parameter overrides, in parallel over a pool of worker
+    processes.
+
+    The ``DefectSystem`` is compiled once and sent to each worker once,
+    and the ``DOS`` arrays are placed in shared memory rather than pickled,
+    so each task only carries its overrides. Each override is a dictionary
+    with any of the keys:
+
+    - ``"temperature"``: temperature (K). Defaults to
+      ``defect_system.temperature``.
+    - ``"chemical_potentials"``: ``{element: chemical potential}``, used to
+      evaluate the formation energies of ``DefectChargeState`` objects with a
+      reference energy (see ``DefectChargeState.formation_energy_at``).
+      Defaults to the current formation energies.
+    - ``"fixed_concentrations"``: ``{species name: concentration per unit
+      cell}`` of ``DefectSpecies`` whose total concentration is fixed (or,
+      if ``None``, freed) in this solve, e.g. a dopant concentration.
+
+    ``defect_system`` itself is not changed.
+
+    Args:
+        defect_system (DefectSystem): ``DefectSystem`` to solve
+        overrides (List[Dict[str, Any]]): parameters of each solve
+        processes (Optional[int], optional): number of worker processes.
+          Defaults to ``os.cpu_count()``. If 1, the solves are run in this
+          process.
+        chunksize (Optional[int], optional): number of solves sent to a
+          worker at a time. Defaults to a quarter of the solves per worker.
+
+    Raises:
+        ValueError: if an override has an unrecognised key or
+          ``DefectSpecies`` name
+        RuntimeError: if no solution is found for any of the overrides
+
+    Returns:
+        List[SCFermiSolution]: solution for each override, in the order given
+    """
+    overrides = list(overrides)
+    kernel = defect_system.compile()
+    for override in overrides:
+        _check_override(kernel, override)
+    settings = dict(
+        temperature=defect_system.temperature,
+        convergence_tolerance=defect_system.convergence_tolerance,
+        n_trial_steps=defect_system.n_trial_steps,
+        solver=defect_system.solver,
+        log_space=defect_system.log_space,
+        carrier_table_tolerance=defect_system.carrier_table_tolerance,
+    )
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(overrides)))
+    if processes == 1:
+        system = _solving_system(defect_system.dos, kernel.volume, settings)
+        return [_solve(system, kernel, override) for override in overrides]
+    if chunksize is None:
+        chunksize = max(1, len(overrides) // (4 * processes))
+    if not isinstance(defect_system.dos, DOS):
+        # e.g. a ``ParabolicBandDOS``, which has no arrays worth sharing
+        with Pool(
+            processes, initializer=_init_worker, initargs=(None, kernel, settings)
+        ) as pool:
+            return pool.map(_solve_in_worker, overrides, chunksize=chunksize)
+    # the DOS reaches the workers through shared memory, not with the kernel
+    kernel = copy(kernel)
+    del kernel.dos
+    with SharedDOS(defect_system.dos) as shared_dos:
+        with Pool(
+            processes, initializer=_init_worker, initargs=(shared_dos, kernel, settings)
+        ) as pool:
+            return pool.map(_solve_in_worker, overrides, chunksize=chunksize)
+
+
+def _check_override(kernel: CompiledDefectSystem, override: Dict[str, Any]) -> None:
+    """raise a ``ValueError`` for an override that cannot be applied"""
+    unknown = set(override) - set(OVERRIDES)
+    if unknown:
+        raise ValueError(f"Unrecognised overrides {sorted(unknown)}, use {OVERRIDES}")
+    for name in override.get("fixed_concentrations", {}):
+        if name not in kernel.species_names:
+            raise ValueError(f"{name} is not one of {kernel.species_names}")
+
+
+def _apply_override(
+    kernel: CompiledDefectSystem, override: Dict[str, Any], temperature: float
+) -> Tuple[CompiledDefectSystem, float]:
+    """the ``CompiledDefectSystem`` and temperature for one override"""
+    if "fixed_concentrations" in override:
+        kernel = kernel.with_fixed_concentrations(override["fixed_concentrations"])
+    if "chemical_potentials" in override:
+        chemical_potentials = override["chemical_potentials"]
+        kernel = kernel.at_chemical_potentials(
+            [chemical_potentials.get(el, 0.0) for el in kernel.elements]
+        )
+    return kernel, override.get("temperature", temperature)
+
+
+def _solving_system(dos: Any, volume: float, settings: Dict[str, Any]) -> DefectSystem:
+    """a ``DefectSystem`` with no defects, used only for its solver settings"""
+    return DefectSystem(defect_species=[], dos=dos, volume=volume, **settings)
+
+
+def _solve(
+    system: DefectSystem, kernel: CompiledDefectSystem, override: Dict[str, Any]
+) -> SCFermiSolution:
+    kernel, temperature = _apply_override(kernel, override, system.temperature)
+    result = system._solve_kernel(kernel, temperature)
+    return SCFermiSolution.from_compiled(kernel, result, temperature)
+
+
+def _init_worker(
+    shared_dos: Optional[SharedDOS],
+    kernel: CompiledDefectSystem,
+    settings: Dict[str, Any],
+) -> None:
+    if shared_dos is not None:
+        kernel.dos = shared_dos.attach()
+    dos = kernel.dos
+    _worker["shared_dos"] = shared_dos
+    _worker["kernel"] = kernel
+    _worker["system"] = _solving_system(dos, kernel.volume, settings)
+
+
+def _solve_in_worker(override: Dict[str, Any]) -> SCFermiSolution:
+    return _solve(_worker["system"], _worker["kernel"], override)
+
+
+class DefectSystemBatch(object):
+    """Many independent ``DefectSystem`` objects, which may each have their
+    own ``DOS``, volume, temperature and defects, packed into flat arrays so
+    that they are all solved for their self-consistent Fermi energies at once
+    by a single vectorised bracketed root search (see :meth:`solve`), rather
+    than by one Python-level solve per system.
+
+    The charge states of all the systems are concatenated, with the index of
+    the system each belongs to, and the net defect charge of every system is
+    summed with ``np.bincount``. The valence and conduction band energies and
+    quadrature weights of each distinct ``DOS`` are concatenated in the same
+    way, with offsets, so the carrier concentrations of every system are also
+    evaluated together. Any other density-of-states (e.g. a
+    ``ParabolicBandDOS``, or a ``DOS`` with the ``"linear"`` quadrature rule)
+    is evaluated once per step for all the systems that share it.
+
+    Each system is solved for the root of its net charge, to its own
+    ``convergence_tolerance``, between its own ``dos.emin()`` and
+    ``dos.emax()``; the ``solver``, ``log_space`` and
+    ``carrier_table_tolerance`` settings of the systems are not used. The
+    systems are compiled when the batch is built, so later changes to them
+    are not reflected in it.
+
+    Args:
+        defect_systems (List[DefectSystem]): systems to solve
+    """
+
+    def __init__(self, defect_systems: List[DefectSystem]):
+        self.defect_systems = list(defect_systems)
+        self.kernels = [ds.compile() for ds in self.defect_systems]
+        self.temperatures = np.array(
+            [ds.temperature for ds in self.defect_systems], dtype=float
+        )
+        self.emin = np.array([ds.dos.emin() for ds in self.defect_systems], dtype=float)
+        self.emax = np.array([ds.dos.emax() for ds in self.defect_systems], dtype=float)
+        self.convergence_tolerances = np.array(
+            [ds.convergence_tolerance for ds in self.defect_systems], dtype=float
+        )
+        self.n_trial_steps = max(
+            [ds.n_trial_steps for ds in self.defect_systems], default=0
+        )
+        self._pack_defects()
+        self._pack_carriers()
+
+    def __len__(self) -> int:
+        return len(self.defect_systems)
+
+    def _pack_defects(self) -> None:
+        """concatenate the charge-state arrays of all the systems"""
+        kernels = self.kernels
+        self._system_index = np.concatenate(
+            [np.full(len(k.charges), i) for i, k in enumerate(kernels)] + [[]]
+        ).astype(int)
+        self._charges = np.concatenate([k.charges for k in kernels] + [[]])
+        self._energies = np.concatenate([k._energies for k in kernels] + [[]])
+        self._prefactors = np.concatenate([k._prefactors for k in kernels] + [[]])
+        self._fixed_values = np.concatenate([k._fixed_values for k in kernels] + [[]])
+        self._variable = np.concatenate([k._variable for k in kernels] + [[]]).astype(
+            bool
+        )
+        # the variable charge states of each species with a fixed total
+        # concentration form a group, which shares the concentration left over
+        group_index = np.full(len(self._charges), -1)
+        group_concentrations: List[float] = []
+        offset = 0
+        for kernel in kernels:
+            for indices, concentration in kernel._constrained_groups:
+                group_index[offset + indices] = len(group_concentrations)
+                group_concentrations.append(concentration)
+            offset += len(kernel.charges)
+        self._in_group = group_index >= 0
+        self._group_index = group_index[self._in_group]
+        self._group_concentrations = np.array(group_concentrations, dtype=float)
+
+    def _pack_carriers(self) -> None:
+        """concatenate the band energies and weights of each distinct ``DOS``,
+        and pair each system with the energies of its own ``DOS``"""
+        plans: Dict[int, Any] = {}
+        others: Dict[int, Tuple[Any, List[int]]] = {}
+        packed = []
+        for i, ds in enumerate(self.defect_systems):
+            if isinstance(ds.dos, DOS) and ds.dos.quadrature != "linear":
+                plans.setdefault(id(ds.dos), ds.dos._plan)
+                packed.append(i)
+            else:
+                others.setdefault(id(ds.dos), (ds.dos, []))[1].append(i)
+        self._other_dos = [(dos, np.array(index)) for dos, index in others.values()]
+        self._bands = {}
+        for band in ["valence", "conduction"]:
+            energies = [getattr(plan, f"e_{band}") for plan in plans.values()]
+            weights = [getattr(plan, f"w_{band}") for plan in plans.values()]
+            lengths = np.array([len(e) for e in energies], dtype=int)
+            starts = dict(zip(plans, np.cumsum(lengths) - lengths))
+            sizes = dict(zip(plans, lengths))
+            system_starts = np.array(
+                [starts[id(self.defect_systems[i].dos)] for i in packed], dtype=int
+            )
+            system_sizes = np.array(
+                [sizes[id(self.defect_systems[i].dos)] for i in packed], dtype=int
+            )
+            # index of each (system, energy) pair into the concatenated arrays
+            system = np.repeat(np.array(packed, dtype=int), system_sizes)
+            shift = system_starts - (np.cumsum(system_sizes) - system_sizes)
+            point = np.arange(len(system)) + np.repeat(shift, system_sizes)
+            energies = np.concatenate(energies + [[]])
+            weights = np.concatenate(weights + [[]])
+            self._bands[band] = (
+                system,
+                energies[point],
+                weights[point],
+                kboltz * self.temperatures[system],
+            )
+
+    def carrier_concentrations(
+        self, e_fermi: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """hole and electron concentrations of every system.
+
+        Args:
+            e_fermi (np.ndarray): Fermi energy of each system
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: concentration of holes, and of
+            electrons, per unit cell of each system
+        """
+        e_fermi = np.asarray(e_fermi, dtype=float)
+        n = len(self)
+        concentrations = []
+        for band, sign in [("valence", 1.0), ("conduction", -1.0)]:
+            system, energies, weights, kt = self._bands[band]
+            with np.errstate(over="ignore"):
+                occupations = 1.0 / (
+                    1.0 + np.exp(sign * (e_fermi[system] - energies) / kt)
+                )
+            concentrations.append(
+                np.bincount(system, weights * occupations, minlength=n)
+            )
+        p0, n0 = concentrations
+        for dos, index in self._other_dos:
+            p0[index], n0[index] = dos.carrier_concentrations_array(
+                e_fermi[index], self.temperatures[index]
+            )
+        return p0, n0
+
+    def charge_state_concentrations(self, e_fermi: np.ndarray) -> np.ndarray:
+        """concentrations of the charge states of every system, as
+        ``CompiledDefectSystem.charge_state_concentrations``.
+
+        Args:
+            e_fermi (np.ndarray): Fermi energy of each system
+
+        Returns:
+            np.ndarray: concentration per unit cell of each charge state of
+            each system, concatenated in the order of the systems
+        """
+        e_fermi = np.asarray(e_fermi, dtype=float)
+        kt = kboltz * self.temperatures[self._system_index]
+        exponents = -(
+            self._energies + self._charges * e_fermi[self._system_index]
+        ) / kt
+        with np.errstate(over="ignore", invalid="ignore"):
+            concentrations = np.where(
+                self._variable, self._prefactors * np.exp(exponents), self._fixed_values
+            )
+        if len(self._group_concentrations) > 0:
+            # share each constrained concentration between the charge states
+            # of its group in proportion to their Boltzmann weights, shifting
+            # the exponents so the largest in each group is zero
+            group = self._group_index
+            group_exponents = exponents[self._in_group]
+            largest = np.full(len(self._group_concentrations), -np.inf)
+            np.maximum.at(largest, group, group_exponents)
+            weights = self._prefactors[self._in_group] * np.exp(
+                group_exponents - largest[group]
+            )
+            totals = np.bincount(group, weights, minlength=len(largest))
+            concentrations[self._in_group] = (
+                self._group_concentrations[group] * weights / totals[group]
+            )
+        return concentrations
+
+    def _charge_densities(self, e_fermi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """total negative and positive charge densities of every system,
+        carriers included"""
+        p0, n0 = self.carrier_concentrations(e_fermi)
+        charges = self.charge_state_concentrations(e_fermi) * self._charges
+        negative = n0 - np.bincount(
+            self._system_index, np.minimum(charges, 0.0), minlength=len(self)
+        )
+        positive = p0 + np.bincount(
+            self._system_index, np.maximum(charges, 0.0), minlength=len(self)
+        )
+        return negative, positive
+
+    def q_tot(self, e_fermi: np.ndarray) -> np.ndarray:
+        """net charge density of every system, as ``DefectSystem.q_tot``.
+
+        Args:
+            e_fermi (np.ndarray): Fermi energy of each system
+
+        Returns:
+            np.ndarray: net charge density per unit cell of each system
+        """
+        negative, positive = self._charge_densities(e_fermi)
+        return negative - positive
+
+    def log_charge_balance(self, e_fermi: np.ndarray) -> np.ndarray:
+        """natural logarithm of the ratio of the negative to the positive
+        charge density of every system, as
+        ``CompiledDefectSystem.log_charge_balance`` (but evaluated from the
+        linear charge densities).
+
+        Args:
+            e_fermi (np.ndarray): Fermi energy of each system
+
+        Returns:
+            np.ndarray: log charge balance of each system
+        """
+        negative, positive = self._charge_densities(e_fermi)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.log(negative) - np.log(positive)
+
+    def solve(self) -> List[SCFermiSolution]:
+        """Solve every system for its self-consistent Fermi energy at once,
+        and evaluate its carrier and defect concentrations.
+
+        The roots are found by ``solvers.vectorised_illinois`` applied to the
+        log charge balance, which varies smoothly through the root even
+        where the net charge spans many orders of magnitude, so that each
+        system converges superlinearly. A system stops as soon as its net
+        charge is within its ``convergence_tolerance``.
+
+        Raises:
+            RuntimeError: if the net charge of any system does not change sign
+              between its ``dos.emin()`` and ``dos.emax()``
+
+        Returns:
+            List[SCFermiSolution]: solution for each system, in the order
+            given
+        """
+        if len(self) == 0:
+            return []
+
+        def balance(e_fermi: np.ndarray) -> np.ndarray:
+            negative, positive = self._charge_densities(e_fermi)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                log_balance = np.log(negative) - np.log(positive)
+            # zero, so that the search stops, where the net charge is within
+            # tolerance (including where both charge densities underflow)
+            converged = np.abs(negative - positive) < self.convergence_tolerances
+            return np.where(converged, 0.0, log_balance)
+
+        fermi_energies, _, nfev = vectorised_illinois(
+            balance,
+            self.emin,
+            self.emax,
+            ftol=np.finfo(float).tiny,
+            maxiter=self.n_trial_steps,
+        )
+        residuals = np.abs(self.q_tot(fermi_energies))
+        return [
+            SCFermiSolution.from_compiled(
+                kernel,
+                RootResult(
+                    root=float(e_fermi),
+                    residual=float(residual),
+                    iterations=nfev,
+                    converged=bool(residual < tolerance),
+                ),
+                float(temperature),
+            )
+            for kernel, e_fermi, residual, tolerance, temperature in zip(
+                self.kernels,
+                fermi_energies,
+                residuals,
+                self.convergence_tolerances,
+                self.temperatures,
+            )
+        ]
@@ -0,0 +1,270 @@
+import numpy as np
+from typing import Tuple, TYPE_CHECKING
+from numpy.typing import ArrayLike
+
+if TYPE_CHECKING:
+    from py_sc_fermi.dos import DOS
+
+# number of (Fermi energy, density-of-states energy) pairs evaluated at once
+# when building a table, to bound the memory used
+_chunk_size = 2 ** 22
+
+
+class CarrierTable(object):
+    """Hole and electron concentrations of a ``DOS`` at one temperature,
+    tabulated on a grid of Fermi energies spanning the ``DOS`` energy range,
+    so that they can be looked up rather than integrated over the
+    density-of-states at every evaluation.
+
+    ``log(p0)`` and ``log(n0)`` are tabulated together with their exact
+    derivatives, and interpolated with monotone cubic Hermite polynomials: the
+    slopes are limited as in Fritsch and Carlson (1980) so that the
+    interpolants are, like the concentrations themselves, monotone in the
+    Fermi energy. Starting from a uniform grid, each interval is halved until
+    the error in the logarithms (i.e. the relative error in the
+    concentrations) at its midpoint and quarter points is no more than
+    ``tolerance``, so the grid
+    is only fine where the concentrations vary quickly. Outside the grid the
+    logarithms are extrapolated linearly.
+
+    A ``CarrierTable`` has the same carrier concentration methods as a
+    ``DOS``, and can stand in for one in a ``CompiledDefectSystem``, provided
+    it is only evaluated at its own temperature. Tables are usually built
+    with ``DOS.carrier_table``.
+
+    Args:
+        dos (DOS): density-of-states to tabulate
+        temperature (float): temperature (K)
+        tolerance (float, optional): largest relative error allowed in the
+          concentrations. Defaults to 1e-8.
+        max_points (int, optional): largest number of grid points. Defaults to
+          2 ** 20 + 1.
+
+    Raises:
+        ValueError: if ``tolerance`` is not reached with ``max_points`` grid
+          points
+    """
+
+    def __init__(
+        self,
+        dos: "DOS",
+        temperature: float,
+        tolerance: float = 1e-8,
+        max_points: int = 2 ** 20 + 1,
+    ):
+        self.temperature = temperature
+        self.tolerance = tolerance
+        e_fermi = np.linspace(float(dos.emin()), float(dos.emax()), 257)
+        values, slopes = _exact(dos, e_fermi, temperature)
+        self._set_grid(e_fermi, values, slopes)
+        # intervals whose midpoints have yet to be checked
+        unchecked = np.arange(len(e_fermi) - 1)
+        self.error = 0.0
+        while len(unchecked) > 0:
+            # check each interval at its midpoint and quarter points
+            a, b = e_fermi[unchecked], e_fermi[unchecked + 1]
+            points = np.concatenate([a + (b - a) * t for t in [0.5, 0.25, 0.75]])
+            exact_values, exact_slopes = _exact(dos, points, temperature)
+            interpolated, _ = self._interpolate(points)
+            errors = np.abs(interpolated - exact_values).reshape(2, 3, -1)
+            errors = errors.max(axis=(0, 1))
+            converged = errors <= tolerance
+            midpoints = points[: len(unchecked)]
+            exact_values = exact_values[:, : len(unchecked)]
+            exact_slopes = exact_slopes[:, : len(unchecked)]
+            self.error = max(
+                self.error, float(np.max(errors, initial=0.0, where=converged))
+            )
+            split = unchecked[~converged]
+            if len(split) == 0:
+                break
+            if len(e_fermi) + len(split) > max_points:
+                raise ValueError(
+                    f"A tolerance of {tolerance} could not be reached with "
+                    f"{max_points} points (error {np.max(errors)})"
+                )
+            # split the intervals that are not yet accurate enough at their
+            # midpoints, which have already been evaluated
+            e_fermi = np.insert(e_fermi, split + 1, midpoints[~converged])
+            values = np.insert(values, split + 1, exact_values[:, ~converged], axis=1)
+            slopes = np.insert(slopes, split + 1, exact_slopes[:, ~converged], axis=1)
+            self._set_grid(e_fermi, values, slopes)
+            # each split interval becomes two new intervals to check
+            first = split + np.arange(len(split))
+            unchecked = np.sort(np.concatenate([first, first + 1]))
+
+    def _set_grid(
+        self, e_fermi: np.ndarray, values: np.ndarray, slopes: np.ndarray
+    ) -> None:
+        """store the grid, the logarithms of the concentrations (one row for
+        holes and one for electrons) and their slopes, limited so that each
+        cubic is monotone"""
+        self.e_fermi = e_fermi
+        self._values = values
+        self._end_slopes = slopes[:, [0, -1]]
+        self._slopes = _monotone_slopes(values, slopes, np.diff(e_fermi))
+
+    def _interpolate(self, e_fermi: ArrayLike) -> Tuple[np.ndarray, np.ndarray]:
+        """interpolated ``[log(p0), log(n0)]`` and their derivatives, with the
+        carrier axis first"""
+        e_fermi = np.asarray(e_fermi, dtype=float)
+        n = len(self.e_fermi)
+        i = np.clip(np.searchsorted(self.e_fermi, e_fermi, side="right") - 1, 0, n - 2)
+        h = self.e_fermi[i + 1] - self.e_fermi[i]
+        t = np.clip((e_fermi - self.e_fermi[i]) / h, 0.0, 1.0)
+        y0, y1 = self._values[:, i], self._values[:, i + 1]
+        d0, d1 = self._slopes[:, i] * h, self._slopes[:, i + 1] * h
+        t2 = t * t
+        t3 = t2 * t
+        values = (
+            (2 * t3 - 3 * t2 + 1) * y0
+            + (t3 - 2 * t2 + t) * d0
+            + (-2 * t3 + 3 * t2) * y1
+            + (t3 - t2) * d1
+        )
+        slopes = (
+            (6 * t2 - 6 * t) * (y0 - y1)
+            + (3 * t2 - 4 * t + 1) * d0
+            + (3 * t2 - 2 * t) * d1
+        ) / h
+        # linear extrapolation beyond the grid
+        outside = (e_fermi < self.e_fermi[0]) | (e_fermi > self.e_fermi[-1])
+        if np.any(outside):
+            end = np.where(e_fermi < self.e_fermi[0], 0, n - 1)
+            end_slopes = self._end_slopes[:, np.minimum(end, 1)]
+            values = np.where(
+                outside,
+                self._values[:, end] + end_slopes * (e_fermi - self.e_fermi[end]),
+                values,
+            )
+            slopes = np.where(outside, end_slopes, slopes)
+        return values, slopes
+
+    def _check_temperature(self, temperature: ArrayLike) -> None:
+        if np.any(np.asarray(temperature) != self.temperature):
+            raise ValueError(
+                f"This CarrierTable is for {self.temperature} K, "
+                f"not {np.asarray(temperature)} K"
+            )
+
+    def log_carrier_concentrations(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """interpolated logarithms of the hole and electron concentrations,
+        as ``DOS.log_carrier_concentrations``.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, which must be the temperature
+              of the table
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: log of the concentration of holes,
+            log of the concentration of electrons
+        """
+        self._check_temperature(temperature)
+        values, _ = self._interpolate(e_fermi)
+        return values[0][()], values[1][()]
+
+    def log_carrier_derivatives(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """derivatives of :meth:`log_carrier_concentrations` with respect to
+        the Fermi energy, as ``DOS.log_carrier_derivatives``.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, which must be the temperature
+              of the table
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: derivative of the log of the
+            concentration of holes, and of electrons (per eV)
+        """
+        self._check_temperature(temperature)
+        _, slopes = self._interpolate(e_fermi)
+        return slopes[0][()], slopes[1][()]
+
+    def carrier_concentrations(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """interpolated hole and electron concentrations, as
+        ``DOS.carrier_concentrations``.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, which must be the temperature
+              of the table
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: concentration of holes,
+            concentration of electrons
+        """
+        log_p0, log_n0 = self.log_carrier_concentrations(e_fermi, temperature)
+        return np.exp(log_p0), np.exp(log_n0)
+
+    carrier_concentrations_array = carrier_concentrations
+
+    def carrier_derivatives(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """derivatives of the interpolated hole and electron concentrations
+        with respect to the Fermi energy, as ``DOS.carrier_derivatives``.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, which must be the temperature
+              of the table
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: derivative of the concentration of
+            holes, derivative of the concentration of electrons (per eV)
+        """
+        self._check_temperature(temperature)
+        values, slopes = self._interpolate(e_fermi)
+        derivatives = np.exp(values) * slopes
+        return derivatives[0][()], derivatives[1][()]
+
+
+def _exact(
+    dos: "DOS", e_fermi: np.ndarray, temperature: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """exact ``[log(p0), log(n0)]`` and their derivatives at each Fermi energy,
+    evaluated a chunk of Fermi energies at a time"""
+    values = np.empty((2, len(e_fermi)))
+    slopes = np.empty((2, len(e_fermi)))
+    step = max(1, _chunk_size // len(dos.edos))
+    for start in range(0, len(e_fermi), step):
+        chunk = e_fermi[start : start + step]
+        values[:, start : start + step] = dos.log_carrier_concentrations(
+            chunk, temperature
+        )
+        slopes[:, start : start + step] = dos.log_carrier_derivatives(
+            chunk, temperature
+        )
+    return values, slopes
+
+
+def _monotone_slopes(
+    values: np.ndarray, slopes: np.ndarray, h: np.ndarray
+) -> np.ndarray:
+    """slopes at the grid points, scaled down where needed so that the cubic
+    Hermite interpolant is monotone on every interval (Fritsch and Carlson,
+    1980). Slopes with the wrong sign for their interval are set to zero."""
+    secants = np.diff(values, axis=-1) / h
+    slopes = slopes.copy()
+    for side in [slice(None, -1), slice(1, None)]:
+        # slopes of the opposite sign to an adjacent secant cannot be monotone
+        wrong_sign = slopes[:, side] * secants < 0.0
+        slopes[:, side] = np.where(
+            wrong_sign | (secants == 0.0), 0.0, slopes[:, side]
+        )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alpha = slopes[:, :-1] / secants
+        beta = slopes[:, 1:] / secants
+        radius = np.hypot(alpha, beta)
+        scale = np.where(np.isfinite(radius) & (radius > 3.0), 3.0 / radius, 1.0)
+    limit = np.ones(slopes.shape)
+    limit[:, :-1] = scale
+    limit[:, 1:] = np.minimum(limit[:, 1:], scale)
+    return slopes * limit
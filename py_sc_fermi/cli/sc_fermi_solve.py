@@ -1,13 +1,58 @@
 from py_sc_fermi.inputs import InputSet
 from py_sc_fermi.defect_system import DefectSystem
+from py_sc_fermi.solvers import SOLVERS
+from py_sc_fermi.disk_cache import Cache, DiskCache
+from multiprocessing import Pool
+from typing import Any, List, Optional, Tuple
 import argparse
+import dataclasses
+import csv
+import glob
+import os
+import sys
 import yaml
 
 
-def parse_command_line_arguments():
+def parse_command_line_arguments(
+    args: Optional[List[str]] = None,
+) -> argparse.Namespace:
     parser = argparse.ArgumentParser()
     parser.add_argument(
-        "input_file", type=str, help="Path to input file defining the defect system"
+        "input_files",
+        type=str,
+        nargs="*",
+        help="Paths (or glob patterns) of input files defining the defect system",
+    )
+    parser.add_argument(
+        "-m",
+        "--manifest",
+        help="Path to a file listing one input file per line",
+        default=None,
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="number of input files to solve in parallel",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Path of the output file (defaults to py_sc_fermi_out.yaml for a "
+        "single input file, and py_sc_fermi_out.csv for several)",
+        default=None,
+    )
+    parser.add_argument(
+        "--cache_dir",
+        help="directory in which to cache parsed dos and structure files between runs",
+        default=None,
+    )
+    parser.add_argument(
+        "--cache_size",
+        help="maximum size of the cache directory in MB",
+        type=float,
+        default=1024,
     )
     parser.add_argument(
         "-s",
@@ -38,42 +83,187 @@ def parse_command_line_arguments():
         "-n", "--n_trial", help="maximum number of trial steps", type=int, default=1500
     )
     parser.add_argument("-b", "--band_gap", help="band gap of bulk system")
-    return parser.parse_args()
+    parser.add_argument(
+        "--solver",
+        help="root-finding method used to solve for the self-consistent Fermi energy",
+        choices=list(SOLVERS),
+        default=None,
+    )
+    parser.add_argument(
+        "--log_space",
+        help="evaluate concentrations in log space (robust at low temperatures)",
+        action="store_true",
+    )
+    parsed = parser.parse_args(args)
+    try:
+        parsed.input_files = expand_input_files(parsed.input_files, parsed.manifest)
+    except (FileNotFoundError, ValueError) as error:
+        parser.error(str(error))
+    if not parsed.input_files:
+        parser.error("no input files given")
+    if parsed.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    return parsed
 
 
-def main():
-    """
-    read in input files for a defect system and return the defect system dumped
-    to a yaml file.
+def expand_input_files(
+    patterns: List[str], manifest: Optional[str] = None
+) -> List[str]:
+    """list the input files given on the command line, with glob patterns
+    expanded (in sorted order) and followed by the files listed in a
+    manifest. Blank lines and lines starting with ``#`` in the manifest are
+    ignored, and relative paths in it are taken relative to the manifest.
+
+    Args:
+        patterns (List[str]): paths or glob patterns of input files
+        manifest (Optional[str], optional): path to a manifest file. Defaults
+          to None.
+
+    Raises:
+        ValueError: if a glob pattern matches no files
+
+    Returns:
+        List[str]: paths of the input files, in order
     """
-    args = parse_command_line_arguments()
-    input_file = args.input_file
-    structure_file = args.structure_file
-    dos_file = args.dos_file
-    frozen_defects = args.frozen_defects
-    convergence_tol = args.convergence_tol
-    n_trial = args.n_trial
+    input_files = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                raise ValueError(f"no input files match {pattern}")
+            input_files.extend(matches)
+        else:
+            input_files.append(pattern)
+    if manifest is not None:
+        directory = os.path.dirname(manifest)
+        with open(manifest, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    input_files.append(os.path.join(directory, line))
+    return input_files
 
+
+def load_defect_system(
+    input_file: str, args: argparse.Namespace, cache: Optional[Cache] = None
+) -> DefectSystem:
+    """build the ``DefectSystem`` defined by one input file, with the settings
+    given on the command line. DOS and structure files already read into
+    ``cache`` for an earlier input file are reused."""
     if input_file.endswith(".yaml"):
-        defect_system = DefectSystem.from_yaml(
-            input_file, structure_file=structure_file, dos_file=dos_file
+        input_set = InputSet.from_yaml(
+            input_file,
+            structure_file=args.structure_file,
+            dos_file=args.dos_file,
+            cache=cache,
         )
+        if args.solver is not None:
+            input_set = dataclasses.replace(input_set, solver=args.solver)
     else:
-        input_data = InputSet.from_sc_fermi_inputs(
+        input_set = InputSet.from_sc_fermi_inputs(
             input_file=input_file,
-            structure_file=structure_file,
-            dos_file=dos_file,
-            frozen=frozen_defects,
-            convergence_tolerance=convergence_tol,
-            n_trial_steps=n_trial,
+            structure_file=args.structure_file,
+            dos_file=args.dos_file,
+            frozen=args.frozen_defects,
+            convergence_tolerance=args.convergence_tol,
+            n_trial_steps=args.n_trial,
+            solver=args.solver if args.solver is not None else "brent",
+            cache=cache,
         )
-        defect_system = DefectSystem.from_input_set(input_data)
-    defect_system.report()
+    defect_system = DefectSystem.from_input_set(input_set)
+    if args.log_space:
+        defect_system.log_space = True
+    return defect_system
+
+
+def _solve(defect_system: DefectSystem) -> Tuple[Any, Optional[str]]:
+    """solve one ``DefectSystem``, returning the error rather than raising it
+    so that one failed input does not stop the others"""
+    try:
+        return defect_system.solve(), None
+    except Exception as error:
+        return None, f"{type(error).__name__}: {error}"
+
+
+def solve_all(defect_systems: List[DefectSystem], jobs: int = 1) -> List[Tuple]:
+    """solve each ``DefectSystem``, over ``jobs`` worker processes if more than
+    one, returning ``(solution, error)`` for each in order"""
+    jobs = min(jobs, len(defect_systems))
+    if jobs <= 1:
+        return [_solve(defect_system) for defect_system in defect_systems]
+    with Pool(jobs) as pool:
+        return pool.map(_solve, defect_systems, chunksize=1)
+
+
+def write_table(filename: str, input_files: List[str], solutions: List[Tuple]) -> None:
+    """write one row per input file of the temperature, Fermi energy and
+    carrier and defect concentrations (cm^-3) to a csv file. The defect
+    columns are the union of the ``DefectSpecies`` over all input files, and
+    the row of an input file that could not be solved is left blank."""
+    species: List[str] = []
+    for solution, _ in solutions:
+        if solution is not None:
+            species.extend(n for n in solution.species_names if n not in species)
+    fieldnames = ["input", "temperature", "Fermi Energy", "p0", "n0"] + species
+    with open(filename, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, restval="")
+        writer.writeheader()
+        for input_file, (solution, _) in zip(input_files, solutions):
+            row = {"input": input_file}
+            if solution is not None:
+                row["temperature"] = solution.temperature
+                row.update(solution.as_dict())
+            writer.writerow(row)
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    read in input files for one or more defect systems, solve each for its
+    self-consistent Fermi energy and write the results to file: a yaml file
+    for a single input file, or a single csv table for several.
+    """
+    args = parse_command_line_arguments(argv)
+    input_files = args.input_files
+    cache: Cache
+    if args.cache_dir is not None:
+        cache = DiskCache(args.cache_dir, max_bytes=int(args.cache_size * 1e6))
+    else:
+        cache = {}
+
+    if len(input_files) == 1:
+        defect_system = load_defect_system(input_files[0], args, cache)
+        solution = defect_system.solve()
+        print(solution.report_string())
+
+        dump_dict = solution.as_dict(decomposed=True)
+        dump_dict["temperature"] = defect_system.temperature
+        with open(args.output or "py_sc_fermi_out.yaml", "w") as f:
+            yaml.dump(dump_dict, f)
+        return
 
-    dump_dict = defect_system.as_dict(decomposed=True)
-    dump_dict["temperature"] = defect_system.temperature
-    with open("py_sc_fermi_out.yaml", "w") as f:
-        yaml.dump(dump_dict, f)
+    defect_systems: List[DefectSystem] = []
+    errors: List[Optional[str]] = []
+    for input_file in input_files:
+        try:
+            defect_systems.append(load_defect_system(input_file, args, cache))
+            errors.append(None)
+        except Exception as error:
+            errors.append(f"{type(error).__name__}: {error}")
+    solved = iter(solve_all(defect_systems, args.jobs))
+    solutions = [
+        next(solved) if message is None else (None, message) for message in errors
+    ]
+    failed = False
+    for input_file, (solution, message) in zip(input_files, solutions):
+        print(f"==> {input_file} <==")
+        if message is None:
+            print(solution.report_string())
+        else:
+            failed = True
+            print(f"{input_file}: {message}", file=sys.stderr)
+    write_table(args.output or "py_sc_fermi_out.csv", input_files, solutions)
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
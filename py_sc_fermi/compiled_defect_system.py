@@ -0,0 +1,691 @@
+import numpy as np
+from copy import copy
+from typing import Dict, List, Optional, Tuple, Union, TYPE_CHECKING
+from numpy.typing import ArrayLike
+from py_sc_fermi.defect_charge_state import kboltz
+from py_sc_fermi.log_space import logsumexp, safe_log
+
+if TYPE_CHECKING:
+    from py_sc_fermi.defect_system import DefectSystem
+    from py_sc_fermi.dos import CarrierConcentrations
+
+
+class CompiledDefectSystem(object):
+    """Flat, array-backed representation of the defects in a ``DefectSystem``,
+    used to evaluate defect concentrations and the net charge with a few
+    vectorised NumPy operations rather than by walking the ``DefectSpecies``
+    and ``DefectChargeState`` objects.
+
+    Every ``DefectChargeState`` of every ``DefectSpecies`` is one entry in the
+    per-charge-state arrays, and ``species_index`` maps each entry to its
+    ``DefectSpecies``. Fixed concentrations that are not set are stored as
+    ``np.nan``. All concentrations are per unit cell.
+
+    Methods accept either a scalar Fermi energy and temperature or arrays of
+    Fermi energies and/or temperatures, which are broadcast against each
+    other. The charge-state (or species) axis is appended as the last axis of
+    the result.
+
+    Args:
+        dos (CarrierConcentrations): the ``DOS`` (or ``ParabolicBandDOS``, or
+          ``CarrierTable``) used to calculate carrier concentrations
+        volume (float): volume of the unit cell in Angstroms cubed
+        species_names (List[str]): names of the ``DefectSpecies``
+        nsites (np.ndarray): site degeneracy of each ``DefectSpecies``
+        species_fixed_concentrations (np.ndarray): fixed concentration of each
+          ``DefectSpecies``, ``np.nan`` if variable
+        charges (np.ndarray): charge of each ``DefectChargeState``
+        energies (np.ndarray): formation energy at E[Fermi] = 0 of each
+          ``DefectChargeState``, ``np.nan`` if not defined
+        degeneracies (np.ndarray): degeneracy of each ``DefectChargeState``
+        fixed_concentrations (np.ndarray): fixed concentration of each
+          ``DefectChargeState``, ``np.nan`` if variable
+        species_index (np.ndarray): index of the ``DefectSpecies`` to which
+          each ``DefectChargeState`` belongs
+        elements (List[str], optional): elements whose chemical potentials
+          enter the formation energies. Defaults to none.
+        element_changes (np.ndarray, optional): change in the number of atoms
+          of each element on forming each ``DefectChargeState``, shape
+          ``(n_charge_states, n_elements)``. Defaults to zeros.
+        reference_energies (np.ndarray, optional): formation energy at
+          E[Fermi] = 0 of each ``DefectChargeState`` when all chemical
+          potentials are zero. Defaults to ``energies``.
+    """
+
+    def __init__(
+        self,
+        dos: "CarrierConcentrations",
+        volume: float,
+        species_names: List[str],
+        nsites: np.ndarray,
+        species_fixed_concentrations: np.ndarray,
+        charges: np.ndarray,
+        energies: np.ndarray,
+        degeneracies: np.ndarray,
+        fixed_concentrations: np.ndarray,
+        species_index: np.ndarray,
+        elements: Optional[List[str]] = None,
+        element_changes: Optional[np.ndarray] = None,
+        reference_energies: Optional[np.ndarray] = None,
+    ):
+        self.dos = dos
+        self.volume = volume
+        self.species_names = list(species_names)
+        self.nsites = np.asarray(nsites, dtype=float)
+        self.species_fixed_concentrations = np.asarray(
+            species_fixed_concentrations, dtype=float
+        )
+        self.charges = np.asarray(charges, dtype=float)
+        self.energies = np.asarray(energies, dtype=float)
+        self.degeneracies = np.asarray(degeneracies, dtype=float)
+        self.fixed_concentrations = np.asarray(fixed_concentrations, dtype=float)
+        self.species_index = np.asarray(species_index, dtype=int)
+        self.elements = list(elements) if elements is not None else []
+        if element_changes is None:
+            element_changes = np.zeros((len(self.charges), len(self.elements)))
+        self.element_changes = np.asarray(element_changes, dtype=float).reshape(
+            len(self.charges), len(self.elements)
+        )
+        if reference_energies is None:
+            reference_energies = self.energies
+        self.reference_energies = np.asarray(reference_energies, dtype=float)
+
+        # derived arrays, evaluated once
+        self._variable = np.isnan(self.fixed_concentrations)
+        self._fixed_values = np.where(self._variable, 0.0, self.fixed_concentrations)
+        self._energies = np.where(self._variable, self.energies, 0.0)
+        self._prefactors = np.where(
+            self._variable, self.degeneracies * self.nsites[self.species_index], 0.0
+        )
+        self._membership = np.zeros((len(self.charges), len(self.species_names)))
+        self._membership[np.arange(len(self.charges)), self.species_index] = 1.0
+        self._fixed_species = ~np.isnan(self.species_fixed_concentrations)
+        # for each species with a fixed total concentration and at least one
+        # variable-concentration charge state: the indices of those charge
+        # states and the concentration left to share between them
+        self._constrained_groups: List[Tuple[np.ndarray, float]] = []
+        for i in np.flatnonzero(self._fixed_species):
+            indices = np.flatnonzero((self.species_index == i) & self._variable)
+            if indices.size:
+                self._constrained_groups.append(
+                    (
+                        indices,
+                        self.species_fixed_concentrations[i]
+                        - self._fixed_values[self.species_index == i].sum(),
+                    )
+                )
+        # for the log-space path
+        self._log_base = np.where(
+            self._variable, safe_log(self._prefactors), safe_log(self._fixed_values)
+        )
+        self._log_abs_charges = safe_log(np.abs(self.charges))
+        self._log_membership = safe_log(self._membership.T)
+
+    @classmethod
+    def from_defect_system(
+        cls, defect_system: "DefectSystem"
+    ) -> "CompiledDefectSystem":
+        """pack the ``DefectSpecies`` and ``DefectChargeState`` objects of a
+        ``DefectSystem`` into flat arrays.
+
+        Args:
+            defect_system (DefectSystem): ``DefectSystem`` to compile
+
+        Returns:
+            CompiledDefectSystem: array-backed representation of ``defect_system``
+        """
+        charges, energies, degeneracies, fixed, species_index = [], [], [], [], []
+        reference_energies = []
+        all_charge_states = [
+            cs
+            for ds in defect_system.defect_species
+            for cs in ds.charge_states.values()
+        ]
+        elements = sorted(
+            {el for cs in all_charge_states for el in cs.element_changes.keys()}
+        )
+        element_changes = np.array(
+            [
+                [cs.element_changes.get(el, 0) for el in elements]
+                for cs in all_charge_states
+            ],
+            dtype=float,
+        )
+        for i, ds in enumerate(defect_system.defect_species):
+            for q, cs in ds.charge_states.items():
+                charges.append(q)
+                energies.append(np.nan if cs.energy is None else cs.energy)
+                reference_energies.append(
+                    np.nan if cs.reference_energy is None else cs.reference_energy
+                )
+                degeneracies.append(cs.degeneracy)
+                fixed.append(
+                    np.nan if cs.fixed_concentration is None else cs.fixed_concentration
+                )
+                species_index.append(i)
+        return cls(
+            dos=defect_system.dos,
+            volume=defect_system.volume,
+            species_names=[ds.name for ds in defect_system.defect_species],
+            nsites=np.array([ds.nsites for ds in defect_system.defect_species]),
+            species_fixed_concentrations=np.array(
+                [
+                    np.nan if ds.fixed_concentration is None else ds.fixed_concentration
+                    for ds in defect_system.defect_species
+                ],
+                dtype=float,
+            ),
+            charges=np.array(charges, dtype=float),
+            energies=np.array(energies, dtype=float),
+            degeneracies=np.array(degeneracies, dtype=float),
+            fixed_concentrations=np.array(fixed, dtype=float),
+            species_index=np.array(species_index, dtype=int),
+            elements=elements,
+            element_changes=element_changes,
+            reference_energies=np.array(reference_energies, dtype=float),
+        )
+
+    def with_fixed_concentrations(
+        self, fixed_concentrations: Dict[str, Optional[float]]
+    ) -> "CompiledDefectSystem":
+        """a copy of this ``CompiledDefectSystem`` with the total
+        concentrations of some ``DefectSpecies`` fixed (or, if given as
+        ``None``, freed), equivalent to ``DefectSpecies.fix_concentration``.
+        If every charge state of a ``DefectSpecies`` already has a fixed
+        concentration (e.g. a dopant), those concentrations are instead
+        scaled so that they sum to the new total.
+
+        Args:
+            fixed_concentrations (Dict[str, Optional[float]]): concentration
+              per unit cell of each ``DefectSpecies`` to fix, by name
+
+        Raises:
+            ValueError: if a ``DefectSpecies`` name is not recognised, or the
+              fixed concentrations of its charge states are all zero and
+              cannot be scaled
+
+        Returns:
+            CompiledDefectSystem: copy with updated fixed concentrations
+        """
+        species_fixed_concentrations = self.species_fixed_concentrations.copy()
+        charge_state_fixed_concentrations = self.fixed_concentrations.copy()
+        for name, concentration in fixed_concentrations.items():
+            if name not in self.species_names:
+                raise ValueError(f"{name} is not one of {self.species_names}")
+            i = self.species_names.index(name)
+            in_species = self.species_index == i
+            if concentration is not None and not self._variable[in_species].any():
+                total = self._fixed_values[in_species].sum()
+                if total == 0.0:
+                    raise ValueError(
+                        f"The charge states of {name} all have fixed "
+                        "concentrations of zero, which cannot be scaled"
+                    )
+                charge_state_fixed_concentrations[in_species] *= concentration / total
+                continue
+            species_fixed_concentrations[i] = (
+                np.nan if concentration is None else concentration
+            )
+        return CompiledDefectSystem(
+            dos=self.dos,
+            volume=self.volume,
+            species_names=self.species_names,
+            nsites=self.nsites,
+            species_fixed_concentrations=species_fixed_concentrations,
+            charges=self.charges,
+            energies=self.energies,
+            degeneracies=self.degeneracies,
+            fixed_concentrations=charge_state_fixed_concentrations,
+            species_index=self.species_index,
+            elements=self.elements,
+            element_changes=self.element_changes,
+            reference_energies=self.reference_energies,
+        )
+
+    def with_energy_offsets(
+        self, energy_offsets: Dict[str, float]
+    ) -> "CompiledDefectSystem":
+        """a copy of this ``CompiledDefectSystem`` with a constant added to
+        the formation energy of every ``DefectChargeState`` of some
+        ``DefectSpecies``, e.g. to model a change in the chemical potential
+        of a dopant.
+
+        Args:
+            energy_offsets (Dict[str, float]): offset (eV) for each
+              ``DefectSpecies``, by name
+
+        Raises:
+            ValueError: if a ``DefectSpecies`` name is not recognised
+
+        Returns:
+            CompiledDefectSystem: copy with offset formation energies
+        """
+        offsets = np.zeros(len(self.species_names))
+        for name, offset in energy_offsets.items():
+            if name not in self.species_names:
+                raise ValueError(f"{name} is not one of {self.species_names}")
+            offsets[self.species_names.index(name)] = offset
+        compiled = copy(self)
+        compiled.energies = self.energies + offsets[self.species_index]
+        compiled.reference_energies = (
+            self.reference_energies + offsets[self.species_index]
+        )
+        compiled._energies = np.where(self._variable, compiled.energies, 0.0)
+        return compiled
+
+    def with_frozen_concentrations(
+        self, concentrations: np.ndarray, freeze: str = "species"
+    ) -> "CompiledDefectSystem":
+        """a copy of this ``CompiledDefectSystem`` with defect concentrations
+        frozen at one or more sets of charge-state concentrations, e.g. those
+        of an anneal at high temperature, equivalent to calling
+        ``fix_concentration`` on every ``DefectSpecies`` (``freeze="species"``)
+        or every ``DefectChargeState`` (``freeze="charge_states"``).
+
+        If ``concentrations`` has leading axes, so do the frozen
+        concentrations of the returned object, and they are broadcast against
+        the Fermi energies (and temperatures) passed to its methods, as for
+        :meth:`at_chemical_potentials`. ``DefectSpecies`` whose charge states
+        all have fixed concentrations are left as they are.
+
+        Args:
+            concentrations (np.ndarray): concentration per unit cell of each
+              ``DefectChargeState``, shape ``(..., n_charge_states)``
+            freeze (str, optional): ``"species"`` to fix the total
+              concentration of each ``DefectSpecies``, leaving its charge
+              states free to re-equilibrate, or ``"charge_states"`` to fix
+              the concentration of every ``DefectChargeState``. Defaults to
+              ``"species"``.
+
+        Raises:
+            ValueError: if ``freeze`` is not recognised, or
+              ``concentrations`` does not have one entry per charge state
+
+        Returns:
+            CompiledDefectSystem: copy with frozen concentrations
+        """
+        concentrations = np.asarray(concentrations, dtype=float)
+        if concentrations.shape[-1:] != self.charges.shape:
+            raise ValueError(
+                f"Expected concentrations for {len(self.charges)} charge states, "
+                f"got an array of shape {concentrations.shape}"
+            )
+        compiled = copy(self)
+        if freeze == "species":
+            totals = self._species_totals(concentrations)
+            frozen = (self._variable @ self._membership) > 0
+            compiled.species_fixed_concentrations = np.where(
+                frozen, totals, self.species_fixed_concentrations
+            )
+            compiled._fixed_species = self._fixed_species | frozen
+            # carry the leading axes of the frozen totals into the exponents
+            compiled._energies = np.broadcast_to(self._energies, concentrations.shape)
+            compiled._constrained_groups = [
+                (
+                    np.flatnonzero((self.species_index == i) & self._variable),
+                    totals[..., i] - self._fixed_values[self.species_index == i].sum(),
+                )
+                for i in np.flatnonzero(frozen)
+            ]
+        elif freeze == "charge_states":
+            compiled.fixed_concentrations = concentrations
+            compiled.species_fixed_concentrations = np.full(
+                len(self.species_names), np.nan
+            )
+            compiled._variable = np.zeros(len(self.charges), dtype=bool)
+            compiled._fixed_values = concentrations
+            compiled._energies = np.zeros(len(self.charges))
+            compiled._prefactors = np.zeros(len(self.charges))
+            compiled._fixed_species = np.zeros(len(self.species_names), dtype=bool)
+            compiled._constrained_groups = []
+            compiled._log_base = safe_log(concentrations)
+        else:
+            raise ValueError(
+                f'freeze must be "species" or "charge_states", not "{freeze}"'
+            )
+        return compiled
+
+    def formation_energies(self, chemical_potentials: ArrayLike) -> np.ndarray:
+        """formation energies at E[Fermi] = 0 of all ``DefectChargeState``
+        objects at one or more sets of chemical potentials, evaluated as a
+        single matrix product.
+
+        Args:
+            chemical_potentials (ArrayLike): chemical potential of each
+              element in ``self.elements``, shape ``(..., n_elements)``
+
+        Raises:
+            ValueError: if the last axis of ``chemical_potentials`` does not
+              match ``self.elements``
+
+        Returns:
+            np.ndarray: formation energies, shape ``(..., n_charge_states)``
+        """
+        chemical_potentials = np.asarray(chemical_potentials, dtype=float)
+        if chemical_potentials.shape[-1:] != (len(self.elements),):
+            raise ValueError(
+                f"Expected chemical potentials for the elements {self.elements}, "
+                f"got an array of shape {chemical_potentials.shape}"
+            )
+        return self.reference_energies - chemical_potentials @ self.element_changes.T
+
+    def at_chemical_potentials(
+        self, chemical_potentials: ArrayLike
+    ) -> "CompiledDefectSystem":
+        """a copy of this ``CompiledDefectSystem`` with the formation energies
+        evaluated at a set of chemical potentials (see
+        :meth:`formation_energies`).
+
+        If ``chemical_potentials`` has shape ``(n_points, n_elements)``, the
+        formation energies have a leading axis of length ``n_points``, which
+        is broadcast against the Fermi energies (and temperatures) passed to
+        the returned object's methods, so that all points can be evaluated
+        together.
+
+        Args:
+            chemical_potentials (ArrayLike): chemical potential of each
+              element in ``self.elements``, shape ``(..., n_elements)``
+
+        Returns:
+            CompiledDefectSystem: copy with updated formation energies
+        """
+        compiled = copy(self)
+        compiled.energies = self.formation_energies(chemical_potentials)
+        compiled._energies = np.where(self._variable, compiled.energies, 0.0)
+        return compiled
+
+    def charge_state_concentrations(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> np.ndarray:
+        """concentrations of all ``DefectChargeState`` objects at a given
+        Fermi energy (or array of Fermi energies) and temperature.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            np.ndarray: concentration per unit cell of each charge state, with
+            the charge-state axis last
+        """
+        e_fermi = np.asarray(e_fermi, dtype=float)
+        kt = kboltz * np.asarray(temperature, dtype=float)[..., None]
+        exponents = -(self._energies + self.charges * e_fermi[..., None]) / kt
+        with np.errstate(over="ignore", invalid="ignore"):
+            concentrations = np.where(
+                self._variable, self._prefactors * np.exp(exponents), self._fixed_values
+            )
+        for indices, constrained_concentration in self._constrained_groups:
+            # share the constrained concentration between the variable charge
+            # states in proportion to their Boltzmann weights, shifting the
+            # exponents so the largest is zero to avoid overflow
+            group = exponents[..., indices]
+            weights = self._prefactors[indices] * np.exp(
+                group - group.max(axis=-1, keepdims=True)
+            )
+            concentrations[..., indices] = (
+                np.asarray(constrained_concentration)[..., None]
+                * weights
+                / weights.sum(axis=-1, keepdims=True)
+            )
+        return concentrations
+
+    def species_concentrations(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> np.ndarray:
+        """total concentrations of all ``DefectSpecies`` at a given Fermi
+        energy (or array of Fermi energies) and temperature.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            np.ndarray: concentration per unit cell of each defect species,
+            with the species axis last
+        """
+        return self._species_totals(
+            self.charge_state_concentrations(e_fermi, temperature)
+        )
+
+    def _species_totals(self, concentrations: np.ndarray) -> np.ndarray:
+        """total concentration of each ``DefectSpecies`` given the
+        concentrations of the charge states, with the charge-state axis last"""
+        summed = concentrations @ self._membership
+        return np.where(self._fixed_species, self.species_fixed_concentrations, summed)
+
+    def defect_charge(self, e_fermi: ArrayLike, temperature: ArrayLike) -> np.ndarray:
+        """net negative charge (negative minus positive charge contributions)
+        of all defects.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            np.ndarray: net negative defect charge per unit cell
+        """
+        return -(self.charge_state_concentrations(e_fermi, temperature) @ self.charges)
+
+    def defect_charge_derivative(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> np.ndarray:
+        """derivative of :meth:`defect_charge` with respect to the Fermi energy.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            np.ndarray: derivative of the net negative defect charge per eV
+        """
+        concentrations = self.charge_state_concentrations(e_fermi, temperature)
+        variable = concentrations * self._variable
+        mean_charge = np.zeros(variable.shape[:-1] + (len(self.species_names),))
+        if self._fixed_species.any():
+            # species whose charge states are all fixed have no variable
+            # concentration to take the mean charge over
+            total = variable @ self._membership
+            with np.errstate(divide="ignore", invalid="ignore"):
+                mean_charge = np.where(
+                    self._fixed_species & (total > 0),
+                    (variable * self.charges) @ self._membership / total,
+                    0.0,
+                )
+        spread = self.charges * (self.charges - mean_charge[..., self.species_index])
+        return (variable * spread).sum(axis=-1) / (
+            kboltz * np.asarray(temperature, dtype=float)
+        )
+
+    def carrier_concentrations(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[Union[float, np.ndarray], Union[float, np.ndarray]]:
+        """hole and electron concentrations from the ``DOS``.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            Tuple[Union[float, np.ndarray], Union[float, np.ndarray]]:
+            concentration of holes, concentration of electrons
+        """
+        e_fermi = np.asarray(e_fermi, dtype=float)
+        temperature = np.asarray(temperature, dtype=float)
+        if e_fermi.ndim > 0 or temperature.ndim > 0:
+            return self.dos.carrier_concentrations_array(e_fermi, temperature)
+        return self.dos.carrier_concentrations(float(e_fermi), float(temperature))
+
+    def q_tot(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Union[float, np.ndarray]:
+        """net charge density, equivalent to ``DefectSystem.q_tot``.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            Union[float, np.ndarray]: net charge density at ``e_fermi``
+        """
+        p0, n0 = self.carrier_concentrations(e_fermi, temperature)
+        return n0 - p0 + self.defect_charge(e_fermi, temperature)
+
+    def dq_tot_de_fermi(self, e_fermi: float, temperature: float) -> float:
+        """derivative of :meth:`q_tot` with respect to the Fermi energy,
+        equivalent to ``DefectSystem.dq_tot_de_fermi``.
+
+        Args:
+            e_fermi (float): Fermi energy
+            temperature (float): temperature
+
+        Returns:
+            float: derivative of the net charge density per eV
+        """
+        dp0, dn0 = self.dos.carrier_derivatives(e_fermi, temperature)
+        return float(
+            dn0 - dp0 + self.defect_charge_derivative(e_fermi, temperature)
+        )
+
+    def log_charge_state_concentrations(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> np.ndarray:
+        """natural logarithms of :meth:`charge_state_concentrations`, evaluated
+        in log space so that they neither underflow nor overflow at low
+        temperatures or for large formation energies.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            np.ndarray: log of the concentration per unit cell of each charge
+            state, with the charge-state axis last
+        """
+        e_fermi = np.asarray(e_fermi, dtype=float)
+        kt = kboltz * np.asarray(temperature, dtype=float)[..., None]
+        exponents = -(self._energies + self.charges * e_fermi[..., None]) / kt
+        log_concentrations = np.where(
+            self._variable, self._log_base + exponents, self._log_base
+        )
+        for indices, constrained_concentration in self._constrained_groups:
+            group = log_concentrations[..., indices]
+            log_concentrations[..., indices] = (
+                safe_log(np.asarray(constrained_concentration))[..., None]
+                + group
+                - logsumexp(group)[..., None]
+            )
+        return log_concentrations
+
+    def log_species_concentrations(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> np.ndarray:
+        """natural logarithms of :meth:`species_concentrations`, evaluated in
+        log space.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            np.ndarray: log of the concentration per unit cell of each defect
+            species, with the species axis last
+        """
+        log_concentrations = self.log_charge_state_concentrations(e_fermi, temperature)
+        summed = logsumexp(log_concentrations[..., None, :] + self._log_membership)
+        return np.where(
+            self._fixed_species, safe_log(self.species_fixed_concentrations), summed
+        )
+
+    def log_charge_balance(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Union[float, np.ndarray]:
+        """log of the ratio of the negative charge (electrons and negatively
+        charged defects) to the positive charge (holes and positively charged
+        defects). This has the same sign as :meth:`q_tot`, and so the same
+        root, but is evaluated entirely in log space, so it stays finite and
+        strictly increasing in the Fermi energy even where every concentration
+        underflows in linear space.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            Union[float, np.ndarray]: ``log(negative charge) - log(positive charge)``
+        """
+        log_negative, log_positive, _ = self._log_charge_terms(e_fermi, temperature)
+        return logsumexp(log_negative) - logsumexp(log_positive)
+
+    def log_charge_balance_derivative(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Union[float, np.ndarray]:
+        """derivative of :meth:`log_charge_balance` with respect to the Fermi
+        energy.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            Union[float, np.ndarray]: derivative of the log charge balance per eV
+        """
+        log_negative, log_positive, log_concentrations = self._log_charge_terms(
+            e_fermi, temperature
+        )
+        kt = kboltz * np.asarray(temperature, dtype=float)
+        # d log(c) / dE for each charge state; the charge states of a species
+        # with a fixed total concentration respond relative to their mean charge
+        mean_charge = np.zeros(log_concentrations.shape)
+        for indices, _ in self._constrained_groups:
+            group = log_concentrations[..., indices]
+            weights = np.exp(group - logsumexp(group)[..., None])
+            mean_charge[..., indices] = (weights @ self.charges[indices])[..., None]
+        dlog_concentrations = np.where(
+            self._variable, -(self.charges - mean_charge) / kt[..., None], 0.0
+        )
+        dlog_p0, dlog_n0 = self.dos.log_carrier_derivatives(e_fermi, temperature)
+        dlog_negative = np.concatenate(
+            [np.asarray(dlog_n0)[..., None], dlog_concentrations], axis=-1
+        )
+        dlog_positive = np.concatenate(
+            [np.asarray(dlog_p0)[..., None], dlog_concentrations], axis=-1
+        )
+        return (
+            np.sum(
+                np.exp(log_negative - logsumexp(log_negative)[..., None])
+                * dlog_negative,
+                axis=-1,
+            )
+            - np.sum(
+                np.exp(log_positive - logsumexp(log_positive)[..., None])
+                * dlog_positive,
+                axis=-1,
+            )
+        )[()]
+
+    def _log_charge_terms(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """logs of the contributions to the negative charge (electrons, then
+        each charge state) and to the positive charge (holes, then each charge
+        state), with ``-np.inf`` for charge states that do not contribute, and
+        the log charge-state concentrations."""
+        log_p0, log_n0 = self.dos.log_carrier_concentrations(e_fermi, temperature)
+        log_concentrations = self.log_charge_state_concentrations(e_fermi, temperature)
+        log_charges = log_concentrations + self._log_abs_charges
+        log_negative = np.concatenate(
+            [
+                np.asarray(log_n0)[..., None],
+                np.where(self.charges < 0, log_charges, -np.inf),
+            ],
+            axis=-1,
+        )
+        log_positive = np.concatenate(
+            [
+                np.asarray(log_p0)[..., None],
+                np.where(self.charges > 0, log_charges, -np.inf),
+            ],
+            axis=-1,
+        )
+        return log_negative, log_positive, log_concentrations
@@ -1,27 +1,65 @@
 import numpy as np  # type: ignore
-from scipy.constants import physical_constants  # type: ignore
-from typing import Optional
+from typing import Dict, Optional
+from py_sc_fermi.log_space import safe_log
 
-kboltz = physical_constants["Boltzmann constant in eV/K"][0]
+# Boltzmann constant in eV/K, exact in the 2019 SI (k_B in J/K over the
+# elementary charge), defined here rather than read from ``scipy.constants``
+# so that importing py-sc-fermi does not import scipy
+kboltz = 1.380649e-23 / 1.602176634e-19
 
 
 class DefectChargeState:
     """Class describing a single charge state (of a ``DefectSpecies``).
 
+    ``DefectSpecies`` cache which of their charge states have fixed
+    concentrations, and their formation energies, so these should only be
+    changed with :meth:`fix_concentration` and :meth:`set_chemical_potentials`.
+
     Args:
          charge (int): charge of this ``DefectChargeState``
          degeneracy (int): degeneracy per unit cell
          energy (float): formation energy at E[Fermi] = 0
          fixed_concentration (float): fixed concentration per unit cell
+         element_changes (Dict[str, int]): number of atoms of each element
+           added to (positive) or removed from (negative) the host to form
+           this defect, e.g. ``{"O": -1}`` for an oxygen vacancy. Only
+           needed to evaluate the formation energy at different chemical
+           potentials.
+         reference_energy (float): formation energy at E[Fermi] = 0 when all
+           the chemical potentials are zero. Defaults to ``energy``. If
+           ``energy`` is not given, it is set to ``reference_energy``.
+
+    Note:
+        The formation energy at E[Fermi] = 0 at chemical potentials
+        :math:`\mu_i` is ``reference_energy`` :math:`- \sum_i n_i \mu_i`, where
+        :math:`n_i` are the ``element_changes``.
+
+        ``DefectChargeState`` uses ``__slots__`` rather than a per-instance
+        ``__dict__``, so that catalogues of millions of charge states stay
+        compact; attributes other than those listed cannot be added.
     """
 
+    __slots__ = (
+        "_charge",
+        "_degeneracy",
+        "_energy",
+        "_fixed_concentration",
+        "_element_changes",
+        "_reference_energy",
+        "_version",
+    )
+
     def __init__(
         self,
         charge: int,
         degeneracy: int = 1,
         energy: Optional[float] = None,
         fixed_concentration: Optional[float] = None,
+        element_changes: Optional[Dict[str, int]] = None,
+        reference_energy: Optional[float] = None,
     ):
+        if energy == None and reference_energy != None:
+            energy = reference_energy
         if energy == None and fixed_concentration == None:
             raise ValueError(
                 """You must specify either a fixed concentration or energy for 
@@ -32,6 +70,16 @@ class DefectChargeState:
         self._degeneracy = degeneracy
         self._energy = energy
         self._fixed_concentration = fixed_concentration
+        # ``None`` rather than an empty dictionary for each of the (usually
+        # many) charge states without element changes
+        self._element_changes = dict(element_changes) if element_changes else None
+        if reference_energy == None:
+            reference_energy = energy
+        self._reference_energy = reference_energy
+        # incremented whenever the fixed concentration or formation energy
+        # changes, so that every ``DefectSpecies`` holding this charge state
+        # can tell that its cached partition is out of date
+        self._version = 0
 
     @property
     def energy(self) -> Optional[float]:
@@ -42,6 +90,28 @@ class DefectChargeState:
         """
         return self._energy
 
+    @property
+    def element_changes(self) -> Dict[str, int]:
+        """number of atoms of each element added to (positive) or removed from
+        (negative) the host to form this ``DefectChargeState``
+
+        Returns:
+            Dict[str, int]: ``{element: change in number of atoms}``
+        """
+        if self._element_changes is None:
+            return {}
+        return self._element_changes
+
+    @property
+    def reference_energy(self) -> Optional[float]:
+        """formation energy of the ``DefectChargeState`` at E[Fermi] = 0 when
+        all the chemical potentials are zero
+
+        Returns:
+            Optional[float]: reference formation energy
+        """
+        return self._reference_energy
+
     @property
     def charge(self) -> int:
         """charge of the ``DefectChargeState``
@@ -139,6 +209,44 @@ class DefectChargeState:
             concentration (float): ``DefectChargeState`` concentration per unit cell
         """
         self._fixed_concentration = concentration
+        self._version += 1
+
+    def formation_energy_at(self, chemical_potentials: Dict[str, float]) -> float:
+        """formation energy of this ``DefectChargeState`` at E[Fermi] = 0 for a
+        given set of chemical potentials.
+
+        Args:
+            chemical_potentials (Dict[str, float]): chemical potential of each
+              element. Elements not given are taken to have a chemical
+              potential of zero.
+
+        Raises:
+            ValueError: if ``DefectChargeState.reference_energy == None``
+
+        Returns:
+            float: formation energy at E[Fermi] = 0
+        """
+        if self.reference_energy is None:
+            raise ValueError(
+                "Cannot calculate formation energy as a function of the chemical potentials without a defined formation energy!"
+            )
+        return self.reference_energy - sum(
+            n * chemical_potentials.get(element, 0.0)
+            for element, n in self.element_changes.items()
+        )
+
+    def set_chemical_potentials(self, chemical_potentials: Dict[str, float]) -> None:
+        """set the formation energy of this ``DefectChargeState`` to its value
+        at a given set of chemical potentials (see :meth:`formation_energy_at`).
+        Does nothing if the ``DefectChargeState`` has no reference energy.
+
+        Args:
+            chemical_potentials (Dict[str, float]): chemical potential of each
+              element
+        """
+        if self.reference_energy is not None:
+            self._energy = self.formation_energy_at(chemical_potentials)
+            self._version += 1
 
     def get_formation_energy(self, e_fermi: float) -> float:
         """get the formation energy of this ``DefectChargeState`` at a given Fermi
@@ -179,6 +287,27 @@ class DefectChargeState:
             concentration = self.fixed_concentration
         return concentration
 
+    def get_log_concentration(self, e_fermi: float, temperature: float) -> float:
+        """Calculate the natural logarithm of the concentration of this
+        ``DefectChargeState`` at a specified Fermi energy and temperature, per
+        site in the unit cell. Unlike :meth:`get_concentration` this cannot
+        underflow to zero or overflow, however large the formation energy or
+        low the temperature.
+
+        Args:
+            e_fermi (float): Fermi energy.
+            temperature (float): Temperature.
+
+        Returns:
+            float: log of the concentration at the specified Fermi energy and
+            temperature (``-np.inf`` for a fixed concentration of zero).
+        """
+        if self.fixed_concentration is None:
+            return np.log(self.degeneracy) - self.get_formation_energy(e_fermi) / (
+                kboltz * temperature
+            )
+        return float(safe_log(self.fixed_concentration))
+
     def __repr__(self):
         if self.fixed_concentration == None:
             return f"q={self.charge:+2}, e={self.energy}, deg={self.degeneracy}"
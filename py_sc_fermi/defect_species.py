@@ -1,6 +1,7 @@
 import numpy as np
 from typing import List, Dict, Tuple, Optional
-from py_sc_fermi.defect_charge_state import DefectChargeState
+from py_sc_fermi.defect_charge_state import DefectChargeState, kboltz
+from py_sc_fermi.log_space import logsumexp, safe_log
 
 
 class DefectSpecies(object):
@@ -17,6 +18,14 @@ class DefectSpecies(object):
 
     """
 
+    __slots__ = (
+        "_name",
+        "_nsites",
+        "_charge_states",
+        "_fixed_concentration",
+        "_partition",
+    )
+
     def __init__(
         self,
         name: str,
@@ -30,6 +39,7 @@ class DefectSpecies(object):
         self._nsites = nsites
         self._charge_states = charge_states
         self._fixed_concentration = fixed_concentration
+        self._partition: Optional[_ChargeStatePartition] = None
 
     def fix_concentration(self, concentration: float) -> None:
         """fix the concentration of this ``DefectSpecies``
@@ -38,6 +48,25 @@ class DefectSpecies(object):
             concentration (float): concentration per unit cell
         """
         self._fixed_concentration = concentration
+        self._partition = None
+
+    def _charge_state_partition(self) -> "_ChargeStatePartition":
+        """the charge states split into those with fixed and with variable
+        concentrations, built once and reused until one of these
+        ``DefectChargeState`` objects is fixed or has its formation energy
+        changed (which changes its version), or a charge state is added to or
+        removed from ``self.charge_states``. A charge state may be shared
+        with other ``DefectSpecies``, as each checks the versions itself."""
+        partition = self._partition
+        members = tuple(self._charge_states.values())
+        if (
+            partition is None
+            or partition.members != members
+            or partition.versions != tuple(cs._version for cs in members)
+        ):
+            partition = _ChargeStatePartition(self._charge_states)
+            self._partition = partition
+        return partition
 
     @property
     def name(self) -> str:
@@ -125,7 +154,15 @@ class DefectSpecies(object):
                 formation_energy = None
             else:
                 formation_energy = float(c["formation_energy"])
-            if formation_energy == None and fixed_concentration == None:
+            if "reference_energy" not in list(c.keys()):
+                reference_energy = None
+            else:
+                reference_energy = float(c["reference_energy"])
+            if (
+                formation_energy == None
+                and reference_energy == None
+                and fixed_concentration == None
+            ):
                 raise ValueError(
                     f"{name, n} must have one or both fixed concentration or formation energy"
                 )
@@ -134,6 +171,8 @@ class DefectSpecies(object):
                 energy=formation_energy,
                 degeneracy=c["degeneracy"],
                 fixed_concentration=fixed_concentration,
+                element_changes=c.get("element_changes"),
+                reference_energy=reference_energy,
             )
             charge_states.append(charge_state)
 
@@ -242,35 +281,28 @@ class DefectSpecies(object):
 
     def tl_profile(self, efermi_min: float, efermi_max: float) -> np.ndarray:
         """get transition level profile for this ``DefectSpecies`` between a
-        minimum and maximum Fermi energy.
+        minimum and maximum Fermi energy: the lowest formation energy of its
+        variable-concentration charge states, as computed by
+        :func:`lower_envelope`.
 
         Args:
             efermi_min (float): minimum Fermi energy
             efermi_max (float): maximum Fermi energy
 
         Returns:
-            np.ndarray: transition level profile between efermi_min
-            and efermi_max.
+            np.ndarray: ``[e_fermi, formation_energy]`` of the transition
+            levels between efermi_min and efermi_max, preceded and followed
+            by the end points of the profile.
+
+        Raises:
+            ValueError: if no charge state has a variable concentration
         """
-        cs = self.min_energy_charge_state(efermi_min)
-        q1 = cs.charge
-        form_e = cs.get_formation_energy(efermi_min)
-        points = [(efermi_min, form_e)]
-        while q1 != min(self.charges):
-            qlist = [q for q in self.charges if q < q1]
-            nextp, nextq = min(
-                ((self.get_transition_level_and_energy(q1, q2), q2) for q2 in qlist),
-                key=lambda p: p[0][0],
+        charges, energies, _ = self._charge_state_partition().arrays()
+        if len(charges) == 0:
+            raise ValueError(
+                f"{self.name} has no charge states with variable concentrations"
             )
-            if nextp[0] < efermi_max:
-                points.append(nextp)
-                q1 = nextq
-            else:
-                break
-        cs = self.min_energy_charge_state(efermi_max)
-        form_e = cs.get_formation_energy(efermi_max)
-        points.append((efermi_max, form_e))
-        return np.array(points)
+        return lower_envelope(charges, energies, efermi_min, efermi_max)
 
     def get_transition_level_and_energy(self, q1: int, q2: int) -> Tuple[float, float]:
         """Calculates the Fermi energy and formation
@@ -311,6 +343,24 @@ class DefectSpecies(object):
         else:
             return sum(self.charge_state_concentrations(e_fermi, temperature).values())
 
+    def get_log_concentration(self, e_fermi: float, temperature: float) -> float:
+        """natural logarithm of :meth:`get_concentration`, evaluated in log
+        space so that it does not underflow at low temperatures or for large
+        formation energies.
+
+        Args:
+            e_fermi (float): fermi energy
+            temperature (float): temperature
+
+        Returns:
+            float: log of the concentration per calculation cell of this
+            ``DefectSpecies``
+        """
+        if self.fixed_concentration:
+            return float(safe_log(self.fixed_concentration))
+        log_concs = self.log_charge_state_concentrations(e_fermi, temperature)
+        return float(logsumexp(list(log_concs.values())))
+
     def fixed_conc_charge_states(self,) -> Dict[int, DefectChargeState]:
         """get ``DefectChargeState`` objects of this ``DefectSpecies`` with fixed
         concentration (i.e those for which ``DefectChargeState.fixed_concentration != None``)
@@ -320,11 +370,7 @@ class DefectSpecies(object):
             concentration ``DefectChargeState`` objects, and the charge state
             which is variable, i.e. ``{DefectChargeState.charge : DefectChargeState}``
         """
-        return {
-            q: cs
-            for q, cs in self.charge_states.items()
-            if cs.fixed_concentration is not None
-        }
+        return dict(self._charge_state_partition().fixed)
 
     def variable_conc_charge_states(self) -> Dict[int, DefectChargeState]:
         """get ``DefectChargeState`` objects in this ``DefectSpecies`` with variable
@@ -336,11 +382,7 @@ class DefectSpecies(object):
             and the charge state which is variable, i.e.
             ``{DefectChargeState.charge : DefectChargeState}``
         """
-        return {
-            q: cs
-            for q, cs in self.charge_states.items()
-            if cs.fixed_concentration is None
-        }
+        return dict(self._charge_state_partition().variable)
 
     def charge_state_concentrations(
         self, e_fermi: float, temperature: float
@@ -359,38 +401,29 @@ class DefectSpecies(object):
             {``DefectChargeState.charge``: concentration}
         """
 
-        var_concs = self.variable_conc_charge_states()
-        fixed_concs = self.fixed_conc_charge_states()
-
-        cs_concentrations = {
-            cs.charge: cs.get_concentration(e_fermi, temperature) * self.nsites
-            for cs in var_concs.values()
-        }
-        for q, cs in fixed_concs.items():
-            cs_concentrations[q] = cs.get_concentration(e_fermi, temperature)
-
-        if self.fixed_concentration is not None:
-            fixed_conc_chg_states = sum(
-                [
-                    c
-                    for q, c in cs_concentrations.items()
-                    if q in self.fixed_conc_charge_states()
-                ]
-            )
-            variable_conc_chg_states = sum(
-                [
-                    c
-                    for q, c in cs_concentrations.items()
-                    if q in self.variable_conc_charge_states()
-                ]
-            )
-            constrained_conc = self.fixed_concentration - fixed_conc_chg_states
-            scaling = constrained_conc / variable_conc_chg_states
-            for q in cs_concentrations:
-                if q in self.variable_conc_charge_states():
-                    cs_concentrations[q] *= scaling
+        partition = self._charge_state_partition()
+        concentrations = self._variable_concentrations(partition, e_fermi, temperature)
+        cs_concentrations = dict(zip(partition.variable, concentrations.tolist()))
+        cs_concentrations.update(partition.fixed_concentrations)
         return cs_concentrations
 
+    def _variable_concentrations(
+        self, partition: "_ChargeStatePartition", e_fermi: float, temperature: float
+    ) -> np.ndarray:
+        """concentrations of the variable-concentration ``DefectChargeState``
+        objects, in the order of ``partition.variable``, scaled to the fixed
+        concentration of this ``DefectSpecies`` if it has one"""
+        charges, energies, degeneracies = partition.arrays()
+        concentrations = (
+            self.nsites
+            * degeneracies
+            * np.exp(-(energies + charges * e_fermi) / (kboltz * temperature))
+        )
+        if self.fixed_concentration is not None and len(concentrations) > 0:
+            constrained_conc = self.fixed_concentration - partition.fixed_total()
+            concentrations *= constrained_conc / np.sum(concentrations)
+        return concentrations
+
     def defect_charge_contributions(
         self, e_fermi: float, temperature: float
     ) -> Tuple[float, float]:
@@ -416,3 +449,195 @@ class DefectSpecies(object):
             if q > 0:
                 lhs += concd * abs(q)
         return lhs, rhs
+
+    def log_charge_state_concentrations(
+        self, e_fermi: float, temperature: float
+    ) -> Dict[int, float]:
+        """natural logarithms of :meth:`charge_state_concentrations`, evaluated
+        in log space. If this ``DefectSpecies`` has a fixed concentration, the
+        variable-concentration ``DefectChargeState`` objects are renormalised
+        with a log-sum-exp, so the result stays finite however small the
+        Boltzmann factors are.
+
+        Args:
+            e_fermi (float): Fermi energy
+            temperature (float): temperature
+
+        Returns:
+            Dict[int, float]: key-value pairs of charge of each
+            ``DefectChargeState`` and the log of the concentration of the
+            ``DefectChargeState`` with that charge
+        """
+        partition = self._charge_state_partition()
+        charges, energies, degeneracies = partition.arrays()
+        log_variable = (
+            np.log(self.nsites)
+            + np.log(degeneracies)
+            - (energies + charges * e_fermi) / (kboltz * temperature)
+        )
+        if self.fixed_concentration is not None and len(log_variable) > 0:
+            constrained_conc = self.fixed_concentration - partition.fixed_total()
+            log_variable += safe_log(constrained_conc) - logsumexp(log_variable)
+        log_concs = dict(zip(partition.variable, log_variable.tolist()))
+        for q, concentration in partition.fixed_concentrations.items():
+            log_concs[q] = float(safe_log(concentration))
+        return {q: log_concs[q] for q in self.charge_states}
+
+    def log_defect_charge_contributions(
+        self, e_fermi: float, temperature: float
+    ) -> Tuple[float, float]:
+        """natural logarithms of the positive and negative charge contributions
+        returned by :meth:`defect_charge_contributions`, evaluated in log space.
+
+        Args:
+            e_fermi (float): Fermi energy.
+            temperature (float): temperature
+
+        Returns:
+            Tuple[float, float]: log of the positive and of the negative
+            charge contributions (``-np.inf`` if there are none)
+        """
+        log_concs = self.log_charge_state_concentrations(e_fermi, temperature)
+        lhs = [c + np.log(q) for q, c in log_concs.items() if q > 0]
+        rhs = [c + np.log(-q) for q, c in log_concs.items() if q < 0]
+        return float(logsumexp(lhs)), float(logsumexp(rhs))
+
+    def defect_charge_derivative(self, e_fermi: float, temperature: float) -> float:
+        """
+        Calculate the derivative, with respect to the Fermi energy, of the net
+        negative charge (negative minus positive charge contributions) of this
+        ``DefectSpecies`` at a given Fermi energy and temperature.
+
+        Each variable-concentration ``DefectChargeState`` contributes
+        ``q**2 / kT`` times its concentration. If this ``DefectSpecies`` has a
+        fixed total concentration, the renormalisation of the
+        variable-concentration charge states is accounted for, so only the
+        spread of charge about the mean charge of those states contributes.
+
+        Args:
+            e_fermi (float): Fermi energy.
+            temperature (float): temperature
+
+        Returns:
+            float: derivative of the net negative defect charge per eV
+        """
+        partition = self._charge_state_partition()
+        charges, _, _ = partition.arrays()
+        concs = self._variable_concentrations(partition, e_fermi, temperature)
+        if self.fixed_concentration is not None:
+            mean_charge = np.sum(charges * concs) / np.sum(concs)
+            return np.sum(charges * (charges - mean_charge) * concs) / (
+                kboltz * temperature
+            )
+        return np.sum(charges ** 2 * concs) / (kboltz * temperature)
+
+
+def lower_envelope(
+    charges: np.ndarray,
+    energies: np.ndarray,
+    efermi_min: float,
+    efermi_max: float,
+) -> np.ndarray:
+    """The lowest of the formation energies ``energies + charges * e_fermi``
+    of a set of charge states, as a function of the Fermi energy between
+    ``efermi_min`` and ``efermi_max``.
+
+    The lower envelope of the formation-energy lines is built with the convex
+    hull trick: the lines are sorted by decreasing charge (the order in which
+    they can be lowest as the Fermi energy increases), then a line is
+    discarded whenever the next one crosses its predecessor before it does.
+    This takes O(n log n) time for n charge states.
+
+    Args:
+        charges (np.ndarray): charge of each charge state
+        energies (np.ndarray): formation energy of each charge state at
+          E[Fermi] = 0
+        efermi_min (float): minimum Fermi energy
+        efermi_max (float): maximum Fermi energy
+
+    Returns:
+        np.ndarray: ``[e_fermi, formation_energy]`` of each kink (transition
+        level) strictly between ``efermi_min`` and ``efermi_max``, in order of
+        increasing Fermi energy, preceded by the point at ``efermi_min`` and
+        followed by the point at ``efermi_max``.
+    """
+    charges = np.asarray(charges, dtype=float)
+    energies = np.asarray(energies, dtype=float)
+    # for equal charges, the line with the lowest energy comes first
+    order = np.lexsort((energies, -charges))
+    q, e = charges[order].tolist(), energies[order].tolist()
+    hull: List[int] = []
+    for i in range(len(q)):
+        if hull and q[hull[-1]] == q[i]:
+            continue
+        # line b is never lowest if line c crosses line a before line b does
+        while len(hull) >= 2:
+            a, b = hull[-2], hull[-1]
+            if (e[i] - e[a]) * (q[a] - q[b]) > (e[b] - e[a]) * (q[a] - q[i]):
+                break
+            hull.pop()
+        hull.append(i)
+    q_hull, e_hull = np.array(q)[hull], np.array(e)[hull]
+    kinks = (e_hull[1:] - e_hull[:-1]) / (q_hull[:-1] - q_hull[1:])
+    first = np.searchsorted(kinks, efermi_min, side="right")
+    last = np.searchsorted(kinks, efermi_max, side="left")
+    e_fermi = np.concatenate([[efermi_min], kinks[first:last], [efermi_max]])
+    lines = np.concatenate([[first], np.arange(first, last), [last]])
+    return np.column_stack([e_fermi, e_hull[lines] + q_hull[lines] * e_fermi])
+
+
+class _ChargeStatePartition(object):
+    """The ``DefectChargeState`` objects of a ``DefectSpecies`` split into
+    those with fixed and with variable concentrations, and the charges,
+    formation energies and degeneracies of the variable-concentration ones as
+    arrays, so that these are not rebuilt at every evaluation. Only valid
+    while the version of each member is unchanged (see
+    ``DefectSpecies._charge_state_partition``).
+
+    Args:
+        charge_states (Dict[int, DefectChargeState]): charge states of the
+          ``DefectSpecies``
+    """
+
+    __slots__ = (
+        "members",
+        "versions",
+        "fixed",
+        "variable",
+        "fixed_concentrations",
+        "_arrays",
+        "_fixed_total",
+    )
+
+    def __init__(self, charge_states: Dict[int, DefectChargeState]):
+        self.members = tuple(charge_states.values())
+        self.versions = tuple(cs._version for cs in self.members)
+        self.fixed: Dict[int, DefectChargeState] = {}
+        self.variable: Dict[int, DefectChargeState] = {}
+        self.fixed_concentrations: Dict[int, float] = {}
+        for q, cs in charge_states.items():
+            if cs.fixed_concentration is None:
+                self.variable[q] = cs
+            else:
+                self.fixed[q] = cs
+                self.fixed_concentrations[q] = cs.fixed_concentration
+        self._arrays: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        self._fixed_total: Optional[float] = None
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """charges, formation energies (at E[Fermi] = 0) and degeneracies of
+        the variable-concentration charge states"""
+        if self._arrays is None:
+            states = self.variable.values()
+            self._arrays = (
+                np.array([cs.charge for cs in states], dtype=float),
+                np.array([cs.energy for cs in states], dtype=float),
+                np.array([cs.degeneracy for cs in states], dtype=float),
+            )
+        return self._arrays
+
+    def fixed_total(self) -> float:
+        """total concentration of the fixed-concentration charge states"""
+        if self._fixed_total is None:
+            self._fixed_total = sum(self.fixed_concentrations.values())
+        return self._fixed_total
@@ -1,7 +1,29 @@
-from typing import Dict, List, Tuple, Any
-from py_sc_fermi.dos import DOS
+from typing import Callable, Dict, List, Tuple, Any, Optional, Union
+from numpy.typing import ArrayLike
+from py_sc_fermi.dos import DOS, DensityOfStates
+from py_sc_fermi.parabolic_bands import ParabolicBandDOS
 from py_sc_fermi.defect_species import DefectSpecies
 from py_sc_fermi.inputs import InputSet
+from py_sc_fermi.compiled_defect_system import CompiledDefectSystem
+from py_sc_fermi.solvers import (
+    RootResult,
+    brent,
+    get_solver,
+    vectorised_bisection,
+    GRADIENT_SOLVERS,
+)
+from py_sc_fermi.results import (
+    ChemicalPotentialSweep,
+    ConcentrationMap,
+    InverseSolution,
+    QuenchSweep,
+    SCFermiSolution,
+    TemperatureSweep,
+)
+from py_sc_fermi.defect_charge_state import kboltz
+from py_sc_fermi.log_space import logsumexp
+from dataclasses import replace
+from copy import copy
 import numpy as np
 
 
@@ -15,31 +37,60 @@ class DefectSystem(object):
         defect_species (List[DefectSpecies]): List of ``DefectSpecies`` objects
           which are present in the ``DefectSystem``.
         volume (float): volume of the unit cell in Angstroms cubed
-        dos (DOS): the ``DOS`` object associated with the unit cell
+        dos (Union[DOS, ParabolicBandDOS]): the ``DOS`` object associated with
+          the unit cell, or a ``ParabolicBandDOS`` describing its band edges
+          by their effective masses
         temperature (float): temperature at which self-consentient Fermi energy
           will be solved for.
         convergence_tolerance (float): the charge neutrality tolerance for the
           self-consistent Fermi energy solver. Defaults to ``1e-18``.
-        n_trial_steps (int): the maximum number of steps to take in the
-          self-consistent Fermi energy solver. Defaults to 1500.
+        n_trial_steps (int): the maximum number of evaluations of the net
+          charge allowed in the self-consistent Fermi energy solver.
+          Defaults to 1500.
+        solver (str): the bracketed root-finding method used to solve for the
+          self-consistent Fermi energy, one of ``"brent"``, ``"itp"``,
+          ``"bisection"`` or ``"newton"``. Defaults to ``"brent"``.
+        log_space (bool): if True, solve for the root of the log of the ratio
+          of negative to positive charge (see
+          ``CompiledDefectSystem.log_charge_balance``), with all concentrations
+          evaluated in log space, rather than for the root of the net charge.
+          This is robust at very low temperatures and for large formation
+          energies, where the concentrations underflow in linear space, and
+          ``convergence_tolerance`` then applies to the log charge balance
+          (i.e. it is a relative tolerance). Defaults to False.
+        carrier_table_tolerance (Optional[float]): if given, the solver looks
+          up the carrier concentrations in a table built once per temperature
+          (see ``DOS.carrier_table``), accurate to this relative tolerance,
+          rather than integrating over the ``DOS`` at every step. The
+          concentrations reported at the solution are always integrated
+          exactly. Worthwhile when solving many times at the same
+          temperature with a large ``DOS``. Defaults to None.
     """
 
     def __init__(
         self,
         defect_species: List[DefectSpecies],
-        dos: DOS,
+        dos: Union[DOS, ParabolicBandDOS],
         volume: float,
         temperature: float,
         convergence_tolerance: float = 1e-18,
         n_trial_steps: int = 1500,
+        solver: str = "brent",
+        log_space: bool = False,
+        carrier_table_tolerance: Optional[float] = None,
     ):
 
         self.defect_species = defect_species
         self.volume = volume
-        self.dos = dos
+        self.dos: DensityOfStates = dos
         self.temperature = temperature
         self.convergence_tolerance = convergence_tolerance
         self.n_trial_steps = n_trial_steps
+        self.solver = solver
+        self.log_space = log_space
+        self.carrier_table_tolerance = carrier_table_tolerance
+        # the last ``CompiledDefectSystem`` built, and what it was built from
+        self._compiled: Optional[Tuple[Tuple[Any, ...], CompiledDefectSystem]] = None
 
     def __repr__(self):
         to_return = [
@@ -82,6 +133,8 @@ class DefectSystem(object):
             temperature=input_set.temperature,
             convergence_tolerance=input_set.convergence_tolerance,
             n_trial_steps=input_set.n_trial_steps,
+            solver=input_set.solver,
+            log_space=input_set.log_space,
         )
 
     @classmethod
@@ -108,6 +161,8 @@ class DefectSystem(object):
             temperature=input_set.temperature,
             convergence_tolerance=input_set.convergence_tolerance,
             n_trial_steps=input_set.n_trial_steps,
+            solver=input_set.solver,
+            log_space=input_set.log_space,
         )
 
     def defect_species_by_name(self, name: str) -> DefectSpecies:
@@ -122,6 +177,40 @@ class DefectSystem(object):
         """
         return [ds for ds in self.defect_species if ds.name == name][0]
 
+    def compile(self) -> CompiledDefectSystem:
+        """pack the charges, formation energies, degeneracies, site
+        degeneracies and fixed concentrations of all ``DefectChargeState``
+        and ``DefectSpecies`` objects into flat arrays for fast, vectorised
+        evaluation of the defect concentrations and net charge.
+
+        Returns:
+            CompiledDefectSystem: array-backed snapshot of this ``DefectSystem``
+
+        Note:
+            The returned object is a snapshot: changes made to the
+            ``DefectSpecies`` afterwards (e.g. ``fix_concentration``) are not
+            reflected in it, and ``compile`` should be called again. The
+            snapshot is cached, and only rebuilt once the ``DOS``, the volume,
+            the ``DefectSpecies`` or any of their charge-state partitions (see
+            ``DefectSpecies.fix_concentration`` and
+            ``DefectChargeState.fix_concentration``) have changed, so it
+            should be treated as read-only.
+        """
+        # the objects the snapshot is built from; those of the cached snapshot
+        # are kept alive by it, so comparing identities is safe
+        sources = (
+            self.dos,
+            *self.defect_species,
+            *(ds._charge_state_partition() for ds in self.defect_species),
+        )
+        if (
+            self._compiled is None
+            or self._compiled[1].volume != self.volume
+            or [id(x) for x in self._compiled[0]] != [id(x) for x in sources]
+        ):
+            self._compiled = (sources, CompiledDefectSystem.from_defect_system(self))
+        return self._compiled[1]
+
     def get_sc_fermi(self) -> Tuple[float, float]:
         """
         Solve to find Fermi energy in for which the ``DefectSystem`` is charge neutral
@@ -134,52 +223,571 @@ class DefectSystem(object):
             ``self.dos.emin`` and ``self.dos.emax``
 
         Note:
+            The net charge is monotonic in the Fermi energy, so the root is
+            bracketed by ``self.dos.emin()`` and ``self.dos.emax()`` and
+            located with the root-finding method named by ``self.solver``,
+            starting from the middle of the energy range. The net charge (and,
+            for the ``"newton"`` solver, its derivative) is evaluated with the
+            array-backed representation returned by :meth:`compile`.
             The solver will return the Fermi energy either when
-            ``self.convergence_tolerance`` is satisfied or when the solver has
-            attempted ``self.n_trial_steps``.
-            The residual is the the absolute charge density of
-            the solver at the end of the last step. Please ensure the residual
-            is satisfactorily low if convergence is not reached. It may be
-            prudent to investigate the convergence of the solver with respect to
-            ``self.n_trial_steps`` and ``self.convergence_tolerance``.
+            ``self.convergence_tolerance`` is satisfied, when the bracket
+            has shrunk to machine precision, or when the solver has
+            made ``self.n_trial_steps`` evaluations of the net charge.
+            The residual is the the absolute charge density at the returned
+            Fermi energy. Please ensure the residual is satisfactorily low if
+            convergence is not reached. It may be prudent to investigate the
+            convergence of the solver with respect to ``self.n_trial_steps``
+            and ``self.convergence_tolerance``.
         """
-        # initial guess
+        result = self._solve_kernel(self.compile(), self.temperature)
+        return result.root, result.residual
+
+    def _solve_kernel(
+        self,
+        kernel: CompiledDefectSystem,
+        temperature: float,
+        x0: Optional[float] = None,
+        step: Optional[float] = None,
+    ) -> RootResult:
+        """find the root of ``kernel.q_tot`` (or, if ``self.log_space``,
+        ``kernel.log_charge_balance``) at ``temperature`` with ``self.solver``,
+        starting from ``x0`` (the middle of the ``DOS`` energy range by
+        default). If ``step`` is given, the bracket is found by stepping
+        outwards from ``x0`` rather than from the ``DOS`` limits. If
+        ``self.carrier_table_tolerance`` is set, the carrier concentrations are
+        looked up in a ``CarrierTable`` during the search. The residual
+        returned is always the absolute net charge at the root, evaluated
+        exactly."""
         emin = self.dos.emin()
         emax = self.dos.emax()
-        direction = +1.0
-        e_fermi = (emin + emax) / 2.0
-        step = 1.0
-        reached_e_min = False
-        reached_e_max = False
-
-        # loop until convergence or max number of steps reached
-        for i in range(self.n_trial_steps):
-            q_tot = self.q_tot(e_fermi=e_fermi)
-            if e_fermi > emax:
-                if reached_e_min or reached_e_max:
-                    raise RuntimeError(f"No solution found between {emin} and {emax}")
-                reached_e_max = True
-                direction = -1.0
-            if e_fermi < emin:
-                if reached_e_max or reached_e_min:
-                    raise RuntimeError(f"No solution found between {emin} and {emax}")
-                reached_e_min = True
-                direction = +1.0
-            if abs(q_tot) < self.convergence_tolerance:
-                break
-            if q_tot > 0.0:
-                if direction == +1.0:
-                    step *= 0.25
-                    direction = -1.0
-            elif q_tot < 0.0:
-                if direction == -1.0:
-                    step *= 0.25
-                    direction = +1.0
-            e_fermi += step * direction
-
-        # return results
-        residual = abs(q_tot)
-        return e_fermi, residual
+        if x0 is None:
+            x0 = (emin + emax) / 2.0
+        solve = get_solver(self.solver)
+        search_kernel = kernel
+        if self.carrier_table_tolerance is not None:
+            search_kernel = copy(kernel)
+            search_kernel.dos = self.dos.carrier_table(
+                temperature, self.carrier_table_tolerance
+            )
+        func: Callable[[float, float], Union[float, np.ndarray]]
+        fprime: Callable[[float, float], Union[float, np.ndarray]]
+        if self.log_space:
+            func = search_kernel.log_charge_balance
+            fprime = search_kernel.log_charge_balance_derivative
+        else:
+            func, fprime = search_kernel.q_tot, search_kernel.dq_tot_de_fermi
+        kwargs = {}
+        if self.solver in GRADIENT_SOLVERS:
+            kwargs["fprime"] = lambda e_fermi: fprime(e_fermi, temperature)
+        result = solve(
+            lambda e_fermi: func(e_fermi, temperature),
+            emin,
+            emax,
+            ftol=self.convergence_tolerance,
+            maxiter=self.n_trial_steps,
+            x0=x0,
+            step=step,
+            **kwargs,
+        )
+        if self.log_space or search_kernel is not kernel:
+            result = replace(
+                result, residual=float(np.abs(kernel.q_tot(result.root, temperature)))
+            )
+        return result
+
+    def solve_temperatures(
+        self, temperatures: np.ndarray, vectorised: bool = False
+    ) -> TemperatureSweep:
+        """Solve for the self-consistent Fermi energy at each of an array of
+        temperatures, and evaluate the carrier and defect concentrations at
+        each solution. ``self.temperature`` is not changed.
+
+        By default the temperatures are solved in the order given, each solve
+        being warm-started from the Fermi energy found at the previous
+        temperature, so a finely spaced (e.g. sorted) grid needs only a few
+        evaluations of the net charge per temperature. If ``vectorised`` is
+        True, all temperatures are instead solved simultaneously by bisection
+        over arrays, which is faster for large grids of independent
+        temperatures.
+
+        Args:
+            temperatures (np.ndarray): temperatures at which to solve
+            vectorised (bool, optional): solve all temperatures at once by
+              vectorised bisection rather than one at a time with
+              ``self.solver``. Defaults to False.
+
+        Raises:
+            RuntimeError: if no solution is found between ``self.dos.emin()``
+              and ``self.dos.emax()`` at any temperature
+
+        Returns:
+            TemperatureSweep: Fermi energies, carrier concentrations and
+            defect concentrations at each temperature
+        """
+        temperatures = np.atleast_1d(np.asarray(temperatures, dtype=float))
+        kernel = self.compile()
+        if vectorised:
+            fermi_energies, residuals, iterations = self._solve_vectorised(
+                kernel, temperatures
+            )
+        else:
+            fermi_energies = np.zeros(temperatures.shape)
+            residuals = np.zeros(temperatures.shape)
+            iterations = np.zeros(temperatures.shape, dtype=int)
+            x0 = None
+            for i, temperature in enumerate(temperatures):
+                step = None if x0 is None else 4.0 * kboltz * temperature
+                result = self._solve_kernel(kernel, temperature, x0=x0, step=step)
+                fermi_energies[i] = x0 = result.root
+                residuals[i] = result.residual
+                iterations[i] = result.iterations
+        return TemperatureSweep(
+            temperatures=temperatures,
+            **self._sweep_fields(
+                kernel, fermi_energies, temperatures, residuals, iterations
+            ),
+        )
+
+    def quench(
+        self,
+        anneal_temperatures: np.ndarray,
+        quench_temperatures: np.ndarray,
+        freeze: str = "species",
+    ) -> QuenchSweep:
+        """Solve for the defect concentrations at each of an array of anneal
+        temperatures, then, with those concentrations frozen, for the
+        self-consistent Fermi energy and carrier concentrations at each of an
+        array of quench temperatures. This models a material equilibrated at
+        high temperature and cooled too quickly for its defects to
+        re-equilibrate.
+
+        Both stages are solved for all points at once by vectorised
+        bisection, the frozen concentrations being carried as arrays in a
+        single ``CompiledDefectSystem`` (see
+        ``CompiledDefectSystem.with_frozen_concentrations``), so the
+        ``DefectSystem`` is neither copied nor changed.
+
+        Args:
+            anneal_temperatures (np.ndarray): temperatures at which the defects
+              are equilibrated
+            quench_temperatures (np.ndarray): temperatures to which each
+              annealed system is quenched
+            freeze (str, optional): ``"species"`` to freeze the total
+              concentration of each ``DefectSpecies``, leaving its charge
+              states free to re-equilibrate, or ``"charge_states"`` to freeze
+              the concentration of every ``DefectChargeState``. Defaults to
+              ``"species"``.
+
+        Raises:
+            ValueError: if ``freeze`` is not recognised
+            RuntimeError: if no solution is found between ``self.dos.emin()``
+              and ``self.dos.emax()`` at any point
+
+        Returns:
+            QuenchSweep: Fermi energies, carrier concentrations and defect
+            concentrations at each pair of anneal and quench temperatures,
+            and the solutions at the anneal temperatures
+        """
+        if freeze not in ("species", "charge_states"):
+            raise ValueError(
+                f'freeze must be "species" or "charge_states", not "{freeze}"'
+            )
+        anneal_temperatures = np.atleast_1d(
+            np.asarray(anneal_temperatures, dtype=float)
+        )
+        quench_temperatures = np.atleast_1d(
+            np.asarray(quench_temperatures, dtype=float)
+        )
+        kernel = self.compile()
+        fermi_energies, residuals, iterations = self._solve_vectorised(
+            kernel, anneal_temperatures
+        )
+        anneal = TemperatureSweep(
+            temperatures=anneal_temperatures,
+            **self._sweep_fields(
+                kernel, fermi_energies, anneal_temperatures, residuals, iterations
+            ),
+        )
+        # one row of frozen concentrations per anneal temperature, broadcast
+        # against one column per quench temperature
+        frozen_kernel = kernel.with_frozen_concentrations(
+            anneal.charge_state_concentrations[:, None, :], freeze
+        )
+        temperatures = np.broadcast_to(
+            quench_temperatures, (len(anneal_temperatures), len(quench_temperatures))
+        )
+        fermi_energies, residuals, iterations = self._solve_vectorised(
+            frozen_kernel, temperatures
+        )
+        return QuenchSweep(
+            anneal_temperatures=anneal_temperatures,
+            quench_temperatures=quench_temperatures,
+            freeze=freeze,
+            anneal=anneal,
+            **self._sweep_fields(
+                frozen_kernel, fermi_energies, temperatures, residuals, iterations
+            ),
+        )
+
+    def set_chemical_potentials(self, chemical_potentials: Dict[str, float]) -> None:
+        """set the formation energy of every ``DefectChargeState`` with a
+        reference energy to its value at a given set of chemical potentials
+        (see ``DefectChargeState.formation_energy_at``).
+
+        Args:
+            chemical_potentials (Dict[str, float]): chemical potential of each
+              element
+        """
+        for ds in self.defect_species:
+            for cs in ds.charge_states.values():
+                cs.set_chemical_potentials(chemical_potentials)
+
+    def solve_chemical_potentials(
+        self,
+        chemical_potentials: np.ndarray,
+        elements: List[str],
+        vectorised: bool = False,
+    ) -> ChemicalPotentialSweep:
+        """Solve for the self-consistent Fermi energy at each of a series of
+        sets of chemical potentials, at ``self.temperature``, and evaluate the
+        carrier and defect concentrations at each solution. The formation
+        energies of all ``DefectChargeState`` objects at all points are
+        evaluated as a single matrix product from their
+        ``element_changes`` and ``reference_energy``, so the ``DefectSystem``
+        is neither rebuilt nor changed.
+
+        By default the points are solved in the order given, each solve being
+        warm-started from the Fermi energy found at the previous point, which
+        suits a path or a finely spaced grid through chemical-potential
+        space. If ``vectorised`` is True, all points are instead solved
+        simultaneously by bisection over arrays.
+
+        Args:
+            chemical_potentials (np.ndarray): chemical potentials, shape
+              ``(n_points, n_elements)``
+            elements (List[str]): element corresponding to each column of
+              ``chemical_potentials``. Elements that do not appear in the
+              ``element_changes`` of any ``DefectChargeState`` have no effect.
+            vectorised (bool, optional): solve all points at once by
+              vectorised bisection rather than one at a time with
+              ``self.solver``. Defaults to False.
+
+        Raises:
+            ValueError: if ``chemical_potentials`` does not have one column
+              per element
+            RuntimeError: if no solution is found between ``self.dos.emin()``
+              and ``self.dos.emax()`` at any point
+
+        Returns:
+            ChemicalPotentialSweep: Fermi energies, carrier concentrations and
+            defect concentrations at each set of chemical potentials
+        """
+        chemical_potentials = np.atleast_2d(
+            np.asarray(chemical_potentials, dtype=float)
+        )
+        elements = list(elements)
+        if chemical_potentials.shape[1] != len(elements):
+            raise ValueError(
+                f"chemical_potentials has {chemical_potentials.shape[1]} columns "
+                f"but {len(elements)} elements were given"
+            )
+        kernel = self.compile()
+        # reorder the columns to match the elements of the compiled system
+        mu = np.zeros((len(chemical_potentials), len(kernel.elements)))
+        for j, el in enumerate(kernel.elements):
+            if el in elements:
+                mu[:, j] = chemical_potentials[:, elements.index(el)]
+        grid_kernel = kernel.at_chemical_potentials(mu)
+        n_points = len(mu)
+        if vectorised:
+            fermi_energies, residuals, iterations = self._solve_vectorised(
+                grid_kernel, self.temperature
+            )
+        else:
+            fermi_energies = np.zeros(n_points)
+            residuals = np.zeros(n_points)
+            iterations = np.zeros(n_points, dtype=int)
+            x0 = None
+            step = 4.0 * kboltz * self.temperature
+            for i in range(n_points):
+                result = self._solve_kernel(
+                    kernel.at_chemical_potentials(mu[i]),
+                    self.temperature,
+                    x0=x0,
+                    step=None if x0 is None else step,
+                )
+                fermi_energies[i] = x0 = result.root
+                residuals[i] = result.residual
+                iterations[i] = result.iterations
+        return ChemicalPotentialSweep(
+            temperature=self.temperature,
+            elements=elements,
+            chemical_potentials=chemical_potentials,
+            **self._sweep_fields(
+                grid_kernel, fermi_energies, self.temperature, residuals, iterations
+            ),
+        )
+
+    def _solve_vectorised(
+        self, kernel: CompiledDefectSystem, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """solve for the roots of ``kernel.q_tot`` (or, if ``self.log_space``,
+        ``kernel.log_charge_balance``) at every point at once by vectorised
+        bisection. The points are the temperatures, or the leading axis of
+        the formation energies of ``kernel``, or both."""
+        func = kernel.log_charge_balance if self.log_space else kernel.q_tot
+        shape = np.shape(func(self.dos.emin(), temperature))
+        fermi_energies, residuals, nfev = vectorised_bisection(
+            lambda e_fermi: func(e_fermi, temperature),
+            np.full(shape, self.dos.emin()),
+            np.full(shape, self.dos.emax()),
+            ftol=self.convergence_tolerance,
+            maxiter=self.n_trial_steps,
+        )
+        if self.log_space:
+            residuals = np.abs(kernel.q_tot(fermi_energies, temperature))
+        return fermi_energies, residuals, np.full(shape, nfev)
+
+    def _sweep_fields(
+        self,
+        kernel: CompiledDefectSystem,
+        fermi_energies: np.ndarray,
+        temperature: ArrayLike,
+        residuals: np.ndarray,
+        iterations: np.ndarray,
+    ) -> Dict[str, Any]:
+        """evaluate the carrier and defect concentrations at each solved
+        point, as the fields of a ``ConcentrationSweep``"""
+        p0, n0 = kernel.carrier_concentrations(fermi_energies, temperature)
+        concentrations = kernel.charge_state_concentrations(fermi_energies, temperature)
+        return dict(
+            fermi_energies=fermi_energies,
+            residuals=residuals,
+            iterations=iterations,
+            p0=p0,
+            n0=n0,
+            species_names=kernel.species_names,
+            species_concentrations=kernel._species_totals(concentrations),
+            charges=kernel.charges,
+            species_index=kernel.species_index,
+            charge_state_concentrations=concentrations,
+            volume=self.volume,
+        )
+
+    def concentration_map(
+        self, e_fermi: np.ndarray, temperature: Optional[float] = None
+    ) -> ConcentrationMap:
+        """Evaluate the carrier and defect concentrations at each of an array
+        of Fermi energies, e.g. to plot concentrations against the Fermi
+        energy. The concentrations of all charge states at all Fermi energies
+        are evaluated together as arrays, and the hole and electron
+        concentrations in a single pass over the ``DOS``. No solve is made,
+        and ``self.temperature`` is not changed.
+
+        Args:
+            e_fermi (np.ndarray): Fermi energies
+            temperature (float, optional): temperature. Defaults to
+              ``self.temperature``.
+
+        Returns:
+            ConcentrationMap: carrier concentrations, defect concentrations
+            (per ``DefectSpecies`` and per ``DefectChargeState``) and net
+            charge at each Fermi energy
+        """
+        e_fermi = np.atleast_1d(np.asarray(e_fermi, dtype=float))
+        if temperature is None:
+            temperature = self.temperature
+        kernel = self.compile()
+        fields = self._sweep_fields(
+            kernel,
+            e_fermi,
+            temperature,
+            np.zeros(e_fermi.shape),
+            np.zeros(e_fermi.shape, dtype=int),
+        )
+        net_charge = (
+            fields["n0"]
+            - fields["p0"]
+            - fields["charge_state_concentrations"] @ kernel.charges
+        )
+        fields["residuals"] = np.abs(net_charge)
+        return ConcentrationMap(
+            temperature=temperature, net_charge=net_charge, **fields
+        )
+
+    def solve(self) -> SCFermiSolution:
+        """Solve for the self-consistent Fermi energy and evaluate the carrier
+        and defect concentrations at that Fermi energy.
+
+        Returns:
+            SCFermiSolution: the Fermi energy, residual, number of iterations,
+            carrier concentrations and concentrations of every
+            ``DefectChargeState`` and ``DefectSpecies``.
+
+        Raises:
+          RuntimeError: if the solver fails does not find a valid solution within
+            ``self.dos.emin`` and ``self.dos.emax``
+        """
+        kernel = self.compile()
+        result = self._solve_kernel(kernel, self.temperature)
+        return SCFermiSolution.from_compiled(kernel, result, self.temperature)
+
+    def solve_for_target(
+        self,
+        target: str,
+        target_value: float,
+        species: str,
+        bounds: Tuple[float, float],
+        unknown: str = "concentration",
+        per_volume: bool = True,
+        tolerance: float = 1e-6,
+        max_iterations: int = 100,
+    ) -> InverseSolution:
+        """Find the fixed total concentration of one ``DefectSpecies`` (e.g. a
+        dopant), or the offset to the formation energies of all of its
+        charge states (e.g. a change in the dopant chemical potential), at
+        which the self-consistent solution at ``self.temperature`` has a
+        target hole or electron concentration, Fermi energy or defect
+        concentration. The ``DefectSystem`` is not changed.
+
+        The target is monotonic in the unknown, so the unknown is found by
+        Brent's method within ``bounds`` (on a logarithmic scale for a
+        concentration), each step making one self-consistent solve of a
+        ``CompiledDefectSystem`` with the unknown applied (see
+        ``CompiledDefectSystem.with_fixed_concentrations`` and
+        ``CompiledDefectSystem.with_energy_offsets``). Each solve is
+        warm-started from the Fermi energy found at the previous step, so
+        needs only a few evaluations of the net charge. If every charge
+        state of ``species`` has a fixed concentration, a fixed total
+        concentration scales them in proportion.
+
+        Args:
+            target (str): ``"n0"``, ``"p0"``, ``"fermi_energy"`` or the name
+              of a ``DefectSpecies`` whose concentration is the target
+            target_value (float): value to reach: a concentration (cm^-3 if
+              ``per_volume``, else per unit cell) or a Fermi energy (eV)
+            species (str): name of the ``DefectSpecies`` to vary
+            bounds (Tuple[float, float]): lower and upper bounds on the
+              unknown: concentrations (in the same units as ``target_value``)
+              or formation energy offsets (eV)
+            unknown (str, optional): ``"concentration"`` to vary the fixed
+              total concentration of ``species``, or ``"energy_offset"`` to
+              vary an offset added to its formation energies. Defaults to
+              ``"concentration"``.
+            per_volume (bool, optional): if True, concentrations are in units
+              of cm^-3, else per unit cell. Defaults to True.
+            tolerance (float, optional): tolerance on the target: relative
+              for a concentration, in eV for the Fermi energy. Defaults to
+              1e-6.
+            max_iterations (int, optional): largest number of self-consistent
+              solves. Defaults to 100.
+
+        Raises:
+            ValueError: if ``target``, ``species`` or ``unknown`` is not
+              recognised
+            RuntimeError: if the target value is not reached between the
+              bounds
+
+        Returns:
+            InverseSolution: the unknown found, the target value reached and
+            the self-consistent solution there
+        """
+        if unknown not in ("concentration", "energy_offset"):
+            raise ValueError(
+                f'unknown must be "concentration" or "energy_offset", not "{unknown}"'
+            )
+        kernel = self.compile()
+        if species not in kernel.species_names:
+            raise ValueError(f"{species} is not one of {kernel.species_names}")
+        scale = 1e24 / self.volume if per_volume else 1.0
+        temperature = self.temperature
+
+        # the target measured at a solution, on the scale on which it is
+        # matched: the Fermi energy itself, or the log of a concentration
+        if target == "fermi_energy":
+
+            def measure(compiled: CompiledDefectSystem, e_fermi: float) -> float:
+                return e_fermi
+
+        elif target in ("p0", "n0"):
+            carrier = ("p0", "n0").index(target)
+
+            def measure(compiled: CompiledDefectSystem, e_fermi: float) -> float:
+                p0, n0 = compiled.carrier_concentrations(e_fermi, temperature)
+                return float(np.log((p0, n0)[carrier]))
+
+        elif target in kernel.species_names:
+            i = kernel.species_names.index(target)
+
+            def measure(compiled: CompiledDefectSystem, e_fermi: float) -> float:
+                return np.log(compiled.species_concentrations(e_fermi, temperature)[i])
+
+        else:
+            raise ValueError(
+                f'target must be "n0", "p0", "fermi_energy" or one of '
+                f"{kernel.species_names}, not {target}"
+            )
+        goal = (
+            target_value if target == "fermi_energy" else np.log(target_value / scale)
+        )
+
+        if unknown == "concentration":
+            lower, upper = np.log(np.asarray(bounds, dtype=float) / scale)
+
+            def with_unknown(x: float) -> CompiledDefectSystem:
+                return kernel.with_fixed_concentrations({species: np.exp(x)})
+
+        else:
+            lower, upper = bounds
+
+            def with_unknown(x: float) -> CompiledDefectSystem:
+                return kernel.with_energy_offsets({species: x})
+
+        # the solve at each value of the unknown tried, and its mismatch
+        solves: Dict[float, Tuple[CompiledDefectSystem, RootResult, float]] = {}
+        e_fermi: Optional[float] = None
+
+        def mismatch(x: float) -> float:
+            nonlocal e_fermi
+            if x not in solves:
+                compiled = with_unknown(x)
+                step = None if e_fermi is None else 4.0 * kboltz * temperature
+                result = self._solve_kernel(
+                    compiled, temperature, x0=e_fermi, step=step
+                )
+                e_fermi = result.root
+                solves[x] = (compiled, result, measure(compiled, result.root) - goal)
+            return solves[x][2]
+
+        if np.sign(mismatch(lower)) == np.sign(mismatch(upper)):
+            raise RuntimeError(
+                f"{target} = {target_value} is not reached with the {unknown} of "
+                f"{species} between {bounds[0]} and {bounds[1]}"
+            )
+        outer = brent(mismatch, lower, upper, ftol=tolerance, maxiter=max_iterations)
+        compiled, result, _ = solves[outer.root]
+        solution = SCFermiSolution.from_compiled(compiled, result, temperature)
+        if target == "fermi_energy":
+            reached = solution.fermi_energy
+        elif target in ("p0", "n0"):
+            reached = getattr(solution, target) * scale
+        else:
+            reached = solution.species_concentrations[target] * scale
+        return InverseSolution(
+            target=target,
+            target_value=reached,
+            species=species,
+            unknown=unknown,
+            unknown_value=(
+                float(np.exp(outer.root) * scale)
+                if unknown == "concentration"
+                else float(outer.root)
+            ),
+            converged=outer.converged,
+            iterations=len(solves),
+            evaluations=sum(result.iterations for _, result, _ in solves.values()),
+            solution=solution,
+        )
 
     def report(self) -> None:
         """print a report in the style of `SC-Fermi <https://github.com/jbuckeridge/sc-fermi>`_
@@ -188,40 +796,7 @@ class DefectSystem(object):
 
     def _get_report_string(self) -> str:
         """generate string to facilitate self.report()"""
-        string = ""
-        e_fermi = self.get_sc_fermi()[0]
-        string += f"Temperature :      {self.temperature}  (K)\n"
-        string += f"SC Fermi level :      {e_fermi}  (eV)\n"
-        p0, n0 = self.dos.carrier_concentrations(e_fermi, self.temperature)
-        string += "Concentrations:\n"
-        string += f"n (electrons)  : {n0 * 1e24 / self.volume} cm^-3\n"
-        string += f"p (holes)      : {p0 * 1e24 / self.volume} cm^-3\n"
-        for ds in self.defect_species:
-            concall = ds.get_concentration(e_fermi, self.temperature)
-            if ds.fixed_concentration == None:
-                string += f"{ds.name:9}      : {concall * 1e24 / self.volume} cm^-3, (percentage of defective sites: {(concall / ds.nsites) * 100:.3} %)\n"
-            else:
-                string += (
-                    f"{ds.name:9}      : {concall * 1e24 / self.volume} cm^-3 [fixed]\n"
-                )
-        string += "\nBreakdown of concentrations for each defect charge state:\n"
-        for ds in self.defect_species:
-            concall = ds.get_concentration(e_fermi, self.temperature)
-            string += "---------------------------------------------------------\n"
-            if concall == 0.0:
-                string += f"{ds.name:11}: Zero total - cannot give breakdown\n"
-                continue
-            string += f"{ds.name:11}: Charge Concentration(cm^-3) Total\n"
-            for q, conc in ds.charge_state_concentrations(
-                e_fermi, self.temperature
-            ).items():
-                if ds.charge_states[q].fixed_concentration:
-                    fix_str = " [fixed]"
-                else:
-                    fix_str = ""
-
-                string += f"           : {q: 1}  {conc * 1e24 / self.volume:5e}          {(conc * 100 / concall):.2f} {fix_str}\n"
-        return string
+        return self.solve().report_string()
 
     def total_defect_charge_contributions(self, e_fermi: float) -> Tuple[float, float]:
         """
@@ -262,26 +837,69 @@ class DefectSystem(object):
         lhs = p0 + lhs_def
         rhs = n0 + rhs_def
         diff = rhs - lhs
-        return diff
+        return float(diff)
 
-    def get_transition_levels(self) -> Dict[str, List[List]]:
-        """Return transition_levels transition levels profiles of all ``DefectSpecies``
-        all defects as dictionary of ``{DefectSpecies.name : [e_fermi, e_formation]}``
-        over the whole density of states energy range.
+    def log_charge_balance(self, e_fermi: float) -> float:
+        """for a given Fermi energy, calculate the log of the ratio of the
+        charge contributions from all negative species (including electrons)
+        to those from all positive species (including holes), evaluated in log
+        space. This has the same sign as :meth:`q_tot` but does not underflow
+        when the concentrations do, and is used by the solver if
+        ``self.log_space`` is True.
+
+        Args:
+            e_fermi (float): Fermi energy
 
         Returns:
-            Dict[str, List[List]]: Dictionary giving per-defect transition-level
-            profiles.
+            float: log of the ratio of negative to positive charge at ``e_fermi``
         """
-        transition_levels = {}
-        for defect_species in self.defect_species_names:
-            transition_level = self.defect_species_by_name(defect_species).tl_profile(
-                self.dos.emin(), self.dos.emax()
-            )
-            x = [[x_value][0][0] for x_value in transition_level]
-            y = [[y_value][0][1] for y_value in transition_level]
-            transition_levels.update({defect_species: [x, y]})
-        return transition_levels
+        log_p0, log_n0 = self.dos.log_carrier_concentrations(e_fermi, self.temperature)
+        contrib = np.array(
+            [
+                ds.log_defect_charge_contributions(e_fermi, self.temperature)
+                for ds in self.defect_species
+            ]
+        ).reshape(-1, 2)
+        log_lhs = logsumexp(np.append(contrib[:, 0], log_p0))
+        log_rhs = logsumexp(np.append(contrib[:, 1], log_n0))
+        return float(log_rhs - log_lhs)
+
+    def dq_tot_de_fermi(self, e_fermi: float) -> float:
+        """for a given Fermi energy, calculate the derivative of the net charge
+        density of the ``DefectSystem`` (see :meth:`q_tot`) with respect to the
+        Fermi energy.
+
+        Args:
+            e_fermi (float): Fermi energy
+
+        Returns:
+            float: derivative of the net charge density at ``e_fermi`` per eV
+        """
+        dp0, dn0 = self.dos.carrier_derivatives(e_fermi, self.temperature)
+        d_defects = sum(
+            ds.defect_charge_derivative(e_fermi, self.temperature)
+            for ds in self.defect_species
+        )
+        return float(dn0 - dp0 + d_defects)
+
+    def get_transition_levels(self) -> Dict[str, np.ndarray]:
+        """Return the transition level profiles of all ``DefectSpecies`` over
+        the whole density of states energy range, as a dictionary of
+        ``{DefectSpecies.name : [e_fermi, e_formation]}``, where ``e_fermi``
+        and ``e_formation`` are the coordinates of the kinks (transition
+        levels) and end points of the profile. Each profile is the lower
+        envelope of the formation energies of the charge states, see
+        :func:`py_sc_fermi.defect_species.lower_envelope`.
+
+        Returns:
+            Dict[str, np.ndarray]: Dictionary giving per-defect transition-level
+            profiles, each an array of shape ``(2, npoints)``.
+        """
+        emin, emax = self.dos.emin(), self.dos.emax()
+        return {
+            ds.name: np.asarray(ds.tl_profile(emin, emax)).T
+            for ds in self.defect_species
+        }
 
     def as_dict(
         self, decomposed: bool = False, per_volume: bool = True,
@@ -301,43 +919,15 @@ class DefectSystem(object):
             Dict[str, Any]: dictionary specifying the Fermi Energy,
             hole concentration (``"p0"``), electron concentration
             (``"n0"``), temperature, and the defect concentrations.
-        """
-        if per_volume == True:
-            scale = 1e24 / self.volume
-        else:
-            scale = 1
 
-        e_fermi = self.get_sc_fermi()[0]
-        p0, n0 = self.dos.carrier_concentrations(e_fermi, self.temperature)
-        run_stats = {
-            "Fermi Energy": float(e_fermi),
-            "p0": float(p0 * scale),
-            "n0": float(n0 * scale),
-        }
-        if decomposed == False:
-            sum_concs = {
-                str(ds.name): float(
-                    ds.get_concentration(e_fermi, self.temperature) * scale
-                )
-                for ds in self.defect_species
-            }
-            return {**run_stats, **sum_concs}
-        else:
-            decomp_concs = {
-                str(ds.name): {
-                    int(q): float(
-                        ds.charge_state_concentrations(e_fermi, self.temperature)[q]
-                        * scale
-                    )
-                    for q in ds.charge_states
-                }
-                for ds in self.defect_species
-            }
-            return {**run_stats, **decomp_concs}
+        Note:
+            Each call solves the ``DefectSystem`` again. To report or
+            serialise the same solution several times, call :meth:`solve`
+            once and use the returned ``SCFermiSolution``.
+        """
+        return self.solve().as_dict(decomposed=decomposed, per_volume=per_volume)
 
-    def site_percentages(
-        self, 
-    ) -> Dict[str, float]:
+    def site_percentages(self,) -> Dict[str, float]:
         """Returns a dictionary of the DefectSpecies in the DefectSystem which
         giving the percentage of the sites in the structure that will host that 
         defect.
@@ -346,13 +936,4 @@ class DefectSystem(object):
             Dict[str, Any]: dictionary specifying the per-DefectSpecies site
             concentrations.
         """
-
-        e_fermi = self.get_sc_fermi()[0]
-
-        sum_concs = {
-                str(ds.name): float(
-                    (ds.get_concentration(e_fermi, self.temperature) / ds.nsites) * 100
-                )
-                for ds in self.defect_species
-            }
-        return sum_concs
+        return self.solve().site_percentages()
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+from typing import Any, Callable, Dict, Protocol, Tuple
+from py_sc_fermi.dos import DOS
+
+
+class Cache(Protocol):
+    """Anything that can be passed as the ``cache`` of ``InputSet.from_yaml``
+    or ``InputSet.from_sc_fermi_inputs``: a dictionary, or a ``DiskCache``.
+    Keys are of the form ``(kind, path, *parameters)``, and looking up a
+    missing key raises ``KeyError``."""
+
+    def __getitem__(self, key: tuple) -> Any:
+        ...
+
+    def __setitem__(self, key: tuple, value: Any) -> None:
+        ...
+
+
+class DiskCache(Cache):
+    """A directory in which the ``DOS`` and volumes parsed from input files
+    are kept between runs, so that the same DOS or structure file is only
+    parsed once however many inputs, or runs, use it.
+
+    Entries are keyed by a hash of the contents of the file (not its path or
+    modification time) together with the parameters it was parsed with, such
+    as the number of electrons and band gap. A normalised ``DOS`` is stored as
+    a ``.npy`` array, which is memory-mapped when loaded, with a small
+    ``.json`` record of its band gap and number of electrons; a volume is
+    stored as a ``.json`` record alone. Once the entries take up more than
+    ``max_bytes``, the least recently used are deleted.
+
+    A ``DiskCache`` is used in the same way as the dictionary that may be
+    passed as the ``cache`` of ``InputSet.from_yaml`` or
+    ``InputSet.from_sc_fermi_inputs``, with keys of the form
+    ``(kind, path, *parameters)``. Entries loaded from disk are also kept in
+    memory for the lifetime of the ``DiskCache``.
+
+    Args:
+        directory (str): path to the cache directory, which is created if it
+          does not exist
+        max_bytes (int, optional): maximum total size of the cached files.
+          Defaults to 1 GiB.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 2 ** 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        self._memory: Dict[str, Any] = {}
+
+    def file_hash(self, filename: str) -> str:
+        """sha256 hash of the contents of a file, computed once per version of
+        the file seen by this ``DiskCache``
+
+        Args:
+            filename (str): path to file
+
+        Returns:
+            str: hex digest of the file contents
+        """
+        stat = os.stat(filename)
+        version = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+        if version not in self._hashes:
+            sha = hashlib.sha256()
+            with open(filename, "rb") as f:
+                for block in iter(lambda: f.read(2 ** 20), b""):
+                    sha.update(block)
+            self._hashes[version] = sha.hexdigest()
+        return self._hashes[version]
+
+    def _digest(self, key: tuple) -> str:
+        """name of the entry for a ``(kind, path, *parameters)`` key"""
+        kind, filename, *parameters = key
+        content = json.dumps([kind, self.file_hash(filename), parameters])
+        return hashlib.sha256(content.encode()).hexdigest()[:32]
+
+    def _path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.directory, digest + suffix)
+
+    def __getitem__(self, key: tuple) -> Any:
+        try:
+            digest = self._digest(key)
+        except OSError:
+            # the file does not exist, so leave the error to whatever reads it
+            raise KeyError(key)
+        if digest in self._memory:
+            return self._memory[digest]
+        try:
+            with open(self._path(digest, ".json"), "r") as f:
+                record = json.load(f)
+            if "volume" in record:
+                value = record["volume"]
+            else:
+                data = np.load(self._path(digest, ".npy"), mmap_mode="r")
+                value = DOS._from_normalised(
+                    dos=data[1],
+                    edos=data[0],
+                    bandgap=record["bandgap"],
+                    nelect=record["nelect"],
+                    spin_polarised=record["spin_polarised"],
+                )
+        except (OSError, ValueError, KeyError):
+            # missing, evicted by another process, or partly written
+            raise KeyError(key)
+        self._touch(digest)
+        self._memory[digest] = value
+        return value
+
+    def __setitem__(self, key: tuple, value: Any) -> None:
+        digest = self._digest(key)
+        if isinstance(value, DOS):
+            self._write(
+                digest, ".npy", lambda f: np.save(f, np.array([value.edos, value.dos]))
+            )
+            record = {
+                "bandgap": float(value.bandgap),
+                "nelect": value.nelect,
+                "spin_polarised": bool(value.spin_polarised),
+            }
+        else:
+            record = {"volume": float(value)}
+        # the record is written last, as it marks the entry as complete
+        self._write(digest, ".json", lambda f: f.write(json.dumps(record).encode()))
+        self._memory[digest] = value
+        self.evict()
+
+    def __contains__(self, key: tuple) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def _write(self, digest: str, suffix: str, write: Callable) -> None:
+        """write a file of an entry atomically, so that other processes never
+        read it partly written"""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, self._path(digest, suffix))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def _touch(self, digest: str) -> None:
+        """mark an entry as recently used"""
+        for suffix in [".json", ".npy"]:
+            try:
+                os.utime(self._path(digest, suffix))
+            except OSError:
+                pass
+
+    def size(self) -> int:
+        """total size in bytes of the cached files
+
+        Returns:
+            int: size of the cache
+        """
+        return sum(size for _, size in self._entries().values())
+
+    def _entries(self) -> Dict[str, Tuple[float, int]]:
+        """time of last use and size in bytes of each entry"""
+        entries: Dict[str, Tuple[float, int]] = {}
+        for name in os.listdir(self.directory):
+            digest, suffix = os.path.splitext(name)
+            if suffix not in [".json", ".npy"]:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            last_used, size = entries.get(digest, (0.0, 0))
+            entries[digest] = (max(last_used, stat.st_mtime), size + stat.st_size)
+        return entries
+
+    def evict(self) -> None:
+        """delete the least recently used entries until the cache is no larger
+        than ``max_bytes``"""
+        entries = self._entries()
+        total = sum(size for _, size in entries.values())
+        for digest in sorted(entries, key=lambda d: entries[d][0]):
+            if total <= self.max_bytes:
+                break
+            for suffix in [".json", ".npy"]:
+                try:
+                    os.remove(self._path(digest, suffix))
+                except OSError:
+                    pass
+            total -= entries[digest][1]
+            self._memory.pop(digest, None)
+
+    def clear(self) -> None:
+        """delete every entry in the cache"""
+        max_bytes, self.max_bytes = self.max_bytes, -1
+        self.evict()
+        self.max_bytes = max_bytes
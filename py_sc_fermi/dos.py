@@ -1,10 +1,84 @@
 import numpy as np
-from typing import Tuple, Optional
-from pymatgen.io.vasp import Vasprun  # type: ignore
-from pymatgen.electronic_structure.core import Spin  # type: ignore
-from scipy.constants import physical_constants  # type: ignore
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple, Optional, Protocol, Union
+from numpy.typing import ArrayLike
+from xml.etree import ElementTree
+from py_sc_fermi.carrier_table import CarrierTable
+from py_sc_fermi.defect_charge_state import kboltz
+from py_sc_fermi.dos_readers import read_doscar, read_vasprun_dos
+from py_sc_fermi.log_space import logsumexp, log_occupation, safe_log
 
-kboltz = physical_constants["Boltzmann constant in eV/K"][0]
+# number of ``CarrierTable`` objects kept by each ``DOS``
+_max_carrier_tables = 8
+
+# distance (in kT) beyond the Fermi energy window within which ``DOS.compress``
+# keeps every energy, number of Fermi energies at which it checks the
+# carrier concentrations, and number of times it makes the merging finer
+_compress_margin = 10.0
+_compress_checks = 65
+_compress_attempts = 12
+
+# quadrature rules with which a ``DOS`` can integrate the density-of-states
+QUADRATURE_RULES = ("trapezoid", "simpson", "linear")
+
+# number of terms of the series for the dilogarithm of small arguments
+_dilog_terms = 28
+
+
+class CarrierConcentrations(Protocol):
+    """The carrier concentration methods shared by ``DOS``,
+    ``ParabolicBandDOS`` and ``CarrierTable``, which is all that a
+    ``CompiledDefectSystem`` needs of its density-of-states."""
+
+    def carrier_concentrations(
+        self, e_fermi: float, temperature: float
+    ) -> Tuple[Union[float, np.ndarray], Union[float, np.ndarray]]:
+        ...
+
+    def carrier_concentrations_array(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        ...
+
+    def carrier_derivatives(
+        self, e_fermi: float, temperature: float
+    ) -> Tuple[Union[float, np.ndarray], Union[float, np.ndarray]]:
+        ...
+
+    def log_carrier_concentrations(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        ...
+
+    def log_carrier_derivatives(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        ...
+
+
+class DensityOfStates(CarrierConcentrations, Protocol):
+    """A ``DOS`` or ``ParabolicBandDOS``: the carrier concentrations of a
+    ``DefectSystem``, together with the range of Fermi energies searched for
+    a solution."""
+
+    @property
+    def bandgap(self) -> float:
+        ...
+
+    @property
+    def nelect(self) -> Optional[int]:
+        ...
+
+    def emin(self) -> float:
+        ...
+
+    def emax(self) -> float:
+        ...
+
+    def carrier_table(
+        self, temperature: float, tolerance: float = 1e-6
+    ) -> CarrierConcentrations:
+        ...
 
 
 class DOS(object):
@@ -16,6 +90,9 @@ class DOS(object):
         bandgap (float): band gap
         nelect (int): number of electrons in density-of-states calculation
         spin_polarised (bool): is the calculated density-of-states spin polarised?
+        quadrature (str): rule used to integrate the density-of-states, one
+          of ``"trapezoid"``, ``"simpson"`` or ``"linear"`` (see
+          :meth:`with_quadrature`). Defaults to ``"trapezoid"``.
     """
 
     def __init__(
@@ -25,6 +102,7 @@ class DOS(object):
         bandgap: float,
         nelect: int,
         spin_polarised=False,
+        quadrature: str = "trapezoid",
     ):
         """Initialise a ``DOS`` instance."""
         # self._dos = dos
@@ -32,6 +110,9 @@ class DOS(object):
         self._bandgap = bandgap
         self._nelect = nelect
         self._spin_polarised = spin_polarised
+        self._quadrature = _check_quadrature(quadrature)
+        # whatever holds the memory of the arrays, if they are views of it
+        self._owner: Optional[Any] = None
 
         if self.spin_polarised == True:
             new_dos = np.sum(dos, axis=0)
@@ -47,6 +128,231 @@ class DOS(object):
                  energy range (self.edos)."""
             )
 
+        self._build_integration_plan()
+
+    def _build_integration_plan(self) -> None:
+        """build the ``IntegrationPlan`` used by every carrier concentration
+        evaluation, once the density-of-states has been normalised."""
+        self._plan = IntegrationPlan.build(
+            self._dos,
+            self._edos,
+            self._p0_index(),
+            self._n0_index(),
+            quadrature=self._quadrature,
+        )
+        self._carrier_tables: Dict[Tuple[float, float], CarrierTable] = {}
+
+    def carrier_table(
+        self, temperature: float, tolerance: float = 1e-6
+    ) -> CarrierTable:
+        """tabulated hole and electron concentrations at one temperature (see
+        ``py_sc_fermi.carrier_table.CarrierTable``), to be looked up in place
+        of integrating over the density-of-states, e.g. when solving many
+        times at the same temperature. The tables for the most recently
+        requested temperatures are kept and reused.
+
+        Args:
+            temperature (float): temperature
+            tolerance (float, optional): largest relative error allowed in the
+              concentrations. Defaults to 1e-6.
+
+        Returns:
+            CarrierTable: tabulated carrier concentrations
+        """
+        key = (float(temperature), float(tolerance))
+        if key not in self._carrier_tables:
+            if len(self._carrier_tables) >= _max_carrier_tables:
+                del self._carrier_tables[next(iter(self._carrier_tables))]
+            self._carrier_tables[key] = CarrierTable(self, temperature, tolerance)
+        return self._carrier_tables[key]
+
+    def compress(
+        self,
+        temperature_max: float,
+        tolerance: float = 1e-6,
+        e_fermi_window: Optional[Tuple[float, float]] = None,
+    ) -> "DOS":
+        """a copy of the ``DOS`` on fewer energies, with the same carrier
+        concentrations to within a relative ``tolerance`` for any Fermi energy
+        in ``e_fermi_window`` and temperature up to ``temperature_max``, so
+        that every carrier concentration evaluation is cheaper.
+
+        States deep in the valence band and high in the conduction band,
+        whose contribution to the carrier concentrations is below
+        ``tolerance / 2``, are dropped. Further from the window than
+        ``10 kT`` (at ``temperature_max``), runs of energies are then merged
+        into a single energy at their weighted mean, with the number of states
+        they hold unchanged; the further from the window, the more energies
+        are merged. Nearer the window, and in the gap, the energies are kept
+        as they are. The merging is checked against the carrier
+        concentrations of this ``DOS``, and made finer until they agree to
+        within ``tolerance``. As the merged energies are all more than
+        ``10 kT`` from the window, the error is no larger at lower
+        temperatures.
+
+        The compressed ``DOS`` is not normalised again: it keeps the
+        normalisation of this ``DOS`` to ``nelect`` electrons, so the states
+        dropped from the bottom of the valence band are simply missing from
+        :meth:`sum_dos`. Its ``emin`` and ``emax``, which bracket the search
+        for the self-consistent Fermi energy, still enclose the window.
+
+        Args:
+            temperature_max (float): highest temperature (K) at which the
+              compressed ``DOS`` will be used
+            tolerance (float, optional): largest relative error allowed in
+              the carrier concentrations. Defaults to 1e-6.
+            e_fermi_window (Optional[Tuple[float, float]], optional): lowest
+              and highest Fermi energy at which the compressed ``DOS`` will be
+              used. Defaults to the band gap, ``(0.0, self.bandgap)``.
+
+        Returns:
+            DOS: compressed ``DOS``
+        """
+        if e_fermi_window is None:
+            e_fermi_window = (0.0, self.bandgap)
+        e_low, e_high = e_fermi_window
+        kt = kboltz * temperature_max
+        plan = self._plan
+        e_fermi = np.linspace(e_low, e_high, _compress_checks)
+        x_p = (e_fermi[:, None] - plan.e_valence) / kt
+        x_n = (plan.e_conduction - e_fermi[:, None]) / kt
+        # valence energies are ordered from the band edge downwards, so that
+        # both bands are trimmed and merged from the end of the array
+        e_valence = plan.e_valence[::-1]
+        w_valence = plan.w_valence[::-1]
+        d_valence = e_low - _compress_margin * kt - e_valence
+        n = _trim_band(
+            w_valence,
+            plan.log_w_valence[::-1] + log_occupation(x_p[:, ::-1]),
+            d_valence,
+            tolerance / 2.0,
+        )
+        valence = (e_valence[:n], w_valence[:n], d_valence[:n])
+        d_conduction = plan.e_conduction - e_high - _compress_margin * kt
+        n = _trim_band(
+            plan.w_conduction,
+            plan.log_w_conduction + log_occupation(x_n),
+            d_conduction,
+            tolerance / 2.0,
+        )
+        conduction = (plan.e_conduction[:n], plan.w_conduction[:n], d_conduction[:n])
+        gap = slice(plan.vbm_index + 1, plan.cbm_index)
+        exact = self.log_carrier_concentrations(e_fermi, temperature_max)
+
+        # merge more finely until the concentrations are within tolerance
+        alpha = np.sqrt(24.0 * tolerance)
+        for _ in range(_compress_attempts):
+            e_valence, w_valence = _merge_band(*valence, kt, alpha)
+            e_conduction, w_conduction = _merge_band(*conduction, kt, alpha)
+            compressed = self._from_band_weights(
+                e_valence[::-1], w_valence[::-1], e_conduction, w_conduction, gap
+            )
+            approximate = compressed.log_carrier_concentrations(
+                e_fermi, temperature_max
+            )
+            error = np.max(np.abs(np.expm1(np.subtract(approximate, exact))))
+            if error <= tolerance:
+                return compressed
+            alpha /= 2.0
+        # only trim the bands, which is within tolerance by construction
+        return self._from_band_weights(
+            valence[0][::-1], valence[1][::-1], conduction[0], conduction[1], gap
+        )
+
+    def _from_band_weights(
+        self,
+        e_valence: np.ndarray,
+        w_valence: np.ndarray,
+        e_conduction: np.ndarray,
+        w_conduction: np.ndarray,
+        gap: slice,
+    ) -> "DOS":
+        """a ``DOS`` with the same band gap, normalisation and quadrature rule
+        as this one, with valence and conduction band energies whose
+        quadrature weights times density-of-states are ``w_valence`` and
+        ``w_conduction``, and the energies in the gap of this ``DOS``"""
+        dos = [
+            _dos_from_weights(e_valence, w_valence, self._quadrature),
+            self._dos[gap],
+            _dos_from_weights(e_conduction, w_conduction, self._quadrature),
+        ]
+        return DOS._from_normalised(
+            dos=np.concatenate(dos),
+            edos=np.concatenate([e_valence, self._edos[gap], e_conduction]),
+            bandgap=self._bandgap,
+            nelect=self._nelect,
+            spin_polarised=self._spin_polarised,
+            quadrature=self._quadrature,
+        )
+
+    def quadrature_convergence(
+        self,
+        temperature: float,
+        e_fermi: Optional[np.ndarray] = None,
+        strides: Tuple[int, ...] = (1, 2, 4, 8, 16),
+    ) -> "QuadratureConvergence":
+        """compare the carrier concentrations given by each quadrature rule
+        as the density-of-states is made coarser, to judge which rule, and
+        how fine a grid, is needed for converged concentrations.
+
+        For each stride ``k``, the density-of-states is subsampled to every
+        ``k``-th energy (always keeping the band edges and the ends), and the
+        hole and electron concentrations from each rule are compared with
+        those of the ``"linear"`` rule on the full density-of-states, which
+        integrates the occupation exactly against the density-of-states as
+        given.
+
+        Args:
+            temperature (float): temperature
+            e_fermi (Optional[np.ndarray], optional): Fermi energies at which
+              to compare the concentrations. Defaults to 11 energies spanning
+              the band gap.
+            strides (Tuple[int, ...], optional): subsampling strides. Defaults
+              to ``(1, 2, 4, 8, 16)``.
+
+        Returns:
+            QuadratureConvergence: largest relative error in the carrier
+            concentrations for each rule and stride
+        """
+        if e_fermi is None:
+            e_fermi = np.linspace(0.0, self.bandgap, 11)
+        e_fermi = np.asarray(e_fermi, dtype=float)
+        reference = np.array(
+            self.with_quadrature("linear").carrier_concentrations_array(
+                e_fermi, temperature
+            )
+        )
+        plan = self._plan
+        npoints = []
+        errors: Dict[str, list] = {rule: [] for rule in QUADRATURE_RULES}
+        for stride in strides:
+            keep = np.union1d(
+                np.arange(0, len(self._edos), stride),
+                [plan.vbm_index, plan.cbm_index, len(self._edos) - 1],
+            )
+            npoints.append(len(keep))
+            for rule in QUADRATURE_RULES:
+                coarse = DOS._from_normalised(
+                    dos=self._dos[keep],
+                    edos=self._edos[keep],
+                    bandgap=self._bandgap,
+                    nelect=self._nelect,
+                    spin_polarised=self._spin_polarised,
+                    quadrature=rule,
+                )
+                concentrations = np.array(
+                    coarse.carrier_concentrations_array(e_fermi, temperature)
+                )
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    relative = np.abs(concentrations / reference - 1.0)
+                errors[rule].append(float(np.nanmax(relative)))
+        return QuadratureConvergence(
+            temperature=temperature,
+            strides=tuple(strides),
+            npoints=tuple(npoints),
+            errors={rule: np.array(e) for rule, e in errors.items()},
+        )
+
     @property
     def dos(self) -> np.ndarray:
         """density-of-states array
@@ -83,6 +389,16 @@ class DOS(object):
         """
         return self._spin_polarised
 
+    @property
+    def quadrature(self) -> str:
+        """quadrature rule used to integrate the density-of-states (see
+        :meth:`with_quadrature`)
+
+        Returns:
+            str: quadrature rule
+        """
+        return self._quadrature
+
     @property
     def nelect(self) -> int:
         """number of electrons in density of states calculation with which to
@@ -93,14 +409,85 @@ class DOS(object):
         """
         return self._nelect
 
+    @classmethod
+    def _from_normalised(
+        cls,
+        dos: np.ndarray,
+        edos: np.ndarray,
+        bandgap: float,
+        nelect: int,
+        spin_polarised: bool = False,
+        quadrature: str = "trapezoid",
+    ) -> "DOS":
+        """build a ``DOS`` from density-of-states data that has already been
+        summed over spins and normalised (e.g. the ``dos`` of another ``DOS``),
+        without normalising or copying the arrays."""
+        new = cls.__new__(cls)
+        new._dos = dos
+        new._edos = edos
+        new._bandgap = bandgap
+        new._nelect = nelect
+        new._spin_polarised = spin_polarised
+        new._quadrature = _check_quadrature(quadrature)
+        new._owner = None
+        new._build_integration_plan()
+        return new
+
+    def with_quadrature(self, quadrature: str) -> "DOS":
+        """a ``DOS`` with the same (normalised) density-of-states, which
+        integrates it with a different quadrature rule. The arrays are shared,
+        not copied. The rules are:
+
+        - ``"trapezoid"``: the trapezoid rule, as ``np.trapz``.
+        - ``"simpson"``: composite Simpson's rule (with the trapezoid rule
+          over the last interval of a band with an odd number of intervals).
+          This is only more accurate where the density-of-states is smooth
+          over each pair of intervals. At a band edge it rises as the square
+          root of the energy, which Simpson's rule fits worse than the
+          trapezoid rule, so for a typical DFT density-of-states it is the
+          least accurate of the three rules; use ``"linear"`` for a more
+          accurate integral (see :meth:`quadrature_convergence`).
+        - ``"linear"``: the exact integral of the Fermi-Dirac occupation
+          against the density-of-states interpolated linearly between its
+          energies, evaluated in closed form (with the dilogarithm,
+          ``scipy.special.spence``). As the occupation is integrated exactly,
+          this stays accurate on grids much coarser than kT, at the cost of
+          a few special function evaluations per energy. The logarithmic
+          methods are the logarithms of the concentrations, so, unlike the
+          other rules, they do not remain finite where the concentrations
+          underflow.
+
+        Args:
+            quadrature (str): quadrature rule
+
+        Raises:
+            ValueError: if ``quadrature`` is not one of the rules above
+
+        Returns:
+            DOS: ``DOS`` using ``quadrature``
+        """
+        return DOS._from_normalised(
+            dos=self._dos,
+            edos=self._edos,
+            bandgap=self._bandgap,
+            nelect=self._nelect,
+            spin_polarised=self._spin_polarised,
+            quadrature=quadrature,
+        )
+
     @classmethod
     def from_vasprun(
         cls, path_to_vasprun: str, nelect: int, bandgap: Optional[float] = None
     ) -> "DOS":
         """Generate DOS object from a VASP vasprun.xml
-        file. As this is parsed using pymatgen, the number of electrons is not
-        contained in the vasprun data and must be passed in. On the other hand,
-        If the bandgap is not passed in, it can be read from the vasprun file.
+        file. The number of electrons is not contained in the vasprun data
+        and must be passed in. On the other hand, If the bandgap is not passed
+        in, it can be read from the vasprun file.
+
+        Only the total density-of-states, the Fermi energy and the band edges
+        are read, by streaming through the file (see
+        ``py_sc_fermi.dos_readers.read_vasprun_dos``). If the file cannot be
+        read this way, it is parsed in full with ``pymatgen``.
 
         Args:
             path_to_vasprun (str): path to vasprun file
@@ -108,6 +495,26 @@ class DOS(object):
               the vasprun
             bandgap (Optional[float], optional): bandgap. Defaults to None.
         """
+        try:
+            data = read_vasprun_dos(path_to_vasprun)
+        except (ElementTree.ParseError, ValueError):
+            return cls._from_pymatgen_vasprun(path_to_vasprun, nelect, bandgap)
+        if bandgap is None:
+            bandgap = float(data.bandgap)
+        return cls._from_spin_densities(
+            data.densities, data.energies - data.vbm, bandgap, nelect
+        )
+
+    @classmethod
+    def _from_pymatgen_vasprun(
+        cls, path_to_vasprun: str, nelect: int, bandgap: Optional[float] = None
+    ) -> "DOS":
+        """Generate DOS object from a VASP vasprun.xml file parsed in full by
+        ``pymatgen``. See :meth:`from_vasprun`."""
+        # pymatgen is slow to import, so is only imported when it is needed
+        from pymatgen.io.vasp import Vasprun  # type: ignore
+        from pymatgen.electronic_structure.core import Spin  # type: ignore
+
         vr = Vasprun(path_to_vasprun, parse_potcar_file=False)
         densities = vr.complete_dos.densities
         vbm = vr.eigenvalue_band_properties[2]
@@ -120,11 +527,57 @@ class DOS(object):
             spin_pol = False
 
         if bandgap is None:
-            bandgap = float(vr.eigenvalue_band_properties[0])
+            gap = vr.eigenvalue_band_properties[0]
+            # one band gap per spin channel if the spins are treated separately
+            bandgap = float(min(gap) if isinstance(gap, tuple) else gap)
         return cls(
             dos=dos, edos=edos, nelect=nelect, bandgap=bandgap, spin_polarised=spin_pol
         )
 
+    @classmethod
+    def from_doscar(
+        cls,
+        path_to_doscar: str,
+        nelect: int,
+        bandgap: float,
+        vbm: Optional[float] = None,
+    ) -> "DOS":
+        """Generate DOS object from the total density-of-states in a VASP
+        DOSCAR file. A DOSCAR gives neither the band gap nor the band edges,
+        so the band gap must be passed in, and the energies are taken relative
+        to the valence band maximum ``vbm``, or to the Fermi energy in the
+        DOSCAR header if it is not passed in (for an insulator VASP places the
+        Fermi energy at, or just above, the valence band maximum).
+
+        Args:
+            path_to_doscar (str): path to DOSCAR file
+            nelect (int): number of electrons in vasp calculation associated with
+              the DOSCAR
+            bandgap (float): bandgap
+            vbm (Optional[float], optional): energy of the valence band maximum
+              in the DOSCAR. Defaults to None.
+        """
+        data = read_doscar(path_to_doscar)
+        if vbm is None:
+            vbm = data.efermi
+        return cls._from_spin_densities(
+            data.densities, data.energies - vbm, bandgap, nelect
+        )
+
+    @classmethod
+    def _from_spin_densities(
+        cls, densities: np.ndarray, edos: np.ndarray, bandgap: float, nelect: int
+    ) -> "DOS":
+        """Generate DOS object from densities with one row per spin channel"""
+        spin_pol = len(densities) == 2
+        return cls(
+            dos=densities if spin_pol else densities[0],
+            edos=edos,
+            nelect=nelect,
+            bandgap=bandgap,
+            spin_polarised=spin_pol,
+        )
+
     @classmethod
     def from_dict(cls, dos_dict: dict) -> "DOS":
         """return a ``DOS`` object from a dictionary containing the density-of-states
@@ -154,14 +607,18 @@ class DOS(object):
             nelect=nelect, bandgap=bandgap, edos=edos, dos=dos, spin_polarised=spin_pol,
         )
 
-    def sum_dos(self) -> np.ndarray:
+    def sum_dos(self) -> float:
         """
         Returns:
-            np.ndarray: integrated density-of-states up to the valence band maximum
+            float: integrated density-of-states up to the valence band maximum
         """
         vbm_index = np.where(self._edos <= 0)[0][-1]
+        if self._quadrature == "simpson":
+            edos = self._edos[: vbm_index + 1]
+            return float(np.dot(self._dos[: vbm_index + 1], _simpson_weights(edos)))
+        # the trapezoid rule is exact for a linearly interpolated dos
         sum1 = np.trapz(self._dos[: vbm_index + 1], self._edos[: vbm_index + 1])
-        return sum1
+        return float(sum1)
 
     def normalise_dos(self) -> None:
         """normalises the density of states w.r.t. number of electrons in the
@@ -216,26 +673,484 @@ class DOS(object):
         Returns:
             Tuple[float, float]: concentration of holes, concentration of electrons
         """
-        p0 = np.trapz(
-            self._p_func(e_fermi, temperature), self._edos[: self._p0_index() + 1]
+        plan = self._plan
+        if plan.quadrature == "linear":
+            p0, n0, _, _ = _linear_carriers(plan, e_fermi, temperature)
+            return float(p0), float(n0)
+        p0 = plan.w_valence @ _occupation(e_fermi - plan.e_valence, temperature)
+        n0 = plan.w_conduction @ _occupation(plan.e_conduction - e_fermi, temperature)
+        return p0, n0
+
+    def carrier_concentrations_array(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """vectorised version of :meth:`carrier_concentrations` that accepts
+        arrays of Fermi energies and/or temperatures, which are broadcast
+        against each other.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energies
+            temperature (ArrayLike): temperatures
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: concentrations of holes and of
+            electrons, each with the broadcast shape of ``e_fermi`` and
+            ``temperature``
+        """
+        plan = self._plan
+        if plan.quadrature == "linear":
+            p0, n0, _, _ = _linear_carriers(plan, e_fermi, temperature)
+            return p0, n0
+        e_fermi, temperature = np.broadcast_arrays(
+            np.asarray(e_fermi, dtype=float), np.asarray(temperature, dtype=float)
         )
-        n0 = np.trapz(
-            self._n_func(e_fermi, temperature), self._edos[self._n0_index() :]
+        kt = kboltz * temperature[..., None]
+        with np.errstate(over="ignore"):
+            p_occ = 1.0 / (1.0 + np.exp((e_fermi[..., None] - plan.e_valence) / kt))
+            n_occ = 1.0 / (1.0 + np.exp((plan.e_conduction - e_fermi[..., None]) / kt))
+        return p_occ @ plan.w_valence, n_occ @ plan.w_conduction
+
+    def log_carrier_concentrations(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """natural logarithms of the hole and electron concentrations given by
+        :meth:`carrier_concentrations`, evaluated in log space with a
+        log-sum-exp over the density-of-states so that they remain finite
+        when the carrier concentrations underflow (e.g. at low temperatures
+        or with the Fermi energy deep in the gap). Accepts arrays of Fermi
+        energies and/or temperatures, which are broadcast against each other.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: log of the concentration of holes,
+            log of the concentration of electrons
+        """
+        if self._plan.quadrature == "linear":
+            p0, n0, _, _ = _linear_carriers(self._plan, e_fermi, temperature)
+            return safe_log(p0), safe_log(n0)
+        log_p_occ, log_n_occ, _, _ = self._log_occupations(e_fermi, temperature)
+        return (
+            logsumexp(self._plan.log_w_valence + log_p_occ),
+            logsumexp(self._plan.log_w_conduction + log_n_occ),
         )
-        return p0, n0
 
-    def _p_func(self, e_fermi: float, temperature: float) -> float:
+    def log_carrier_derivatives(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """derivatives of :meth:`log_carrier_concentrations` with respect to
+        the Fermi energy, i.e. ``dp0 / dE / p0`` and ``dn0 / dE / n0``, which
+        remain finite when the carrier concentrations themselves underflow.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: derivative of the log of the
+            concentration of holes, and of electrons (per eV)
+        """
+        if self._plan.quadrature == "linear":
+            p0, n0, dp0, dn0 = _linear_carriers(self._plan, e_fermi, temperature)
+            return dp0 / p0, dn0 / n0
+        log_p_occ, log_n_occ, x_p, x_n = self._log_occupations(e_fermi, temperature)
+        kt = kboltz * np.asarray(temperature, dtype=float)
+        # d log(occupation) / dE_F is the fraction of *unoccupied* states / kT,
+        # averaged over the states weighted by their contribution
+        log_p = self._plan.log_w_valence + log_p_occ
+        log_n = self._plan.log_w_conduction + log_n_occ
+        dlog_p0 = -np.sum(
+            np.exp(log_p - logsumexp(log_p)[..., None] + log_occupation(-x_p)), axis=-1
+        )
+        dlog_n0 = np.sum(
+            np.exp(log_n - logsumexp(log_n)[..., None] + log_occupation(-x_n)), axis=-1
+        )
+        return (dlog_p0 / kt)[()], (dlog_n0 / kt)[()]
+
+    def _log_occupations(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """log occupations of the valence band by holes and of the conduction
+        band by electrons, and the reduced energies ``x`` of each, with the
+        energy axis appended as the last axis"""
+        e_fermi, temperature = np.broadcast_arrays(
+            np.asarray(e_fermi, dtype=float), np.asarray(temperature, dtype=float)
+        )
+        kt = kboltz * temperature[..., None]
+        x_p = (e_fermi[..., None] - self._plan.e_valence) / kt
+        x_n = (self._plan.e_conduction - e_fermi[..., None]) / kt
+        return log_occupation(x_p), log_occupation(x_n), x_p, x_n
+
+    def carrier_derivatives(
+        self, e_fermi: float, temperature: float
+    ) -> Tuple[float, float]:
+        """return the derivatives of the hole and electron carrier
+        concentrations with respect to the Fermi energy at a given Fermi energy
+        and temperature, obtained by integrating the density-of-states against
+        the derivative of the Fermi-Dirac distribution.
+
+        Args:
+            e_fermi (float): fermi energy
+            temperature (float): temperature
+
+        Returns:
+            Tuple[float, float]: derivative of the concentration of holes,
+            derivative of the concentration of electrons (per eV)
+        """
+        plan = self._plan
+        if plan.quadrature == "linear":
+            _, _, dp0, dn0 = _linear_carriers(plan, e_fermi, temperature)
+            return float(dp0), float(dn0)
+        kt = kboltz * temperature
+        dp0 = -plan.w_valence @ _fermi_dirac_derivative(e_fermi - plan.e_valence, kt)
+        dn0 = plan.w_conduction @ _fermi_dirac_derivative(
+            plan.e_conduction - e_fermi, kt
+        )
+        return dp0, dn0
+
+    def _p_func(self, e_fermi: float, temperature: float) -> np.ndarray:
         """Fermi Dirac distribution for holes."""
-        return self.dos[: self._p0_index() + 1] / (
-            1.0
-            + np.exp(
-                (e_fermi - self.edos[: self._p0_index() + 1]) / (kboltz * temperature)
-            )
+        plan = self._plan
+        return self._dos[: plan.vbm_index + 1] * _occupation(
+            e_fermi - plan.e_valence, temperature
         )
 
-    def _n_func(self, e_fermi: float, temperature: float) -> float:
+    def _n_func(self, e_fermi: float, temperature: float) -> np.ndarray:
         """Fermi Dirac distribution for electrons."""
-        return self.dos[self._n0_index() :] / (
-            1.0
-            + np.exp((self.edos[self._n0_index() :] - e_fermi) / (kboltz * temperature))
+        plan = self._plan
+        return self._dos[plan.cbm_index :] * _occupation(
+            plan.e_conduction - e_fermi, temperature
+        )
+
+
+@dataclass(frozen=True)
+class IntegrationPlan:
+    """Everything needed to integrate the density-of-states of a ``DOS``
+    against an occupation, precomputed once when the ``DOS`` is built: the
+    energies of the valence band (up to the valence band maximum) and
+    conduction band (from the conduction band minimum) as contiguous arrays,
+    and the density-of-states at those energies multiplied by the quadrature
+    weights. The hole (electron) concentration is then the dot product of
+    ``w_valence`` (``w_conduction``) with the occupation of each energy,
+    except with the ``"linear"`` rule, which integrates the density-of-states
+    ``d_valence`` (``d_conduction``) against the occupation in closed form.
+    The arrays are read-only.
+
+    Args:
+        vbm_index (int): index of the valence band maximum in the energies
+        cbm_index (int): index of the conduction band minimum in the energies
+        e_valence (np.ndarray): valence band energies
+        e_conduction (np.ndarray): conduction band energies
+        w_valence (np.ndarray): valence band density-of-states times weights
+        w_conduction (np.ndarray): conduction band density-of-states times
+          weights
+        log_w_valence (np.ndarray): logarithm of ``w_valence``, with any
+          negative density-of-states values treated as zero
+        log_w_conduction (np.ndarray): logarithm of ``w_conduction``
+        d_valence (np.ndarray): valence band density-of-states
+        d_conduction (np.ndarray): conduction band density-of-states
+        quadrature (str): quadrature rule of the weights. Defaults to
+          ``"trapezoid"``.
+    """
+
+    vbm_index: int
+    cbm_index: int
+    e_valence: np.ndarray
+    e_conduction: np.ndarray
+    w_valence: np.ndarray
+    w_conduction: np.ndarray
+    log_w_valence: np.ndarray
+    log_w_conduction: np.ndarray
+    d_valence: np.ndarray
+    d_conduction: np.ndarray
+    quadrature: str = "trapezoid"
+
+    @classmethod
+    def build(
+        cls,
+        dos: np.ndarray,
+        edos: np.ndarray,
+        vbm_index: int,
+        cbm_index: int,
+        quadrature: str = "trapezoid",
+    ) -> "IntegrationPlan":
+        """build the plan for a normalised density-of-states with the weights
+        of a quadrature rule (the trapezoid rule weights for the ``"linear"``
+        rule, whose integrals do not use them).
+
+        Args:
+            dos (np.ndarray): normalised density-of-states
+            edos (np.ndarray): energies of the density-of-states
+            vbm_index (int): index of the valence band maximum in ``edos``
+            cbm_index (int): index of the conduction band minimum in ``edos``
+            quadrature (str, optional): quadrature rule. Defaults to
+              ``"trapezoid"``.
+
+        Returns:
+            IntegrationPlan: integration plan
+        """
+        weights = _simpson_weights if quadrature == "simpson" else _trapezoid_weights
+        e_valence = np.array(edos[: vbm_index + 1], dtype=float)
+        e_conduction = np.array(edos[cbm_index:], dtype=float)
+        d_valence = np.array(dos[: vbm_index + 1], dtype=float)
+        d_conduction = np.array(dos[cbm_index:], dtype=float)
+        w_valence = d_valence * weights(e_valence)
+        w_conduction = d_conduction * weights(e_conduction)
+        arrays = dict(
+            e_valence=e_valence,
+            e_conduction=e_conduction,
+            w_valence=w_valence,
+            w_conduction=w_conduction,
+            log_w_valence=safe_log(np.clip(w_valence, 0.0, None)),
+            log_w_conduction=safe_log(np.clip(w_conduction, 0.0, None)),
+            d_valence=d_valence,
+            d_conduction=d_conduction,
+        )
+        for array in arrays.values():
+            array.setflags(write=False)
+        return cls(
+            vbm_index=int(vbm_index),
+            cbm_index=int(cbm_index),
+            quadrature=quadrature,
+            **arrays,
+        )
+
+
+@dataclass(frozen=True)
+class QuadratureConvergence:
+    """The convergence of the carrier concentrations of a ``DOS`` with each
+    quadrature rule as its density-of-states is subsampled, as given by
+    ``DOS.quadrature_convergence``.
+
+    Args:
+        temperature (float): temperature (K)
+        strides (Tuple[int, ...]): subsampling strides
+        npoints (Tuple[int, ...]): number of energies at each stride
+        errors (Dict[str, np.ndarray]): largest relative error in the hole
+          and electron concentrations at each stride, for each rule
+    """
+
+    temperature: float
+    strides: Tuple[int, ...]
+    npoints: Tuple[int, ...]
+    errors: Dict[str, np.ndarray]
+
+    def report_string(self) -> str:
+        """a table of the relative errors of each rule at each stride
+
+        Returns:
+            str: report
+        """
+        rules = list(self.errors)
+        string = f"Temperature :      {self.temperature}  (K)\n"
+        string += "stride  npoints" + "".join(f"{rule:>12}" for rule in rules)
+        string += "\n"
+        for i, (stride, npoints) in enumerate(zip(self.strides, self.npoints)):
+            string += f"{stride:6d} {npoints:8d}"
+            string += "".join(f"{self.errors[rule][i]:12.2e}" for rule in rules)
+            string += "\n"
+        return string
+
+    def report(self) -> None:
+        """print :meth:`report_string`"""
+        print(self.report_string())
+
+
+def _occupation(delta_e: np.ndarray, temperature: float) -> np.ndarray:
+    """Fermi-Dirac occupation ``1 / (1 + exp(delta_e / kT))``, evaluated in
+    place in a single temporary array"""
+    occupation = np.divide(delta_e, kboltz * temperature)
+    with np.errstate(over="ignore"):
+        np.exp(occupation, out=occupation)
+    occupation += 1.0
+    return np.reciprocal(occupation, out=occupation)
+
+
+def _fermi_dirac_derivative(delta_e: np.ndarray, kt: float) -> np.ndarray:
+    """magnitude of the derivative of the Fermi-Dirac occupation
+    ``1 / (1 + exp(delta_e / kt))`` with respect to ``delta_e``, evaluated as
+    ``exp(-|x|) / (1 + exp(-|x|))**2 / kt`` so that it cannot overflow."""
+    x = np.exp(-np.abs(delta_e) / kt)
+    return x / (1.0 + x) ** 2 / kt
+
+
+def _trapezoid_weights(x: np.ndarray) -> np.ndarray:
+    """weights ``w`` such that ``np.sum(w * y)`` equals ``np.trapz(y, x)``"""
+    weights = np.zeros(len(x))
+    if len(x) > 1:
+        dx = np.diff(x)
+        weights[:-1] += dx / 2.0
+        weights[1:] += dx / 2.0
+    return weights
+
+
+def _simpson_weights(x: np.ndarray) -> np.ndarray:
+    """weights ``w`` such that ``np.sum(w * y)`` is the composite Simpson's
+    rule integral of ``y`` over ``x``, which need not be evenly spaced. If
+    there is an odd number of intervals, the last is integrated with the
+    trapezoid rule."""
+    weights = np.zeros(len(x))
+    if len(x) < 3:
+        return _trapezoid_weights(x)
+    dx = np.diff(x)
+    n_pairs = len(dx) // 2
+    h0, h1 = dx[0 : 2 * n_pairs : 2], dx[1 : 2 * n_pairs : 2]
+    h = h0 + h1
+    np.add.at(weights, np.arange(0, 2 * n_pairs, 2), h / 6.0 * (2.0 - h1 / h0))
+    np.add.at(weights, np.arange(1, 2 * n_pairs, 2), h ** 3 / (6.0 * h0 * h1))
+    np.add.at(weights, np.arange(2, 2 * n_pairs + 1, 2), h / 6.0 * (2.0 - h0 / h1))
+    if len(dx) % 2 == 1:
+        weights[-2:] += dx[-1] / 2.0
+    return weights
+
+
+def _linear_carriers(
+    plan: IntegrationPlan, e_fermi: ArrayLike, temperature: ArrayLike
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """hole and electron concentrations, and their derivatives with respect
+    to the Fermi energy, for the density-of-states of ``plan`` interpolated
+    linearly between its energies, integrated against the Fermi-Dirac
+    occupation in closed form. Accepts arrays of Fermi energies and/or
+    temperatures, which are broadcast against each other."""
+    e_fermi, temperature = np.broadcast_arrays(
+        np.asarray(e_fermi, dtype=float), np.asarray(temperature, dtype=float)
+    )
+    kt = kboltz * temperature[..., None]
+    p0, dp0 = _linear_hole_integral(
+        plan.e_valence, plan.d_valence, e_fermi[..., None], kt
+    )
+    # the electron occupation is the hole occupation with the energies
+    # reflected, E -> -E
+    n0, dn0 = _linear_hole_integral(
+        -plan.e_conduction[::-1], plan.d_conduction[::-1], -e_fermi[..., None], kt
+    )
+    return p0[()], n0[()], dp0[()], -dn0[()]
+
+
+def _linear_hole_integral(
+    energies: np.ndarray, dos: np.ndarray, e_fermi: np.ndarray, kt: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """integral of the linearly interpolated ``dos`` against the hole
+    occupation ``1 / (1 + exp((e_fermi - E) / kt))`` over ``energies``, and
+    its derivative with respect to ``e_fermi``, over the last axis.
+
+    With ``x = (E - e_fermi) / kt``, the occupation has the antiderivative
+    ``F(E) = kt log(1 + exp(x))``, which in turn has the antiderivative
+    ``G(E) = -kt^2 Li2(-exp(x))``. On each interval, integrating by parts,
+    ``int g f dE = [g F] - g' [G]``, and the derivative with respect to
+    ``e_fermi`` is ``-[g f] + g' [F]``."""
+    if len(energies) < 2:
+        zeros = np.zeros(np.broadcast(e_fermi, kt).shape[:-1])
+        return zeros, zeros
+    x = (energies - e_fermi) / kt
+    occupation = np.exp(-np.logaddexp(0.0, -x))
+    softplus = np.logaddexp(0.0, x)
+    # -Li2(-exp(x)), using Li2(-exp(x)) = -pi^2 / 6 - x^2 / 2 - Li2(-exp(-x))
+    # for positive x so that the argument of spence never overflows
+    dilog = -_dilog_of_negative(np.exp(-np.abs(x)))
+    dilog = np.where(x > 0.0, np.pi ** 2 / 6.0 + x ** 2 / 2.0 - dilog, dilog)
+    f = kt * softplus
+    g = kt ** 2 * dilog
+    slopes = np.diff(dos) / np.diff(energies)
+    integral = (
+        dos[-1] * f[..., -1]
+        - dos[0] * f[..., 0]
+        - np.sum(slopes * np.diff(g, axis=-1), axis=-1)
+    )
+    derivative = (
+        -dos[-1] * occupation[..., -1]
+        + dos[0] * occupation[..., 0]
+        + np.sum(slopes * np.diff(f, axis=-1), axis=-1)
+    )
+    return integral, derivative
+
+
+def _dilog_of_negative(e: np.ndarray) -> np.ndarray:
+    """the dilogarithm ``Li2(-e)`` for ``0 <= e <= 1``. ``scipy.special.spence``
+    takes ``1 + e``, in which small ``e`` are lost to rounding, so for
+    ``e < 0.25`` the power series is summed instead."""
+    # the dilogarithm is only needed here, so scipy is imported lazily
+    from scipy.special import spence  # type: ignore
+
+    small = e < 0.25
+    # Li2(-e) = sum_k (-e)^k / k^2, to within 1e-18 for e < 0.25
+    series = np.full(e.shape, 1.0 / _dilog_terms ** 2)
+    for k in range(_dilog_terms - 1, 0, -1):
+        series = 1.0 / k ** 2 - e * series
+    series *= -e
+    return np.where(small, series, spence(1.0 + np.where(small, 0.0, e)))
+
+
+def _trim_band(
+    weights: np.ndarray,
+    log_contributions: np.ndarray,
+    distance: np.ndarray,
+    tolerance: float,
+) -> int:
+    """number of states of a band, ordered away from its edge, to keep, so
+    that the states dropped from the far end contribute no more than
+    ``tolerance`` of the carrier concentration at every Fermi energy.
+    ``log_contributions`` has a row of the log of the contribution of each
+    state for each Fermi energy. Only states at a positive ``distance``
+    beyond the Fermi energy window may be dropped."""
+    # log of the contribution of each state and those beyond it, for each
+    # Fermi energy, relative to the whole band
+    tails = np.logaddexp.accumulate(log_contributions[:, ::-1], axis=1)[:, ::-1]
+    droppable = np.max(tails - tails[:, :1], axis=0) <= np.log(tolerance)
+    droppable &= distance > 0.0
+    if not np.any(droppable):
+        return len(weights)
+    return max(int(np.argmax(droppable)), 2)
+
+
+def _merge_band(
+    energies: np.ndarray,
+    weights: np.ndarray,
+    distance: np.ndarray,
+    kt: float,
+    alpha: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """merge the energies of a band, ordered away from its edge, that are at
+    a positive ``distance`` beyond the edge of the kept region, into runs no
+    wider than ``alpha kT exp(d / 2 kT)`` at a distance ``d``. Each run is
+    replaced by the weighted mean of its energies, with the sum of their
+    weights."""
+    start = int(np.searchsorted(distance, 0.0, side="right"))
+    merged_energies = list(energies[:start])
+    merged_weights = list(weights[:start])
+    while start < len(energies):
+        width = alpha * kt * np.exp(distance[start] / (2.0 * kt))
+        end = int(np.searchsorted(distance, distance[start] + width, side="right"))
+        end = max(end, start + 1)
+        w = weights[start:end]
+        total = np.sum(w)
+        if total > 0.0:
+            merged_energies.append(np.sum(w * energies[start:end]) / total)
+        else:
+            merged_energies.append(np.mean(energies[start:end]))
+        merged_weights.append(total)
+        start = end
+    return np.array(merged_energies), np.array(merged_weights)
+
+
+def _dos_from_weights(
+    energies: np.ndarray, weights: np.ndarray, quadrature: str = "trapezoid"
+) -> np.ndarray:
+    """density-of-states at ``energies`` whose quadrature weights (Simpson's
+    rule for ``"simpson"``, else the trapezoid rule, as in
+    ``IntegrationPlan.build``) times density-of-states are ``weights``"""
+    rule = _simpson_weights if quadrature == "simpson" else _trapezoid_weights
+    quadrature_weights = rule(energies)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(quadrature_weights > 0.0, weights / quadrature_weights, 0.0)
+
+
+def _check_quadrature(quadrature: str) -> str:
+    """raise a ``ValueError`` for an unknown quadrature rule"""
+    if quadrature not in QUADRATURE_RULES:
+        raise ValueError(
+            f"Unknown quadrature rule {quadrature}, use one of {QUADRATURE_RULES}"
         )
+    return quadrature
@@ -0,0 +1,165 @@
+import gzip
+import numpy as np
+from collections import namedtuple
+from itertools import islice
+from typing import BinaryIO, List, Optional, Tuple, Union
+from xml.etree import ElementTree
+
+VasprunDOSData = namedtuple(
+    "VasprunDOSData", ["energies", "densities", "efermi", "vbm", "bandgap"]
+)
+VasprunDOSData.__doc__ = """total density-of-states and band edges read from a
+``vasprun.xml`` file. ``densities`` has one row per spin channel, and
+``energies`` are as written by VASP (not shifted to the valence band maximum).
+"""
+
+DoscarData = namedtuple("DoscarData", ["energies", "densities", "efermi"])
+DoscarData.__doc__ = """total density-of-states read from a ``DOSCAR`` file.
+``densities`` has one row per spin channel."""
+
+# occupations above this are counted as occupied when locating the band edges,
+# as in ``pymatgen.io.vasp.Vasprun.eigenvalue_band_properties``
+occupation_tolerance = 1e-8
+
+
+def _open(filename: str) -> Union[gzip.GzipFile, BinaryIO]:
+    """open a (possibly gzipped) file for reading as bytes"""
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "rb")
+    return open(filename, "rb")
+
+
+def read_vasprun_dos(filename: str) -> VasprunDOSData:
+    """read the total density-of-states, Fermi energy and band edges from a
+    VASP ``vasprun.xml`` file without building the full ``pymatgen``
+    ``Vasprun`` object.
+
+    The file is parsed incrementally, and each element is discarded once it
+    has been read, so memory use is bounded by the size of the total
+    density-of-states rather than of the file: the projected
+    density-of-states, ionic steps and projections are skipped. The band
+    edges are taken from the eigenvalues of the last calculation in the file,
+    without storing them.
+
+    Args:
+        filename (str): path to ``vasprun.xml`` (or ``vasprun.xml.gz``) file
+
+    Raises:
+        ValueError: if the file has no total density-of-states, Fermi energy
+          or eigenvalues
+        xml.etree.ElementTree.ParseError: if the file is not valid xml
+
+    Returns:
+        VasprunDOSData: energies, densities, Fermi energy, valence band maximum
+        and band gap
+    """
+    path = []  # tags of the open elements
+    elements = []  # the open elements
+    energies: Optional[np.ndarray] = None
+    densities: Optional[np.ndarray] = None
+    efermi: Optional[float] = None
+    vbm, cbm = -np.inf, np.inf
+    spin_rows: List[str] = []
+    total_dos: List[np.ndarray] = []
+    with _open(filename) as f:
+        for event, elem in ElementTree.iterparse(f, events=("start", "end")):
+            if event == "start":
+                path.append(elem.tag)
+                elements.append(elem)
+                if path[-2:] == ["calculation", "eigenvalues"]:
+                    # only the eigenvalues of the last calculation are used
+                    vbm, cbm = -np.inf, np.inf
+                elif path[-2:] == ["dos", "total"]:
+                    total_dos = []
+                continue
+
+            if elem.tag == "r" and path[-7:-5] == ["calculation", "eigenvalues"]:
+                eigenvalue, occupation = elem.text.split()[:2]
+                if float(occupation) > occupation_tolerance:
+                    vbm = max(vbm, float(eigenvalue))
+                else:
+                    cbm = min(cbm, float(eigenvalue))
+            elif elem.tag == "r" and path[-5:-3] == ["total", "array"]:
+                spin_rows.append(elem.text)
+            elif elem.tag == "set" and path[-4:-2] == ["total", "array"]:
+                # end of the rows of one spin channel
+                total_dos.append(np.array(" ".join(spin_rows).split(), dtype=float))
+                spin_rows = []
+            elif elem.tag == "total" and path[-2] == "dos":
+                total_dos = [rows.reshape(-1, 3) for rows in total_dos]
+                energies = total_dos[0][:, 0]
+                densities = np.array([rows[:, 1] for rows in total_dos])
+            elif elem.tag == "i" and path[-2] == "dos" and elem.get("name") == "efermi":
+                efermi = float(elem.text)
+
+            # discard each element once read, so the tree never grows
+            path.pop()
+            elements.pop()
+            if elements:
+                elements[-1].remove(elem)
+
+    if densities is None:
+        raise ValueError(f"No total density-of-states found in {filename}")
+    if efermi is None:
+        raise ValueError(f"No Fermi energy found in {filename}")
+    if not np.isfinite(vbm) or not np.isfinite(cbm):
+        raise ValueError(f"No band edges could be found in {filename}")
+    return VasprunDOSData(
+        energies=energies,
+        densities=densities,
+        efermi=efermi,
+        vbm=vbm,
+        bandgap=max(cbm - vbm, 0.0),
+    )
+
+
+def read_doscar(filename: str) -> DoscarData:
+    """read the total density-of-states from a VASP ``DOSCAR`` file. Only the
+    header and the total density-of-states block are read; the projected
+    density-of-states that may follow is not.
+
+    Args:
+        filename (str): path to ``DOSCAR`` file
+
+    Raises:
+        ValueError: if the file ends before the total density-of-states
+
+    Returns:
+        DoscarData: energies, densities and Fermi energy
+    """
+    with open(filename, "r") as f:
+        header = list(islice(f, 6))
+        if len(header) < 6:
+            raise ValueError(f"{filename} is not a complete DOSCAR file")
+        _, _, nedos, efermi = header[5].split()[:4]
+        rows = list(islice(f, int(nedos)))
+    if len(rows) < int(nedos):
+        raise ValueError(f"{filename} is not a complete DOSCAR file")
+    data = np.array(" ".join(rows).split(), dtype=float).reshape(int(nedos), -1)
+    # columns are energy, dos and integrated dos, with a dos and integrated
+    # dos column for each spin channel if spin-polarised
+    nspin = (data.shape[1] - 1) // 2
+    return DoscarData(
+        energies=data[:, 0], densities=data[:, 1 : 1 + nspin].T, efermi=float(efermi)
+    )
+
+
+def read_totdos(filename: str) -> Tuple[np.ndarray, np.ndarray]:
+    """read an `SC-Fermi <https://github.com/jbuckeridge/sc-fermi>`_ formatted
+    ``totdos.dat`` file, of an energy column followed by one (or, if
+    spin-polarised, two) density-of-states columns. Lines starting with ``#``
+    are skipped.
+
+    Args:
+        filename (str): path to ``totdos.dat`` file
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: energies, and the density-of-states
+        summed over the columns (taking the absolute value of each, as spin
+        down densities may be written as negative)
+    """
+    with open(filename, "r") as f:
+        rows = [line for line in f if line.strip() and not line.startswith("#")]
+    ncolumns = len(rows[0].split())
+    data = np.array(" ".join(rows).split(), dtype=float).reshape(len(rows), ncolumns)
+    return data[:, 0], np.sum(np.abs(data[:, 1:]), axis=1)
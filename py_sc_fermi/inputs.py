@@ -4,11 +4,14 @@ import numpy as np
 from py_sc_fermi.defect_species import DefectSpecies
 from py_sc_fermi.defect_charge_state import DefectChargeState
 from py_sc_fermi.dos import DOS
-from pymatgen.core import Structure
-from typing import Optional, List
+from py_sc_fermi.disk_cache import Cache
+from py_sc_fermi.dos_readers import read_totdos
+from typing import Callable, Optional, List, TypeVar
 import yaml
 import os
 
+_T = TypeVar("_T")
+
 InputFermiData = namedtuple(
     "InputFermiData", "spin_pol nelect bandgap temperature defect_species",
 )
@@ -22,9 +25,17 @@ class InputSet:
     temperature: float
     convergence_tolerance: float = 1e-18
     n_trial_steps: int = 1500
+    solver: str = "brent"
+    log_space: bool = False
 
     @classmethod
-    def from_yaml(cls, input_file: str, structure_file: str = "", dos_file: str = ""):
+    def from_yaml(
+        cls,
+        input_file: str,
+        structure_file: str = "",
+        dos_file: str = "",
+        cache: Optional[Cache] = None,
+    ):
         """
         Generate an InputSet object from a given yaml file
 
@@ -32,6 +43,12 @@ class InputSet:
             input_file (str): path to yaml file to read
             structure_file (str): path to structure file to read
             dos_file (str): path to dos file to read
+            cache (Optional[Cache], optional): dictionary, or
+              ``py_sc_fermi.disk_cache.DiskCache``, in which to keep the
+              ``DOS`` and volume read from any file, so that further inputs
+              sharing the same files (and the same band gap and number of
+              electrons) reuse them rather than parsing the files again.
+              Defaults to None (no caching).
 
         Returns:
             InputSet: full set of inputs for ``py-sc-fermi.DefectSystem``.
@@ -46,20 +63,35 @@ class InputSet:
 
         if dos_file != "":
             if dos_file.endswith(".dat"):
-                dos_data = read_dos_data(
-                    input_dict["bandgap"], input_dict["nelect"], dos_file
-                )
-                dos = DOS(
-                    dos=dos_data.dos,
-                    edos=dos_data.edos,
-                    nelect=input_dict["nelect"],
-                    bandgap=input_dict["bandgap"],
+                dos = _cached(
+                    cache,
+                    ("totdos", dos_file, input_dict["bandgap"], input_dict["nelect"]),
+                    read_dos_data,
+                    input_dict["bandgap"],
+                    input_dict["nelect"],
+                    dos_file,
                 )
 
             # or if DOS file is an .xml, try and read it as a vasprun
-            elif dos_file.endswith(".xml"):
-                dos = DOS.from_vasprun(
-                    dos_file, input_dict["nelect"], input_dict["bandgap"]
+            elif dos_file.endswith((".xml", ".xml.gz")):
+                dos = _cached(
+                    cache,
+                    ("vasprun", dos_file, input_dict["bandgap"], input_dict["nelect"]),
+                    DOS.from_vasprun,
+                    dos_file,
+                    input_dict["nelect"],
+                    input_dict["bandgap"],
+                )
+
+            # or if DOS file is a DOSCAR, read its total density-of-states
+            elif os.path.basename(dos_file).startswith("DOSCAR"):
+                dos = _cached(
+                    cache,
+                    ("doscar", dos_file, input_dict["bandgap"], input_dict["nelect"]),
+                    DOS.from_doscar,
+                    dos_file,
+                    input_dict["nelect"],
+                    input_dict["bandgap"],
                 )
 
         elif "edos" in input_dict.keys() and "dos" in input_dict.keys():
@@ -67,14 +99,23 @@ class InputSet:
 
         # or if there is a `totdos.dat` in the current folder
         elif "totdos.dat" in os.listdir("."):
-            dos = read_dos_data(
+            dos = _cached(
+                cache,
+                ("totdos", "totdos.dat", input_dict["bandgap"], input_dict["nelect"]),
+                read_dos_data,
                 filename="totdos.dat",
                 bandgap=input_dict["bandgap"],
                 nelect=input_dict["nelect"],
             )
         # or if there is a vasprun in the current folder
         elif "vasprun.xml" in os.listdir("."):
-            dos = DOS.from_vasprun("vasprun.xml", nelect=input_dict["nelect"])
+            dos = _cached(
+                cache,
+                ("vasprun", "vasprun.xml", None, input_dict["nelect"]),
+                DOS.from_vasprun,
+                "vasprun.xml",
+                nelect=input_dict["nelect"],
+            )
 
         # if all else fails, raise an Error
 
@@ -87,13 +128,25 @@ class InputSet:
 
         # read volume
         if structure_file != "":
-            volume = read_volume_from_structure_file(structure_file)
+            volume = _cached(
+                cache,
+                ("volume", structure_file),
+                read_volume_from_structure_file,
+                structure_file,
+            )
 
         elif "volume" not in input_dict.keys():
             if "unitcell.dat" in os.listdir("."):
-                volume = volume_from_unitcell("unitcell.dat")
+                volume = _cached(
+                    cache,
+                    ("volume", "unitcell.dat"),
+                    volume_from_unitcell,
+                    "unitcell.dat",
+                )
             elif "POSCAR" in os.listdir("."):
-                volume = volume_from_structure("POSCAR")
+                volume = _cached(
+                    cache, ("volume", "POSCAR"), volume_from_structure, "POSCAR"
+                )
             else:
                 raise ValueError(
                     """No volume found in input file and no file defining the 
@@ -108,10 +161,19 @@ class InputSet:
             input_dict["convergence_tolerance"] = 1e-18
         if "n_trial_steps" not in list(input_dict.keys()):
             input_dict["n_trial_steps"] = 1500
+        if "solver" not in list(input_dict.keys()):
+            input_dict["solver"] = "brent"
+        if "log_space" not in list(input_dict.keys()):
+            input_dict["log_space"] = False
 
         defect_species = [
             DefectSpecies.from_dict(d, volume) for d in input_dict["defect_species"]
         ]
+        # evaluate any chemical-potential-dependent formation energies
+        if "chemical_potentials" in list(input_dict.keys()):
+            for ds in defect_species:
+                for cs in ds.charge_states.values():
+                    cs.set_chemical_potentials(input_dict["chemical_potentials"])
 
         return cls(
             dos=dos,
@@ -120,6 +182,8 @@ class InputSet:
             temperature=input_dict["temperature"],
             convergence_tolerance=input_dict["convergence_tolerance"],
             n_trial_steps=input_dict["n_trial_steps"],
+            solver=input_dict["solver"],
+            log_space=input_dict["log_space"],
         )
 
     @classmethod
@@ -131,6 +195,8 @@ class InputSet:
         n_trial_steps: int = 1000,
         convergence_tolerance: float = 1e-18,
         frozen: bool = False,
+        solver: str = "brent",
+        cache: Optional[Cache] = None,
     ) -> "InputSet":
         """Generate an InputSet object from a
         `SC-Fermi <https://github.com/jbuckeridge/sc-fermi>`_ -formatted input file.
@@ -145,14 +211,33 @@ class InputSet:
               py-sc-fermi solver. Defaults to 1e-18.
             frozen (bool, optional): True if any defects or defect charge states in
               in the input file have fixed concentrations. Defaults to False.
+            solver (str, optional): root-finding method for py-sc-fermi solver.
+              Defaults to ``"brent"``.
+            cache (Optional[Cache], optional): dictionary, or
+              ``py_sc_fermi.disk_cache.DiskCache``, in which to keep the
+              ``DOS`` and volume read from the structure and dos files, to be
+              reused by further inputs (see :meth:`from_yaml`).
+              Defaults to None (no caching).
 
         Returns:
             InputSet: full set of inputs for ``py-sc-fermi.DefectSystem``.
         """
 
-        volume = read_volume_from_structure_file(structure_file)
+        volume = _cached(
+            cache,
+            ("volume", structure_file),
+            read_volume_from_structure_file,
+            structure_file,
+        )
         input_data = read_input_fermi(input_file, volume, frozen)
-        dos = read_dos_data(input_data.bandgap, input_data.nelect, dos_file)
+        dos = _cached(
+            cache,
+            ("totdos", dos_file, input_data.bandgap, input_data.nelect),
+            read_dos_data,
+            input_data.bandgap,
+            input_data.nelect,
+            dos_file,
+        )
         return cls(
             dos=dos,
             volume=volume,
@@ -160,9 +245,28 @@ class InputSet:
             temperature=input_data.temperature,
             n_trial_steps=n_trial_steps,
             convergence_tolerance=convergence_tolerance,
+            solver=solver,
         )
 
 
+def _cached(
+    cache: Optional[Cache], key: tuple, func: Callable[..., _T], *args, **kwargs
+) -> _T:
+    """return ``func(*args, **kwargs)``, reusing the result of an earlier call
+    stored in ``cache`` (a dictionary or a ``DiskCache``) under the same
+    ``key``. The file path that follows the kind of each key is made
+    absolute, so that different spellings of a path share an entry."""
+    if cache is None:
+        return func(*args, **kwargs)
+    key = (key[0], os.path.abspath(key[1])) + tuple(key[2:])
+    try:
+        return cache[key]
+    except KeyError:
+        value = func(*args, **kwargs)
+        cache[key] = value
+        return value
+
+
 def is_yaml(filename: str) -> bool:
     """True if file is readable as a yaml file
 
@@ -296,11 +400,8 @@ def read_dos_data(bandgap: float, nelect: int, filename: str = "totdos.dat",) ->
     Returns:
         DOS: py-sc-Fermi ``DOS`` object
     """
-    data = np.loadtxt(filename)
-    edos = data[:, 0]
-    dos = np.sum(np.abs(data[:, 1:]), axis=1)
-    dos = DOS(dos=dos, edos=edos, nelect=nelect, bandgap=bandgap)
-    return dos
+    edos, densities = read_totdos(filename)
+    return DOS(dos=densities, edos=edos, nelect=nelect, bandgap=bandgap)
 
 
 def volume_from_structure(structure_file: str) -> float:
@@ -312,6 +413,9 @@ def volume_from_structure(structure_file: str) -> float:
     Returns:
         float: volume of structure
     """
+    # pymatgen is slow to import, so is only imported when it is needed
+    from pymatgen.core import Structure  # type: ignore
+
     return Structure.from_file(structure_file).volume
 
 
@@ -0,0 +1,46 @@
+import numpy as np
+from numpy.typing import ArrayLike
+
+
+def logsumexp(a: ArrayLike, axis: int = -1) -> np.ndarray:
+    """``log(sum(exp(a), axis))`` evaluated without overflow or underflow, by
+    shifting the exponents so the largest along ``axis`` is zero. Entries of
+    ``-np.inf`` (zero concentrations) are ignored, and the sum of an empty or
+    all ``-np.inf`` axis is ``-np.inf``.
+
+    Args:
+        a (ArrayLike): array of logarithms
+        axis (int, optional): axis to sum over. Defaults to -1.
+
+    Returns:
+        np.ndarray: logarithm of the sum of the exponentials along ``axis``,
+        as a NumPy scalar if ``a`` is one-dimensional
+    """
+    a = np.asarray(a, dtype=float)
+    if a.shape[axis] == 0:
+        return np.full(np.sum(a, axis=axis).shape, -np.inf)[()]
+    shift = np.max(a, axis=axis, keepdims=True)
+    shift = np.where(np.isfinite(shift), shift, 0.0)
+    with np.errstate(divide="ignore"):
+        summed = np.log(np.sum(np.exp(a - shift), axis=axis))
+    return (summed + np.squeeze(shift, axis=axis))[()]
+
+
+def log_occupation(x: np.ndarray) -> np.ndarray:
+    """logarithm of the Fermi-Dirac occupation ``1 / (1 + exp(x))``, evaluated
+    as ``-log(1 + exp(x))`` with ``np.logaddexp`` so that it is exact for
+    large positive and negative ``x``.
+
+    Args:
+        x (np.ndarray): energy above the Fermi energy in units of kT
+
+    Returns:
+        np.ndarray: logarithm of the occupation
+    """
+    return -np.logaddexp(0.0, x)
+
+
+def safe_log(x: ArrayLike) -> np.ndarray:
+    """natural logarithm that maps zero to ``-np.inf`` without a warning"""
+    with np.errstate(divide="ignore"):
+        return np.log(x)
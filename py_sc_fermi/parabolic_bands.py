@@ -0,0 +1,320 @@
+import numpy as np
+from typing import Tuple
+from numpy.typing import ArrayLike
+from py_sc_fermi.defect_charge_state import kboltz
+
+# physical constants (CODATA 2018), in SI units
+electron_mass = 9.1093837015e-31  # kg
+hbar = 1.054571817e-34  # J s
+electron_charge = 1.602176634e-19  # C
+
+# the effective density of states, 2 (m kT / 2 pi hbar^2)^(3/2), per cubic
+# Angstrom for an effective mass of one electron mass and kT of 1 eV
+_effective_density_of_states = (
+    2.0
+    * (electron_mass * electron_charge / (2.0 * np.pi * hbar ** 2)) ** 1.5
+    * 1e-30
+)
+
+
+class ParabolicBandDOS(object):
+    """Carrier concentrations of a semiconductor with a single parabolic
+    valence band and conduction band, described by their density-of-states
+    effective masses rather than a calculated density-of-states.
+
+    Has the same carrier concentration methods as ``DOS``, and can be passed
+    as the ``dos`` of a ``DefectSystem`` in its place, e.g. to screen
+    materials for which only the band gap and effective masses are known.
+    The valence band maximum is at zero and the conduction band minimum at
+    ``bandgap``, and the concentration of electrons is
+
+    .. math::
+
+        n_0 = N_c F_{1/2}\\left(\\frac{E_F - E_g}{kT}\\right), \\quad
+        N_c = 2 \\left(\\frac{m_e kT}{2 \\pi \\hbar^2}\\right)^{3/2} V
+
+    (and likewise for holes), where :math:`F_{1/2}` is the normalised
+    Fermi-Dirac integral of order one half and :math:`V` is the volume of the
+    unit cell, so that, as for a ``DOS``, concentrations are per unit cell.
+    :math:`F_{1/2}` is evaluated with the closed-form approximation of
+    Bednarczyk and Bednarczyk, Phys. Lett. A 64, 409 (1978), which has a
+    relative error of less than 0.4% for any Fermi energy, so each evaluation
+    takes a fixed number of operations however fine the energy range.
+
+    The effective masses are density-of-states effective masses, so any
+    valley degeneracy or anisotropy should be folded into them.
+
+    Args:
+        bandgap (float): band gap (eV)
+        electron_effective_mass (float): density-of-states effective mass of
+          the conduction band, in units of the electron mass
+        hole_effective_mass (float): density-of-states effective mass of the
+          valence band, in units of the electron mass
+        volume (float): volume of the unit cell in Angstroms cubed
+        energy_window (float, optional): distance (eV) below the valence band
+          maximum and above the conduction band minimum within which the
+          self-consistent Fermi energy is searched for (see :meth:`emin` and
+          :meth:`emax`). Defaults to 2.0.
+    """
+
+    def __init__(
+        self,
+        bandgap: float,
+        electron_effective_mass: float,
+        hole_effective_mass: float,
+        volume: float,
+        energy_window: float = 2.0,
+    ):
+        """Initialise a ``ParabolicBandDOS`` instance."""
+        if electron_effective_mass <= 0.0 or hole_effective_mass <= 0.0:
+            raise ValueError("effective masses must be positive")
+        self.bandgap = bandgap
+        self.electron_effective_mass = electron_effective_mass
+        self.hole_effective_mass = hole_effective_mass
+        self.volume = volume
+        self.energy_window = energy_window
+        # there is no density-of-states calculation to take the number of
+        # electrons from, but ``DefectSystem`` reports it
+        self.nelect = None
+        self.spin_polarised = False
+        # log of the effective densities of states at 1 K, which scale as
+        # T^(3/2)
+        self._log_nv = np.log(
+            _effective_density_of_states
+            * (hole_effective_mass * kboltz) ** 1.5
+            * volume
+        )
+        self._log_nc = np.log(
+            _effective_density_of_states
+            * (electron_effective_mass * kboltz) ** 1.5
+            * volume
+        )
+
+    def __repr__(self):
+        return (
+            f"ParabolicBandDOS(bandgap={self.bandgap}, "
+            f"electron_effective_mass={self.electron_effective_mass}, "
+            f"hole_effective_mass={self.hole_effective_mass}, "
+            f"volume={self.volume})"
+        )
+
+    def emin(self) -> float:
+        """lowest Fermi energy considered, ``energy_window`` below the valence
+        band maximum
+
+        Returns:
+            float: minimum energy
+        """
+        return -self.energy_window
+
+    def emax(self) -> float:
+        """highest Fermi energy considered, ``energy_window`` above the
+        conduction band minimum
+
+        Returns:
+            float: maximum energy
+        """
+        return self.bandgap + self.energy_window
+
+    def effective_densities_of_states(
+        self, temperature: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """effective densities of states of the valence and conduction bands,
+        :math:`N_v` and :math:`N_c`, per unit cell.
+
+        Args:
+            temperature (np.ndarray): temperature, or array of temperatures
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: effective density of states of the
+            valence band, and of the conduction band
+        """
+        log_t = 1.5 * np.log(np.asarray(temperature, dtype=float))
+        return np.exp(self._log_nv + log_t)[()], np.exp(self._log_nc + log_t)[()]
+
+    def _reduced_energies(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """reduced Fermi energies of holes and electrons relative to their band
+        edges, and kT"""
+        e_fermi, temperature = np.broadcast_arrays(
+            np.asarray(e_fermi, dtype=float), np.asarray(temperature, dtype=float)
+        )
+        kt = kboltz * temperature
+        return -e_fermi / kt, (e_fermi - self.bandgap) / kt, kt
+
+    def log_carrier_concentrations(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """natural logarithms of the hole and electron concentrations, which
+        remain finite when the concentrations themselves underflow. Accepts
+        arrays of Fermi energies and/or temperatures, which are broadcast
+        against each other.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: log of the concentration of holes,
+            log of the concentration of electrons
+        """
+        eta_p, eta_n, kt = self._reduced_energies(e_fermi, temperature)
+        log_t = 1.5 * np.log(kt / kboltz)
+        log_p0 = self._log_nv + log_t + log_fermi_dirac_half(eta_p)
+        log_n0 = self._log_nc + log_t + log_fermi_dirac_half(eta_n)
+        return log_p0[()], log_n0[()]
+
+    def log_carrier_derivatives(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """derivatives of :meth:`log_carrier_concentrations` with respect to
+        the Fermi energy, i.e. ``dp0 / dE / p0`` and ``dn0 / dE / n0``.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: derivative of the log of the
+            concentration of holes, and of electrons (per eV)
+        """
+        eta_p, eta_n, kt = self._reduced_energies(e_fermi, temperature)
+        dlog_p0 = -_log_fermi_dirac_half_derivative(eta_p) / kt
+        dlog_n0 = _log_fermi_dirac_half_derivative(eta_n) / kt
+        return dlog_p0[()], dlog_n0[()]
+
+    def carrier_concentrations(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """hole and electron concentrations per unit cell at a given Fermi
+        energy and temperature. Accepts arrays of Fermi energies and/or
+        temperatures, which are broadcast against each other.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: concentration of holes,
+            concentration of electrons
+        """
+        log_p0, log_n0 = self.log_carrier_concentrations(e_fermi, temperature)
+        return np.exp(log_p0), np.exp(log_n0)
+
+    carrier_concentrations_array = carrier_concentrations
+
+    def carrier_derivatives(
+        self, e_fermi: ArrayLike, temperature: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """derivatives of the hole and electron concentrations with respect to
+        the Fermi energy.
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy, or array of Fermi energies
+            temperature (ArrayLike): temperature, or array of temperatures
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: derivative of the concentration of
+            holes, derivative of the concentration of electrons (per eV)
+        """
+        p0, n0 = self.carrier_concentrations(e_fermi, temperature)
+        dlog_p0, dlog_n0 = self.log_carrier_derivatives(e_fermi, temperature)
+        return p0 * dlog_p0, n0 * dlog_n0
+
+    def carrier_table(
+        self, temperature: float, tolerance: float = 1e-6
+    ) -> "ParabolicBandDOS":
+        """as ``DOS.carrier_table``, but as the carrier concentrations of a
+        ``ParabolicBandDOS`` are already cheap to evaluate, this is the
+        ``ParabolicBandDOS`` itself.
+
+        Args:
+            temperature (float): temperature
+            tolerance (float, optional): unused. Defaults to 1e-6.
+
+        Returns:
+            ParabolicBandDOS: this ``ParabolicBandDOS``
+        """
+        return self
+
+    @classmethod
+    def from_dict(cls, dos_dict: dict) -> "ParabolicBandDOS":
+        """return a ``ParabolicBandDOS`` from a dictionary with the keys
+        ``bandgap``, ``electron_effective_mass``, ``hole_effective_mass``,
+        ``volume`` and, optionally, ``energy_window``.
+
+        Args:
+            dos_dict (dict): dictionary defining the parabolic bands
+
+        Returns:
+            ParabolicBandDOS: ``ParabolicBandDOS`` described by ``dos_dict``
+        """
+        return cls(**dos_dict)
+
+    def as_dict(self) -> dict:
+        """dictionary representation of the ``ParabolicBandDOS``, which can be
+        read by :meth:`from_dict`
+
+        Returns:
+            dict: dictionary defining the parabolic bands
+        """
+        return {
+            "bandgap": self.bandgap,
+            "electron_effective_mass": self.electron_effective_mass,
+            "hole_effective_mass": self.hole_effective_mass,
+            "volume": self.volume,
+            "energy_window": self.energy_window,
+        }
+
+
+def _nu(eta: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """the function ``nu(eta)`` of the Bednarczyk approximation, and its
+    derivative"""
+    g = np.exp(-0.17 * (eta + 1.0) ** 2)
+    nu = eta ** 4 + 50.0 + 33.6 * eta * (1.0 - 0.68 * g)
+    dnu = 4.0 * eta ** 3 + 33.6 * (1.0 - 0.68 * g) + 33.6 * eta * 0.2312 * g * (
+        eta + 1.0
+    )
+    return nu, dnu
+
+
+def log_fermi_dirac_half(eta: np.ndarray) -> np.ndarray:
+    """natural logarithm of the normalised Fermi-Dirac integral of order one
+    half, :math:`F_{1/2}(\\eta) = \\frac{2}{\\sqrt{\\pi}} \\int_0^\\infty
+    \\frac{\\sqrt{x}}{1 + e^{x - \\eta}} dx`, with the approximation of
+    Bednarczyk and Bednarczyk (1978),
+
+    .. math::
+
+        F_{1/2}(\\eta) \\approx \\left[e^{-\\eta} + \\frac{3 \\sqrt{\\pi}}{4}
+        \\nu^{-3/8}\\right]^{-1}, \\quad \\nu = \\eta^4 + 50 + 33.6 \\eta
+        \\left(1 - 0.68 e^{-0.17 (\\eta + 1)^2}\\right)
+
+    which tends to the exact limits :math:`e^\\eta` and
+    :math:`\\frac{4}{3 \\sqrt{\\pi}} \\eta^{3/2}` far from the band edge. The
+    sum is evaluated in log space, so the result is finite for any ``eta``.
+
+    Args:
+        eta (np.ndarray): reduced Fermi energy relative to the band edge,
+          in units of kT (positive inside the band)
+
+    Returns:
+        np.ndarray: logarithm of :math:`F_{1/2}(\\eta)`
+    """
+    eta = np.asarray(eta, dtype=float)
+    nu, _ = _nu(eta)
+    log_c = np.log(0.75 * np.sqrt(np.pi))
+    return -np.logaddexp(-eta, log_c - 0.375 * np.log(nu))
+
+
+def _log_fermi_dirac_half_derivative(eta: np.ndarray) -> np.ndarray:
+    """derivative of :func:`log_fermi_dirac_half` with respect to ``eta``"""
+    eta = np.asarray(eta, dtype=float)
+    nu, dnu = _nu(eta)
+    log_c = np.log(0.75 * np.sqrt(np.pi))
+    log_a = -eta
+    log_b = log_c - 0.375 * np.log(nu)
+    log_d = np.logaddexp(log_a, log_b)
+    # fractions of the bracketed sum contributed by each term
+    return np.exp(log_a - log_d) + 0.375 * np.exp(log_b - log_d) * dnu / nu
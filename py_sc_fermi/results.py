@@ -0,0 +1,478 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from py_sc_fermi.compiled_defect_system import CompiledDefectSystem
+    from py_sc_fermi.solvers import RootResult
+
+
+@dataclass(frozen=True)
+class SCFermiSolution:
+    """The result of solving a ``DefectSystem`` for its self-consistent Fermi
+    energy, together with the carrier and defect concentrations at that Fermi
+    energy. All reporting and serialisation of a solved ``DefectSystem`` is
+    drawn from this object, so it only has to be solved once. Concentrations
+    are stored per unit cell.
+
+    Args:
+        fermi_energy (float): self-consistent Fermi energy (eV)
+        residual (float): absolute net charge at ``fermi_energy``
+        iterations (int): number of net charge evaluations used by the solver
+        converged (bool): whether the solver reached the convergence tolerance
+        temperature (float): temperature (K)
+        volume (float): volume of the unit cell in Angstroms cubed
+        p0 (float): hole concentration
+        n0 (float): electron concentration
+        concentrations (Dict[str, Dict[int, float]]): concentration of each
+          ``DefectChargeState``, as ``{species name: {charge: concentration}}``
+        species_concentrations (Dict[str, float]): total concentration of each
+          ``DefectSpecies``
+        nsites (Dict[str, int]): site degeneracy of each ``DefectSpecies``
+        fixed_species (FrozenSet[str]): names of the ``DefectSpecies`` with a
+          fixed total concentration
+        fixed_charge_states (Dict[str, FrozenSet[int]]): charges of the
+          fixed-concentration ``DefectChargeState`` objects of each
+          ``DefectSpecies``
+
+    Note:
+        The dataclass is frozen; the dictionaries it holds should also be
+        treated as read-only.
+    """
+
+    fermi_energy: float
+    residual: float
+    iterations: int
+    converged: bool
+    temperature: float
+    volume: float
+    p0: float
+    n0: float
+    concentrations: Dict[str, Dict[int, float]]
+    species_concentrations: Dict[str, float]
+    nsites: Dict[str, int]
+    fixed_species: FrozenSet[str]
+    fixed_charge_states: Dict[str, FrozenSet[int]]
+
+    @classmethod
+    def from_compiled(
+        cls,
+        compiled: "CompiledDefectSystem",
+        result: "RootResult",
+        temperature: float,
+    ) -> "SCFermiSolution":
+        """build a solution from a ``CompiledDefectSystem`` and the result of
+        solving for the root of its net charge.
+
+        Args:
+            compiled (CompiledDefectSystem): array-backed defect system
+            result (RootResult): result of the root search
+            temperature (float): temperature at which the system was solved
+
+        Returns:
+            SCFermiSolution: solution with all concentrations evaluated
+        """
+        e_fermi = result.root
+        p0, n0 = compiled.carrier_concentrations(e_fermi, temperature)
+        cs_concentrations = compiled.charge_state_concentrations(e_fermi, temperature)
+        species_concentrations = compiled.species_concentrations(e_fermi, temperature)
+        concentrations: Dict[str, Dict[int, float]] = {
+            name: {} for name in compiled.species_names
+        }
+        fixed_charge_states: Dict[str, set] = {
+            name: set() for name in compiled.species_names
+        }
+        for i, (q, conc) in enumerate(zip(compiled.charges, cs_concentrations)):
+            name = compiled.species_names[compiled.species_index[i]]
+            concentrations[name][int(q)] = float(conc)
+            if not np.isnan(compiled.fixed_concentrations[i]):
+                fixed_charge_states[name].add(int(q))
+        return cls(
+            fermi_energy=float(e_fermi),
+            residual=float(result.residual),
+            iterations=int(result.iterations),
+            converged=bool(result.converged),
+            temperature=temperature,
+            volume=compiled.volume,
+            p0=float(p0),
+            n0=float(n0),
+            concentrations=concentrations,
+            species_concentrations={
+                name: float(c)
+                for name, c in zip(compiled.species_names, species_concentrations)
+            },
+            nsites={
+                name: int(n) for name, n in zip(compiled.species_names, compiled.nsites)
+            },
+            fixed_species=frozenset(
+                name
+                for name, fixed in zip(
+                    compiled.species_names, compiled.species_fixed_concentrations
+                )
+                if not np.isnan(fixed)
+            ),
+            fixed_charge_states={
+                name: frozenset(charges) for name, charges in fixed_charge_states.items()
+            },
+        )
+
+    @property
+    def species_names(self):
+        """names of the ``DefectSpecies`` in the solved ``DefectSystem``"""
+        return list(self.species_concentrations.keys())
+
+    def as_dict(
+        self, decomposed: bool = False, per_volume: bool = True,
+    ) -> Dict[str, Any]:
+        """Returns a dictionary of the Fermi energy, carrier concentrations and
+        defect concentrations.
+
+        Args:
+            decomposed (bool, optional): if True, return a dictionary in which the
+              concentration of each ``DefectChargeState`` is given explicitly,
+              rather than as a sum over all ``DefectChargeState`` objects in the
+              each ``DefectSpecies``. Defaults to False.
+            per_volume (bool, optional): if True, return concentrations in units
+              of cm^-3, else returns concentration per unit cell. Defaults to True.
+
+        Returns:
+            Dict[str, Any]: dictionary specifying the Fermi Energy,
+            hole concentration (``"p0"``), electron concentration
+            (``"n0"``), and the defect concentrations.
+        """
+        if per_volume == True:
+            scale = 1e24 / self.volume
+        else:
+            scale = 1
+        run_stats = {
+            "Fermi Energy": float(self.fermi_energy),
+            "p0": float(self.p0 * scale),
+            "n0": float(self.n0 * scale),
+        }
+        if decomposed == False:
+            sum_concs = {
+                str(name): float(conc * scale)
+                for name, conc in self.species_concentrations.items()
+            }
+            return {**run_stats, **sum_concs}
+        else:
+            decomp_concs = {
+                str(name): {int(q): float(c * scale) for q, c in concs.items()}
+                for name, concs in self.concentrations.items()
+            }
+            return {**run_stats, **decomp_concs}
+
+    def site_percentages(self) -> Dict[str, float]:
+        """Returns a dictionary giving, for each ``DefectSpecies``, the
+        percentage of the sites in the structure that host that defect.
+
+        Returns:
+            Dict[str, float]: dictionary specifying the per-DefectSpecies site
+            concentrations.
+        """
+        return {
+            str(name): float((conc / self.nsites[name]) * 100)
+            for name, conc in self.species_concentrations.items()
+        }
+
+    def report_string(self) -> str:
+        """a report in the style of `SC-Fermi <https://github.com/jbuckeridge/sc-fermi>`_
+        which summarises the solution.
+
+        Returns:
+            str: report
+        """
+        string = ""
+        string += f"Temperature :      {self.temperature}  (K)\n"
+        string += f"SC Fermi level :      {self.fermi_energy}  (eV)\n"
+        string += "Concentrations:\n"
+        string += f"n (electrons)  : {self.n0 * 1e24 / self.volume} cm^-3\n"
+        string += f"p (holes)      : {self.p0 * 1e24 / self.volume} cm^-3\n"
+        for name, concall in self.species_concentrations.items():
+            if name not in self.fixed_species:
+                string += f"{name:9}      : {concall * 1e24 / self.volume} cm^-3, (percentage of defective sites: {(concall / self.nsites[name]) * 100:.3} %)\n"
+            else:
+                string += f"{name:9}      : {concall * 1e24 / self.volume} cm^-3 [fixed]\n"
+        string += "\nBreakdown of concentrations for each defect charge state:\n"
+        for name, concall in self.species_concentrations.items():
+            string += "---------------------------------------------------------\n"
+            if concall == 0.0:
+                string += f"{name:11}: Zero total - cannot give breakdown\n"
+                continue
+            string += f"{name:11}: Charge Concentration(cm^-3) Total\n"
+            for q, conc in self.concentrations[name].items():
+                if q in self.fixed_charge_states[name]:
+                    fix_str = " [fixed]"
+                else:
+                    fix_str = ""
+                string += f"           : {q: 1}  {conc * 1e24 / self.volume:5e}          {(conc * 100 / concall):.2f} {fix_str}\n"
+        return string
+
+
+@dataclass(frozen=True)
+class InverseSolution:
+    """The result of solving a ``DefectSystem`` for the fixed concentration or
+    formation energy offset of one ``DefectSpecies`` at which a target
+    quantity (a carrier concentration, the Fermi energy or a defect
+    concentration) reaches a given value.
+
+    Args:
+        target (str): the target quantity, ``"n0"``, ``"p0"``,
+          ``"fermi_energy"`` or the name of a ``DefectSpecies``
+        target_value (float): value of the target quantity reached, in the
+          units in which it was requested
+        species (str): name of the ``DefectSpecies`` varied
+        unknown (str): ``"concentration"`` if the fixed total concentration
+          of ``species`` was varied, or ``"energy_offset"`` if an offset to
+          its formation energies was varied
+        unknown_value (float): value of the unknown found, a concentration in
+          the units in which the bounds were given, or an offset in eV
+        converged (bool): whether ``target_value`` is within the requested
+          tolerance of its target
+        iterations (int): number of self-consistent Fermi energy solves
+        evaluations (int): total number of evaluations of the net charge
+          over all solves
+        solution (SCFermiSolution): self-consistent solution at
+          ``unknown_value``
+    """
+
+    target: str
+    target_value: float
+    species: str
+    unknown: str
+    unknown_value: float
+    converged: bool
+    iterations: int
+    evaluations: int
+    solution: SCFermiSolution
+
+
+@dataclass(frozen=True)
+class ConcentrationSweep:
+    """Self-consistent Fermi energies, carrier concentrations and defect
+    concentrations of a ``DefectSystem`` solved at a series of points (e.g.
+    temperatures or chemical potentials). Concentrations are stored per unit
+    cell; the accessor methods return them in cm^-3 unless
+    ``per_volume=False``.
+
+    Args:
+        fermi_energies (np.ndarray): self-consistent Fermi energy at each
+          point (eV)
+        residuals (np.ndarray): absolute net charge at each Fermi energy
+        iterations (np.ndarray): number of net charge evaluations per point
+        p0 (np.ndarray): hole concentration at each point
+        n0 (np.ndarray): electron concentration at each point
+        species_names (List[str]): names of the ``DefectSpecies``
+        species_concentrations (np.ndarray): concentration of each
+          ``DefectSpecies``, shape ``(n_points, n_species)``
+        charges (np.ndarray): charge of each ``DefectChargeState``
+        species_index (np.ndarray): index into ``species_names`` of the
+          ``DefectSpecies`` to which each ``DefectChargeState`` belongs
+        charge_state_concentrations (np.ndarray): concentration of each
+          ``DefectChargeState``, shape ``(n_points, n_charge_states)``
+        volume (float): volume of the unit cell in Angstroms cubed
+    """
+
+    fermi_energies: np.ndarray
+    residuals: np.ndarray
+    iterations: np.ndarray
+    p0: np.ndarray
+    n0: np.ndarray
+    species_names: List[str]
+    species_concentrations: np.ndarray
+    charges: np.ndarray
+    species_index: np.ndarray
+    charge_state_concentrations: np.ndarray
+    volume: float
+
+    def _scale(self, per_volume: bool) -> float:
+        return 1e24 / self.volume if per_volume else 1.0
+
+    def carriers(self, per_volume: bool = True) -> Dict[str, np.ndarray]:
+        """hole and electron concentrations at each point
+
+        Args:
+            per_volume (bool, optional): if True, return concentrations in
+              units of cm^-3, else per unit cell. Defaults to True.
+
+        Returns:
+            Dict[str, np.ndarray]: ``{"p0": ..., "n0": ...}``
+        """
+        scale = self._scale(per_volume)
+        return {"p0": self.p0 * scale, "n0": self.n0 * scale}
+
+    def species_concentration(self, name: str, per_volume: bool = True) -> np.ndarray:
+        """total concentration of a ``DefectSpecies`` at each point
+
+        Args:
+            name (str): name of the ``DefectSpecies``
+            per_volume (bool, optional): if True, return concentrations in
+              units of cm^-3, else per unit cell. Defaults to True.
+
+        Returns:
+            np.ndarray: concentration at each point
+        """
+        i = self.species_names.index(name)
+        return self.species_concentrations[..., i] * self._scale(per_volume)
+
+    def charge_state_concentration(
+        self, name: str, charge: int, per_volume: bool = True
+    ) -> np.ndarray:
+        """concentration of one ``DefectChargeState`` at each point
+
+        Args:
+            name (str): name of the ``DefectSpecies``
+            charge (int): charge of the ``DefectChargeState``
+            per_volume (bool, optional): if True, return concentrations in
+              units of cm^-3, else per unit cell. Defaults to True.
+
+        Raises:
+            KeyError: if the ``DefectSpecies`` has no charge state ``charge``
+
+        Returns:
+            np.ndarray: concentration at each point
+        """
+        i = self.species_names.index(name)
+        match = np.flatnonzero((self.species_index == i) & (self.charges == charge))
+        if len(match) == 0:
+            raise KeyError(f"{name} has no charge state {charge}")
+        return self.charge_state_concentrations[..., match[0]] * self._scale(per_volume)
+
+    def _coordinates(self) -> Dict[str, Any]:
+        """the entries identifying each point, which lead :meth:`as_dict`"""
+        return {}
+
+    def as_dict(
+        self, decomposed: bool = False, per_volume: bool = True
+    ) -> Dict[str, Any]:
+        """Returns a dictionary of arrays, one entry per quantity, in the style
+        of ``DefectSystem.as_dict``.
+
+        Args:
+            decomposed (bool, optional): if True, give the concentration of
+              each ``DefectChargeState`` explicitly, as a dictionary of
+              ``{charge: concentrations}``. Defaults to False.
+            per_volume (bool, optional): if True, return concentrations in
+              units of cm^-3, else per unit cell. Defaults to True.
+
+        Returns:
+            Dict[str, Any]: dictionary of the points, Fermi energies, carrier
+            concentrations and defect concentrations.
+        """
+        to_return: Dict[str, Any] = {
+            **self._coordinates(),
+            "Fermi Energy": self.fermi_energies,
+            **self.carriers(per_volume),
+        }
+        for i, name in enumerate(self.species_names):
+            if decomposed:
+                to_return[name] = {
+                    int(q): self.charge_state_concentration(name, q, per_volume)
+                    for q in self.charges[self.species_index == i]
+                }
+            else:
+                to_return[name] = self.species_concentration(name, per_volume)
+        return to_return
+
+
+@dataclass(frozen=True)
+class TemperatureSweep(ConcentrationSweep):
+    """Self-consistent Fermi energies, carrier concentrations and defect
+    concentrations of a ``DefectSystem`` solved over a grid of temperatures.
+    See ``ConcentrationSweep`` for the remaining fields and accessors.
+
+    Args:
+        temperatures (np.ndarray): temperatures (K)
+    """
+
+    temperatures: np.ndarray
+
+    def _coordinates(self) -> Dict[str, Any]:
+        return {"temperature": self.temperatures}
+
+
+@dataclass(frozen=True)
+class ChemicalPotentialSweep(ConcentrationSweep):
+    """Self-consistent Fermi energies, carrier concentrations and defect
+    concentrations of a ``DefectSystem`` solved at a series of sets of
+    chemical potentials, at a single temperature. See ``ConcentrationSweep``
+    for the remaining fields and accessors.
+
+    Args:
+        temperature (float): temperature (K)
+        elements (List[str]): elements whose chemical potentials were varied
+        chemical_potentials (np.ndarray): chemical potential of each element
+          at each point, shape ``(n_points, n_elements)``
+    """
+
+    temperature: float
+    elements: List[str]
+    chemical_potentials: np.ndarray
+
+    def chemical_potential(self, element: str) -> np.ndarray:
+        """chemical potential of one element at each point
+
+        Args:
+            element (str): element
+
+        Returns:
+            np.ndarray: chemical potential at each point
+        """
+        return self.chemical_potentials[:, self.elements.index(element)]
+
+    def _coordinates(self) -> Dict[str, Any]:
+        return {
+            "chemical_potentials": {
+                el: self.chemical_potential(el) for el in self.elements
+            }
+        }
+
+
+@dataclass(frozen=True)
+class ConcentrationMap(ConcentrationSweep):
+    """Carrier and defect concentrations of a ``DefectSystem`` evaluated at
+    each of a grid of Fermi energies at a single temperature, without solving
+    for charge neutrality. ``fermi_energies`` are the Fermi energies of the
+    grid, ``residuals`` the absolute net charge at each, and ``iterations``
+    are zero. See ``ConcentrationSweep`` for the remaining fields and
+    accessors.
+
+    Args:
+        temperature (float): temperature (K)
+        net_charge (np.ndarray): net charge per unit cell at each Fermi
+          energy, as ``DefectSystem.q_tot``
+    """
+
+    temperature: float
+    net_charge: np.ndarray
+
+
+@dataclass(frozen=True)
+class QuenchSweep(ConcentrationSweep):
+    """Self-consistent Fermi energies, carrier concentrations and defect
+    concentrations of a ``DefectSystem`` annealed at each of a series of
+    temperatures and then quenched to each of a series of temperatures, with
+    the defect concentrations frozen at their anneal values. The quenched
+    fields have shape ``(n_anneal, n_quench)``, followed by the species or
+    charge-state axis where there is one. See ``ConcentrationSweep`` for the
+    remaining fields and accessors.
+
+    Args:
+        anneal_temperatures (np.ndarray): anneal temperatures (K)
+        quench_temperatures (np.ndarray): quench temperatures (K)
+        freeze (str): ``"species"`` if the total concentration of each
+          ``DefectSpecies`` was frozen, or ``"charge_states"`` if the
+          concentration of each ``DefectChargeState`` was frozen
+        anneal (TemperatureSweep): solutions at the anneal temperatures
+    """
+
+    anneal_temperatures: np.ndarray
+    quench_temperatures: np.ndarray
+    freeze: str
+    anneal: TemperatureSweep
+
+    def _coordinates(self) -> Dict[str, Any]:
+        return {
+            "anneal_temperature": self.anneal_temperatures,
+            "quench_temperature": self.quench_temperatures,
+        }
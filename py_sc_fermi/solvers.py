@@ -0,0 +1,537 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+from numpy.typing import ArrayLike
+
+_EPS = np.finfo(float).eps
+
+
+@dataclass(frozen=True)
+class RootResult:
+    """Outcome of a bracketed root search.
+
+    Args:
+        root (float): best estimate of the root.
+        residual (float): absolute value of the function at ``root``.
+        iterations (int): number of function evaluations performed.
+        converged (bool): ``True`` if ``residual < ftol`` was reached, ``False``
+          if the search stopped because the bracket collapsed to machine
+          precision or the evaluation budget was exhausted.
+    """
+
+    root: float
+    residual: float
+    iterations: int
+    converged: bool
+
+
+class _Bracket(object):
+    """Book-keeping shared by the bracketed solvers: counts function
+    evaluations, remembers the best point seen so far and signals convergence
+    via ``_Converged``."""
+
+    def __init__(self, func: Callable[[float], float], ftol: float, maxiter: int):
+        self.func = func
+        self.ftol = ftol
+        self.maxiter = maxiter
+        self.nfev = 0
+        self.best_x = np.nan
+        self.best_f = np.inf
+
+    def __call__(self, x: float) -> float:
+        if self.nfev >= self.maxiter:
+            raise _Exhausted
+        fx = float(self.func(x))
+        self.nfev += 1
+        if np.isnan(fx):
+            raise RuntimeError(f"Function value is not a number at x = {x}")
+        if abs(fx) < abs(self.best_f):
+            self.best_x, self.best_f = x, fx
+        if abs(fx) < self.ftol:
+            raise _Converged
+        return fx
+
+    def result(self, converged: bool) -> RootResult:
+        return RootResult(
+            root=float(self.best_x),
+            residual=float(abs(self.best_f)),
+            iterations=self.nfev,
+            converged=converged,
+        )
+
+
+class _Converged(Exception):
+    pass
+
+
+class _Exhausted(Exception):
+    pass
+
+
+def _xtol(a: float, b: float, xtol: float) -> float:
+    """smallest meaningful bracket width around ``a`` and ``b``"""
+    return xtol + 4.0 * _EPS * max(abs(a), abs(b))
+
+
+def _expand_bracket(f: _Bracket, a: float, b: float, x0: float, step: float) -> tuple:
+    """search outwards from ``x0``, doubling the step each time, for a
+    bracket ``(a, b, fa, fb)`` that contains a sign change, without leaving
+    ``[a, b]``. Assumes ``func`` is monotonic."""
+    lo_bound, hi_bound = min(a, b), max(a, b)
+    x0 = min(max(x0, lo_bound), hi_bound)
+    f0 = f(x0)
+    step = abs(step)
+    x1 = min(x0 + step, hi_bound)
+    if x1 == x0:
+        step = -step
+        x1 = max(x0 - abs(step), lo_bound)
+    f1 = f(x1)
+    if np.sign(f1) != np.sign(f0):
+        return x0, x1, f0, f1
+    # head in whichever direction |f| decreases
+    if abs(f1) > abs(f0):
+        step = -step
+        x1, f1 = x0, f0
+    while np.sign(f1) == np.sign(f0):
+        if x1 in (lo_bound, hi_bound):
+            raise RuntimeError(f"No solution found between {a} and {b}")
+        x0, f0 = x1, f1
+        step *= 2.0
+        x1 = min(max(x0 + step, lo_bound), hi_bound)
+        f1 = f(x1)
+    return x0, x1, f0, f1
+
+
+def _initial_bracket(
+    f: _Bracket,
+    a: float,
+    b: float,
+    x0: Optional[float],
+    step: Optional[float] = None,
+) -> tuple:
+    """evaluate the end points (and optional initial guess) and return a
+    bracket ``(a, b, fa, fb)`` that contains a sign change."""
+    if x0 is not None and step is not None:
+        return _expand_bracket(f, a, b, x0, step)
+    if x0 is not None:
+        f0 = f(x0)
+    fa = f(a)
+    fb = f(b)
+    if np.sign(fa) == np.sign(fb):
+        raise RuntimeError(f"No solution found between {a} and {b}")
+    if x0 is not None and min(a, b) < x0 < max(a, b):
+        if np.sign(f0) == np.sign(fa):
+            a, fa = x0, f0
+        else:
+            b, fb = x0, f0
+    return a, b, fa, fb
+
+
+def _solve(method, func, a, b, ftol, maxiter, x0, xtol, step, **kwargs) -> RootResult:
+    f = _Bracket(func, ftol, maxiter)
+    try:
+        a, b, fa, fb = _initial_bracket(f, a, b, x0, step)
+        method(f, a, b, fa, fb, xtol, **kwargs)
+    except _Converged:
+        return f.result(True)
+    except _Exhausted:
+        pass
+    return f.result(False)
+
+
+def _bisection(f, a, b, fa, fb, xtol):
+    while abs(b - a) > _xtol(a, b, xtol):
+        m = a + 0.5 * (b - a)
+        fm = f(m)
+        if np.sign(fm) == np.sign(fa):
+            a, fa = m, fm
+        else:
+            b, fb = m, fm
+
+
+def _brent(f, a, b, fa, fb, xtol):
+    # Brent's method (zeroin), following Brent, "Algorithms for Minimization
+    # without Derivatives" (1973), ch. 4.
+    c, fc = a, fa
+    d = e = b - a
+    while True:
+        if np.sign(fb) == np.sign(fc):
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tol = 0.5 * _xtol(b, c, xtol)
+        m = 0.5 * (c - b)
+        if abs(m) <= tol:
+            return
+        if abs(e) >= tol and abs(fa) > abs(fb):
+            s = fb / fa
+            if a == c:
+                # secant step
+                p = 2.0 * m * s
+                q = 1.0 - s
+            else:
+                # inverse quadratic interpolation
+                q = fa / fc
+                r = fb / fc
+                p = s * (2.0 * m * q * (q - r) - (b - a) * (r - 1.0))
+                q = (q - 1.0) * (r - 1.0) * (s - 1.0)
+            if p > 0.0:
+                q = -q
+            else:
+                p = -p
+            if 2.0 * p < min(3.0 * m * q - abs(tol * q), abs(e * q)):
+                e, d = d, p / q
+            else:
+                d = e = m
+        else:
+            d = e = m
+        a, fa = b, fb
+        b += d if abs(d) > tol else np.copysign(tol, m)
+        fb = f(b)
+
+
+def _itp(f, a, b, fa, fb, xtol, k1=None, k2=2.0, n0=1):
+    # Interpolate-Truncate-Project method of Oliveira and Takahashi,
+    # ACM Trans. Math. Softw. 47, 5 (2020).
+    if a > b:
+        a, b, fa, fb = b, a, fb, fa
+    eps = 0.5 * _xtol(a, b, xtol)
+    if k1 is None:
+        k1 = 0.2 / (b - a)
+    n_max = int(np.ceil(np.log2(max((b - a) / (2.0 * eps), 1.0)))) + n0
+    j = 0
+    while b - a > 2.0 * eps:
+        x_half = 0.5 * (a + b)
+        r = eps * 2.0 ** (n_max - j) - 0.5 * (b - a)
+        delta = k1 * (b - a) ** k2
+        # interpolation (regula falsi)
+        x_f = (fb * a - fa * b) / (fb - fa)
+        # truncation
+        sigma = np.sign(x_half - x_f)
+        x_t = x_f + sigma * delta if delta <= abs(x_half - x_f) else x_half
+        # projection
+        x_itp = x_t if abs(x_t - x_half) <= r else x_half - sigma * r
+        f_itp = f(x_itp)
+        if np.sign(f_itp) == np.sign(fa):
+            a, fa = x_itp, f_itp
+        else:
+            b, fb = x_itp, f_itp
+        j += 1
+
+
+def _newton(f, a, b, fa, fb, xtol, fprime):
+    # Newton-Raphson steps, falling back to bisection whenever a step would
+    # leave the bracket or fails to halve the previous step
+    # (cf. "rtsafe", Numerical Recipes, sec. 9.4).
+    if fa > 0.0:
+        a, b, fa, fb = b, a, fb, fa
+    lo, hi = a, b
+    x, fx = (a, fa) if abs(fa) < abs(fb) else (b, fb)
+    dx_old = dx = abs(hi - lo)
+    while abs(hi - lo) > _xtol(lo, hi, xtol):
+        dfx = fprime(x)
+        out_of_bracket = dfx == 0.0 or not (
+            min(lo, hi) < x - fx / dfx < max(lo, hi)
+        )
+        if out_of_bracket or abs(2.0 * fx) > abs(dx_old * dfx):
+            dx_old, dx = dx, 0.5 * (hi - lo)
+            x = lo + dx
+        else:
+            dx_old, dx = dx, fx / dfx
+            x = x - dx
+            if abs(dx) <= _xtol(x, x, xtol):
+                f(x)
+                return
+        fx = f(x)
+        if fx < 0.0:
+            lo = x
+        else:
+            hi = x
+
+
+def bisection(
+    func: Callable[[float], float],
+    a: float,
+    b: float,
+    ftol: float,
+    maxiter: int,
+    x0: Optional[float] = None,
+    xtol: float = 0.0,
+    step: Optional[float] = None,
+) -> RootResult:
+    """find a root of ``func`` in ``[a, b]`` by bisection.
+
+    Args:
+        func (Callable[[float], float]): function whose root is sought
+        a (float): one end of the search interval
+        b (float): other end of the search interval
+        ftol (float): the search stops when ``abs(func(x)) < ftol``
+        maxiter (int): maximum number of function evaluations
+        x0 (Optional[float], optional): initial guess, evaluated before the
+          end points and used to narrow the bracket. Defaults to ``None``.
+        xtol (float, optional): absolute bracket width below which the search
+          stops. A floor of a few ulps is always applied. Defaults to 0.
+        step (Optional[float], optional): if given together with ``x0``, the
+          bracket is located by stepping outwards from ``x0`` (doubling the
+          step each time) rather than by evaluating ``a`` and ``b``, which is
+          much cheaper when ``x0`` is close to the root, e.g. when warm
+          starting from a neighbouring solution. ``func`` must be monotonic.
+          Defaults to ``None``.
+
+    Raises:
+        RuntimeError: if ``func(a)`` and ``func(b)`` have the same sign
+
+    Returns:
+        RootResult: root, residual and number of function evaluations
+    """
+    return _solve(_bisection, func, a, b, ftol, maxiter, x0, xtol, step)
+
+
+def brent(
+    func: Callable[[float], float],
+    a: float,
+    b: float,
+    ftol: float,
+    maxiter: int,
+    x0: Optional[float] = None,
+    xtol: float = 0.0,
+    step: Optional[float] = None,
+) -> RootResult:
+    """find a root of ``func`` in ``[a, b]`` using Brent's method, which
+    combines inverse quadratic interpolation and secant steps with bisection
+    as a safeguard. Arguments are as for :func:`bisection`.
+
+    Raises:
+        RuntimeError: if ``func(a)`` and ``func(b)`` have the same sign
+
+    Returns:
+        RootResult: root, residual and number of function evaluations
+    """
+    return _solve(_brent, func, a, b, ftol, maxiter, x0, xtol, step)
+
+
+def itp(
+    func: Callable[[float], float],
+    a: float,
+    b: float,
+    ftol: float,
+    maxiter: int,
+    x0: Optional[float] = None,
+    xtol: float = 0.0,
+    step: Optional[float] = None,
+) -> RootResult:
+    """find a root of ``func`` in ``[a, b]`` using the Interpolate-Truncate-Project
+    (ITP) method, which never needs more evaluations than bisection while
+    converging superlinearly for smooth functions. Arguments are as for
+    :func:`bisection`.
+
+    Raises:
+        RuntimeError: if ``func(a)`` and ``func(b)`` have the same sign
+
+    Returns:
+        RootResult: root, residual and number of function evaluations
+    """
+    return _solve(_itp, func, a, b, ftol, maxiter, x0, xtol, step)
+
+
+def newton(
+    func: Callable[[float], float],
+    a: float,
+    b: float,
+    ftol: float,
+    maxiter: int,
+    fprime: Callable[[float], float],
+    x0: Optional[float] = None,
+    xtol: float = 0.0,
+    step: Optional[float] = None,
+) -> RootResult:
+    """find a root of ``func`` in ``[a, b]`` using Newton-Raphson steps
+    safeguarded by bisection, so that the iterate never leaves the bracket.
+    Converges quadratically close to the root. Other arguments are as for
+    :func:`bisection`.
+
+    Args:
+        fprime (Callable[[float], float]): derivative of ``func``
+
+    Raises:
+        RuntimeError: if ``func(a)`` and ``func(b)`` have the same sign
+
+    Returns:
+        RootResult: root, residual and number of function evaluations
+    """
+    return _solve(
+        _newton, func, a, b, ftol, maxiter, x0, xtol, step, fprime=fprime
+    )
+
+
+def vectorised_bisection(
+    func: Callable[[np.ndarray], ArrayLike],
+    a: np.ndarray,
+    b: np.ndarray,
+    ftol: float,
+    maxiter: int,
+    xtol: float = 0.0,
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """find the roots of many independent functions at once by bisection.
+    ``func`` maps an array of points to an array of function values of the
+    same shape, element ``i`` of which depends only on element ``i`` of the
+    input.
+
+    Args:
+        func (Callable[[np.ndarray], ArrayLike]): vectorised function whose
+          roots are sought
+        a (np.ndarray): one end of each search interval
+        b (np.ndarray): other end of each search interval
+        ftol (float): each search stops when ``abs(func(x)) < ftol``
+        maxiter (int): maximum number of (vectorised) function evaluations
+        xtol (float, optional): absolute bracket width below which each
+          search stops. A floor of a few ulps is always applied. Defaults to 0.
+
+    Raises:
+        RuntimeError: if ``func(a)`` and ``func(b)`` have the same sign for
+          any element
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, int]: roots, absolute residuals at the
+        roots, and the number of function evaluations
+    """
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    a, b = a.copy(), b.copy()
+    fa = np.asarray(func(a), dtype=float)
+    fb = np.asarray(func(b), dtype=float)
+    if np.any(np.sign(fa) == np.sign(fb)):
+        bad = np.flatnonzero(np.sign(fa) == np.sign(fb))
+        raise RuntimeError(
+            f"No solution found between {a.flat[bad[0]]} and {b.flat[bad[0]]}"
+            f" (and {len(bad) - 1} other bracket(s))"
+        )
+    x = np.where(np.abs(fa) < np.abs(fb), a, b)
+    fx = np.where(np.abs(fa) < np.abs(fb), fa, fb)
+    nfev = 2
+    active = np.abs(fx) >= ftol
+    while np.any(active) and nfev < maxiter:
+        m = np.where(active, a + 0.5 * (b - a), x)
+        fm = np.asarray(func(m), dtype=float)
+        nfev += 1
+        same = np.sign(fm) == np.sign(fa)
+        a = np.where(active & same, m, a)
+        fa = np.where(active & same, fm, fa)
+        b = np.where(active & ~same, m, b)
+        better = active & (np.abs(fm) <= np.abs(fx))
+        x = np.where(better, m, x)
+        fx = np.where(better, fm, fx)
+        width = np.abs(b - a)
+        active &= (np.abs(fx) >= ftol) & (
+            width > xtol + 4.0 * _EPS * np.maximum(np.abs(a), np.abs(b))
+        )
+    return x, np.abs(fx), nfev
+
+
+def vectorised_illinois(
+    func: Callable[[np.ndarray], ArrayLike],
+    a: np.ndarray,
+    b: np.ndarray,
+    ftol: float,
+    maxiter: int,
+    xtol: float = 0.0,
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """find the roots of many independent functions at once by the Illinois
+    variant of regula falsi, as a drop-in replacement for
+    :func:`vectorised_bisection` that converges superlinearly for smooth
+    functions. Each step tries the secant of the bracket; when the same end
+    of a bracket is kept twice in a row its function value is halved, so that
+    both ends converge on the root. Steps that are not finite or fall outside
+    the bracket are replaced by bisection.
+
+    Args:
+        func (Callable[[np.ndarray], ArrayLike]): vectorised function whose
+          roots are sought
+        a (np.ndarray): one end of each search interval
+        b (np.ndarray): other end of each search interval
+        ftol (float): each search stops when ``abs(func(x)) < ftol``
+        maxiter (int): maximum number of (vectorised) function evaluations
+        xtol (float, optional): absolute bracket width below which each
+          search stops. A floor of a few ulps is always applied. Defaults to 0.
+
+    Raises:
+        RuntimeError: if ``func(a)`` and ``func(b)`` have the same sign for
+          any element
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, int]: roots, absolute residuals at the
+        roots, and the number of function evaluations
+    """
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    a, b = a.copy(), b.copy()
+    fa = np.asarray(func(a), dtype=float)
+    fb = np.asarray(func(b), dtype=float)
+    if np.any(np.sign(fa) == np.sign(fb)):
+        bad = np.flatnonzero(np.sign(fa) == np.sign(fb))
+        raise RuntimeError(
+            f"No solution found between {a.flat[bad[0]]} and {b.flat[bad[0]]}"
+            f" (and {len(bad) - 1} other bracket(s))"
+        )
+    x = np.where(np.abs(fa) < np.abs(fb), a, b)
+    fx = np.where(np.abs(fa) < np.abs(fb), fa, fb)
+    nfev = 2
+    # which end was replaced at the previous step: -1 for a, 1 for b
+    replaced = np.zeros(x.shape)
+    active = np.abs(fx) >= ftol
+    while np.any(active) and nfev < maxiter:
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            secant = b - fb * (b - a) / (fb - fa)
+            inside = (secant - a) * (secant - b) < 0.0
+        m = np.where(active, np.where(inside, secant, a + 0.5 * (b - a)), x)
+        fm = np.asarray(func(m), dtype=float)
+        nfev += 1
+        same = np.sign(fm) == np.sign(fa)
+        new_a = active & same
+        new_b = active & ~same
+        # halve the value at an end that is kept for a second step in a row
+        fb = np.where(new_a & (replaced == -1), 0.5 * fb, fb)
+        fa = np.where(new_b & (replaced == 1), 0.5 * fa, fa)
+        replaced = np.where(new_a, -1, np.where(new_b, 1, replaced))
+        a = np.where(new_a, m, a)
+        fa = np.where(new_a, fm, fa)
+        b = np.where(new_b, m, b)
+        fb = np.where(new_b, fm, fb)
+        better = active & (np.abs(fm) <= np.abs(fx))
+        x = np.where(better, m, x)
+        fx = np.where(better, fm, fx)
+        width = np.abs(b - a)
+        active &= (np.abs(fx) >= ftol) & (
+            width > xtol + 4.0 * _EPS * np.maximum(np.abs(a), np.abs(b))
+        )
+    return x, np.abs(fx), nfev
+
+SOLVERS: Dict[str, Callable[..., RootResult]] = {
+    "bisection": bisection,
+    "brent": brent,
+    "itp": itp,
+    "newton": newton,
+}
+
+# solvers that must be passed the derivative of the function as ``fprime``
+GRADIENT_SOLVERS = ("newton",)
+
+
+def get_solver(name: str) -> Callable[..., RootResult]:
+    """return the root-finding function registered under ``name``
+
+    Args:
+        name (str): name of the solver, one of ``SOLVERS.keys()``
+
+    Raises:
+        ValueError: if no solver is registered under ``name``
+
+    Returns:
+        Callable[..., RootResult]: root-finding function
+    """
+    try:
+        return SOLVERS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown solver '{name}'. Available solvers: {', '.join(SOLVERS)}"
+        )
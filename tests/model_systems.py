@@ -0,0 +1,59 @@
+"""Small but realistic defect systems shared between tests."""
+import numpy as np
+
+from py_sc_fermi.defect_charge_state import DefectChargeState
+from py_sc_fermi.defect_species import DefectSpecies
+from py_sc_fermi.dos import DOS
+
+
+def parabolic_dos(bandgap=1.5):
+    edos = np.linspace(-5.0, bandgap + 5.0, 1001)
+    dos = np.sqrt(np.clip(-edos, 0, None)) + np.sqrt(np.clip(edos - bandgap, 0, None))
+    return DOS(dos=dos, edos=edos, bandgap=bandgap, nelect=8)
+
+
+def defect_species():
+    v_o = DefectSpecies(
+        "V_O",
+        1,
+        {
+            0: DefectChargeState(0, energy=2.5, degeneracy=1),
+            1: DefectChargeState(1, energy=1.8, degeneracy=2),
+            2: DefectChargeState(2, energy=1.2, degeneracy=1),
+        },
+    )
+    a_i = DefectSpecies(
+        "A_i",
+        2,
+        {
+            0: DefectChargeState(0, energy=2.0, degeneracy=1),
+            -1: DefectChargeState(-1, energy=2.3, degeneracy=1),
+            -2: DefectChargeState(-2, energy=3.0, degeneracy=1),
+        },
+    )
+    d_x = DefectSpecies(
+        "D_X",
+        1,
+        {
+            1: DefectChargeState(1, energy=0.4, degeneracy=1),
+            0: DefectChargeState(0, energy=0.9, degeneracy=1),
+            -1: DefectChargeState(-1, fixed_concentration=1e-6),
+        },
+        fixed_concentration=1e-4,
+    )
+    return [v_o, a_i, d_x]
+
+
+def chemical_potential_defect_species():
+    """the defects of :func:`defect_species`, with the formation energies of
+    ``V_O`` and ``A_i`` depending on the chemical potentials of O and A."""
+    species = defect_species()
+    for ds, element, n in [(species[0], "O", -1), (species[1], "A", 1)]:
+        for q, cs in ds.charge_states.items():
+            ds.charge_states[q] = DefectChargeState(
+                q,
+                degeneracy=cs.degeneracy,
+                element_changes={element: n},
+                reference_energy=cs.energy,
+            )
+    return species
@@ -0,0 +1,155 @@
+import pickle
+import unittest
+
+import numpy as np
+
+from py_sc_fermi.batch import DefectSystemBatch, SharedDOS, solve_batch
+from py_sc_fermi.defect_system import DefectSystem
+from py_sc_fermi.parabolic_bands import ParabolicBandDOS
+from tests.model_systems import (
+    chemical_potential_defect_species,
+    defect_species,
+    parabolic_dos,
+)
+
+
+class TestSharedDOS(unittest.TestCase):
+    def test_attach(self):
+        dos = parabolic_dos()
+        with SharedDOS(dos) as shared_dos:
+            pickled = pickle.dumps(shared_dos)
+            self.assertLess(len(pickled), 1000)
+            attached = pickle.loads(pickled).attach()
+            np.testing.assert_equal(attached.edos, dos.edos)
+            np.testing.assert_equal(attached.dos, dos.dos)
+            self.assertEqual(attached.bandgap, dos.bandgap)
+            self.assertEqual(attached.nelect, dos.nelect)
+            np.testing.assert_allclose(
+                attached.carrier_concentrations(0.7, 800),
+                dos.carrier_concentrations(0.7, 800),
+                rtol=1e-14,
+            )
+
+
+class TestSolveBatch(unittest.TestCase):
+    def setUp(self):
+        self.defect_system = DefectSystem(
+            defect_species=chemical_potential_defect_species(),
+            dos=parabolic_dos(),
+            volume=50.0,
+            temperature=800,
+        )
+        self.overrides = [
+            {},
+            {"temperature": 500},
+            {"chemical_potentials": {"O": -1.0}},
+            {"chemical_potentials": {"O": -0.5, "A": -0.3}, "temperature": 1200},
+            {"fixed_concentrations": {"A_i": 1e-3}},
+            {"fixed_concentrations": {"D_X": None}, "temperature": 300},
+        ]
+
+    def reference(self, override):
+        defect_system = DefectSystem(
+            defect_species=chemical_potential_defect_species(),
+            dos=parabolic_dos(),
+            volume=50.0,
+            temperature=override.get("temperature", 800),
+        )
+        defect_system.set_chemical_potentials(override.get("chemical_potentials", {}))
+        for name, conc in override.get("fixed_concentrations", {}).items():
+            defect_system.defect_species_by_name(name).fix_concentration(conc)
+        return defect_system.solve()
+
+    def test_solve_batch(self):
+        for processes in [1, 2]:
+            solutions = solve_batch(
+                self.defect_system, self.overrides, processes=processes
+            )
+            self.assertEqual(len(solutions), len(self.overrides))
+            for override, solution in zip(self.overrides, solutions):
+                expected = self.reference(override)
+                self.assertEqual(solution.temperature, expected.temperature)
+                self.assertAlmostEqual(
+                    solution.fermi_energy, expected.fermi_energy, places=10
+                )
+                self.assertEqual(solution.fixed_species, expected.fixed_species)
+                for name, conc in expected.species_concentrations.items():
+                    self.assertAlmostEqual(
+                        solution.species_concentrations[name] / conc, 1.0, places=8
+                    )
+        # the DefectSystem itself is unchanged
+        self.assertEqual(self.defect_system.temperature, 800)
+        self.assertIsNone(self.defect_system.defect_species[1].fixed_concentration)
+
+    def test_results_are_in_input_order(self):
+        overrides = [{"temperature": t} for t in np.linspace(300, 1500, 25)]
+        solutions = solve_batch(
+            self.defect_system, overrides, processes=3, chunksize=2
+        )
+        self.assertEqual(
+            [s.temperature for s in solutions], [o["temperature"] for o in overrides]
+        )
+
+    def test_bad_overrides_raise(self):
+        with self.assertRaises(ValueError):
+            solve_batch(self.defect_system, [{"pressure": 1.0}], processes=1)
+        with self.assertRaises(ValueError):
+            solve_batch(
+                self.defect_system, [{"fixed_concentrations": {"X": 1.0}}], processes=1
+            )
+
+
+class TestDefectSystemBatch(unittest.TestCase):
+    def setUp(self):
+        fixed = chemical_potential_defect_species()
+        fixed[0].fix_concentration(1e-4)
+        constrained = defect_species()
+        constrained[0].charge_states[1].fix_concentration(1e-8)
+        self.defect_systems = [
+            DefectSystem(defect_species(), parabolic_dos(), 50.0, 800),
+            DefectSystem(defect_species()[:2], parabolic_dos(1.0), 70.0, 500),
+            DefectSystem(
+                chemical_potential_defect_species(), parabolic_dos(2.0), 40.0, 1200
+            ),
+            DefectSystem(fixed, parabolic_dos(), 50.0, 300),
+            DefectSystem(constrained, parabolic_dos(), 50.0, 900),
+            DefectSystem(
+                defect_species(), ParabolicBandDOS(1.2, 0.3, 0.8, 60.0), 60.0, 900
+            ),
+        ]
+
+    def test_solve(self):
+        batch = DefectSystemBatch(self.defect_systems)
+        self.assertEqual(len(batch), len(self.defect_systems))
+        solutions = batch.solve()
+        self.assertEqual(len(solutions), len(self.defect_systems))
+        for defect_system, solution in zip(self.defect_systems, solutions):
+            expected = defect_system.solve()
+            self.assertTrue(solution.converged)
+            self.assertEqual(solution.temperature, expected.temperature)
+            self.assertAlmostEqual(
+                solution.fermi_energy, expected.fermi_energy, places=10
+            )
+            self.assertAlmostEqual(solution.p0 / expected.p0, 1.0, places=8)
+            self.assertAlmostEqual(solution.n0 / expected.n0, 1.0, places=8)
+            for name, conc in expected.species_concentrations.items():
+                self.assertAlmostEqual(
+                    solution.species_concentrations[name] / conc, 1.0, places=8
+                )
+
+    def test_q_tot(self):
+        batch = DefectSystemBatch(self.defect_systems)
+        e_fermi = np.linspace(0.2, 1.0, len(self.defect_systems))
+        np.testing.assert_allclose(
+            batch.q_tot(e_fermi),
+            [ds.q_tot(e) for ds, e in zip(self.defect_systems, e_fermi)],
+            rtol=1e-10,
+            atol=1e-30,
+        )
+
+    def test_empty_batch(self):
+        self.assertEqual(DefectSystemBatch([]).solve(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
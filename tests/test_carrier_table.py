@@ -0,0 +1,95 @@
+import unittest
+import numpy as np
+
+from py_sc_fermi.carrier_table import CarrierTable
+from py_sc_fermi.defect_system import DefectSystem
+from tests.model_systems import defect_species, parabolic_dos
+
+
+class TestCarrierTable(unittest.TestCase):
+    def setUp(self):
+        self.dos = parabolic_dos()
+        self.table = CarrierTable(self.dos, 500.0, tolerance=1e-8)
+        self.e_fermi = np.random.default_rng(0).uniform(
+            self.dos.emin(), self.dos.emax(), 500
+        )
+
+    def test_log_carrier_concentrations(self):
+        self.assertLessEqual(self.table.error, 1e-8)
+        log_p0, log_n0 = self.table.log_carrier_concentrations(self.e_fermi, 500.0)
+        exact_p0, exact_n0 = self.dos.log_carrier_concentrations(self.e_fermi, 500.0)
+        np.testing.assert_allclose(log_p0, exact_p0, rtol=0, atol=1e-7)
+        np.testing.assert_allclose(log_n0, exact_n0, rtol=0, atol=1e-7)
+
+    def test_carrier_concentrations(self):
+        p0, n0 = self.table.carrier_concentrations(0.7, 500.0)
+        self.assertIsInstance(p0, float)
+        np.testing.assert_allclose(
+            (p0, n0), self.dos.carrier_concentrations(0.7, 500.0), rtol=1e-7
+        )
+        p0, n0 = self.table.carrier_concentrations_array(self.e_fermi, 500.0)
+        self.assertEqual(p0.shape, self.e_fermi.shape)
+
+    def test_derivatives(self):
+        h = 1e-6
+        for e_fermi in [-0.5, 0.2, 0.7, 1.6]:
+            p_plus, n_plus = self.table.carrier_concentrations(e_fermi + h, 500.0)
+            p_minus, n_minus = self.table.carrier_concentrations(e_fermi - h, 500.0)
+            dp0, dn0 = self.table.carrier_derivatives(e_fermi, 500.0)
+            np.testing.assert_allclose(dp0, (p_plus - p_minus) / (2 * h), rtol=1e-5)
+            np.testing.assert_allclose(dn0, (n_plus - n_minus) / (2 * h), rtol=1e-5)
+            np.testing.assert_allclose(
+                self.table.log_carrier_derivatives(e_fermi, 500.0),
+                self.dos.log_carrier_derivatives(e_fermi, 500.0),
+                rtol=1e-4,
+            )
+
+    def test_monotone(self):
+        e_fermi = np.linspace(self.dos.emin() - 1.0, self.dos.emax() + 1.0, 20001)
+        log_p0, log_n0 = self.table.log_carrier_concentrations(e_fermi, 500.0)
+        self.assertTrue(np.all(np.diff(log_p0) <= 1e-12))
+        self.assertTrue(np.all(np.diff(log_n0) >= -1e-12))
+
+    def test_extrapolation(self):
+        e_max = self.table.e_fermi[-1]
+        inside = self.table.log_carrier_concentrations(e_max, 500.0)
+        outside = self.table.log_carrier_concentrations(e_max + 0.1, 500.0)
+        slopes = self.table.log_carrier_derivatives(e_max + 0.1, 500.0)
+        np.testing.assert_allclose(outside, np.add(inside, np.multiply(slopes, 0.1)))
+
+    def test_wrong_temperature_raises(self):
+        with self.assertRaises(ValueError):
+            self.table.carrier_concentrations(0.7, 300.0)
+
+    def test_unreachable_tolerance_raises(self):
+        with self.assertRaises(ValueError):
+            CarrierTable(self.dos, 500.0, tolerance=1e-8, max_points=300)
+
+    def test_dos_keeps_tables(self):
+        table = self.dos.carrier_table(500.0, 1e-6)
+        self.assertIs(self.dos.carrier_table(500.0, 1e-6), table)
+        self.assertIsNot(self.dos.carrier_table(600.0, 1e-6), table)
+
+
+class TestDefectSystemWithCarrierTable(unittest.TestCase):
+    def test_solve(self):
+        kwargs = dict(defect_species=defect_species(), volume=50.0, temperature=800)
+        exact = DefectSystem(dos=parabolic_dos(), **kwargs).solve()
+        for log_space in [False, True]:
+            for solver in ["brent", "newton"]:
+                defect_system = DefectSystem(
+                    dos=parabolic_dos(),
+                    carrier_table_tolerance=1e-8,
+                    log_space=log_space,
+                    solver=solver,
+                    **kwargs,
+                )
+                solution = defect_system.solve()
+                self.assertAlmostEqual(
+                    solution.fermi_energy, exact.fermi_energy, places=6
+                )
+                self.assertLess(solution.residual, 1e-8 * solution.p0)
+
+
+if __name__ == "__main__":
+    unittest.main()
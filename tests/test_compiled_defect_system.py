@@ -0,0 +1,270 @@
+import unittest
+
+import numpy as np
+
+from py_sc_fermi.defect_system import DefectSystem
+from py_sc_fermi.defect_species import DefectSpecies
+from py_sc_fermi.defect_charge_state import DefectChargeState, kboltz
+from py_sc_fermi.compiled_defect_system import CompiledDefectSystem
+from tests.model_systems import defect_species, parabolic_dos
+
+
+class TestCompiledDefectSystem(unittest.TestCase):
+    def setUp(self):
+        self.defect_system = DefectSystem(
+            defect_species=defect_species(),
+            dos=parabolic_dos(),
+            volume=50.0,
+            temperature=800,
+        )
+        self.compiled = self.defect_system.compile()
+
+    def test_compile(self):
+        self.assertIsInstance(self.compiled, CompiledDefectSystem)
+        self.assertEqual(self.compiled.species_names, ["V_O", "A_i", "D_X"])
+        np.testing.assert_equal(self.compiled.charges, [0, 1, 2, 0, -1, -2, 1, 0, -1])
+        np.testing.assert_equal(
+            self.compiled.species_index, [0, 0, 0, 1, 1, 1, 2, 2, 2]
+        )
+        np.testing.assert_equal(self.compiled.nsites, [1, 2, 1])
+        np.testing.assert_equal(
+            self.compiled.species_fixed_concentrations, [np.nan, np.nan, 1e-4]
+        )
+        self.assertTrue(np.isnan(self.compiled.energies[-1]))
+        self.assertEqual(self.compiled.fixed_concentrations[-1], 1e-6)
+
+    def test_concentrations_match_defect_species(self):
+        for e_fermi in [0.1, 0.7, 1.4]:
+            expected = np.concatenate(
+                [
+                    list(ds.charge_state_concentrations(e_fermi, 800).values())
+                    for ds in self.defect_system.defect_species
+                ]
+            )
+            np.testing.assert_allclose(
+                self.compiled.charge_state_concentrations(e_fermi, 800),
+                expected,
+                rtol=1e-12,
+            )
+            np.testing.assert_allclose(
+                self.compiled.species_concentrations(e_fermi, 800),
+                [
+                    ds.get_concentration(e_fermi, 800)
+                    for ds in self.defect_system.defect_species
+                ],
+                rtol=1e-12,
+            )
+
+    def test_array_of_fermi_energies(self):
+        e_fermi = np.linspace(0.0, 1.5, 7)
+        concentrations = self.compiled.charge_state_concentrations(e_fermi, 800)
+        self.assertEqual(concentrations.shape, (7, 9))
+        for i, e in enumerate(e_fermi):
+            np.testing.assert_allclose(
+                concentrations[i], self.compiled.charge_state_concentrations(e, 800)
+            )
+        self.assertEqual(
+            self.compiled.species_concentrations(e_fermi, 800).shape, (7, 3)
+        )
+
+    def test_q_tot_array_of_fermi_energies(self):
+        e_fermi = np.linspace(0.0, 1.5, 7)
+        np.testing.assert_allclose(
+            self.compiled.q_tot(e_fermi, 800),
+            [self.compiled.q_tot(e, 800) for e in e_fermi],
+            rtol=1e-12,
+        )
+
+    def test_q_tot_and_derivative_match_defect_system(self):
+        for e_fermi in [0.1, 0.7, 1.4]:
+            np.testing.assert_allclose(
+                self.compiled.q_tot(e_fermi, 800),
+                self.defect_system.q_tot(e_fermi),
+                rtol=1e-10,
+            )
+            np.testing.assert_allclose(
+                self.compiled.dq_tot_de_fermi(e_fermi, 800),
+                self.defect_system.dq_tot_de_fermi(e_fermi),
+                rtol=1e-10,
+            )
+
+    def test_get_sc_fermi_is_charge_neutral(self):
+        for solver in ["bisection", "brent", "itp", "newton"]:
+            self.defect_system.solver = solver
+            e_fermi, residual = self.defect_system.get_sc_fermi()
+            self.assertLess(residual, self.defect_system.convergence_tolerance)
+            self.assertLess(
+                abs(self.defect_system.q_tot(e_fermi)),
+                10 * self.defect_system.convergence_tolerance,
+            )
+
+    def test_log_concentrations_match_linear(self):
+        e_fermi = np.linspace(0.1, 1.4, 5)
+        np.testing.assert_allclose(
+            np.exp(self.compiled.log_charge_state_concentrations(e_fermi, 800)),
+            self.compiled.charge_state_concentrations(e_fermi, 800),
+            rtol=1e-10,
+        )
+        np.testing.assert_allclose(
+            np.exp(self.compiled.log_species_concentrations(e_fermi, 800)),
+            self.compiled.species_concentrations(e_fermi, 800),
+            rtol=1e-10,
+        )
+
+    def test_log_charge_balance(self):
+        e_fermi = np.linspace(0.0, 1.5, 16)
+        log_balance = self.compiled.log_charge_balance(e_fermi, 800)
+        np.testing.assert_equal(
+            np.sign(log_balance), np.sign(self.compiled.q_tot(e_fermi, 800))
+        )
+        self.assertTrue(np.all(np.diff(log_balance) > 0))
+        self.assertAlmostEqual(
+            self.compiled.log_charge_balance(0.7, 800),
+            self.defect_system.log_charge_balance(0.7),
+            places=10,
+        )
+        # finite everywhere, even where every concentration underflows
+        self.assertTrue(
+            np.all(np.isfinite(self.compiled.log_charge_balance(e_fermi, 5)))
+        )
+
+    def test_log_charge_balance_derivative(self):
+        h = 1e-6
+        for temperature in [300, 800]:
+            for e_fermi in [0.1, 0.7, 1.4]:
+                finite_difference = (
+                    self.compiled.log_charge_balance(e_fermi + h, temperature)
+                    - self.compiled.log_charge_balance(e_fermi - h, temperature)
+                ) / (2 * h)
+                np.testing.assert_allclose(
+                    self.compiled.log_charge_balance_derivative(e_fermi, temperature),
+                    finite_difference,
+                    rtol=1e-6,
+                )
+
+    def test_with_energy_offsets(self):
+        offset = self.compiled.with_energy_offsets({"V_O": 0.1})
+        ratio = offset.charge_state_concentrations(0.7, 800) / (
+            self.compiled.charge_state_concentrations(0.7, 800)
+        )
+        np.testing.assert_allclose(ratio[:3], np.exp(-0.1 / (kboltz * 800)))
+        np.testing.assert_allclose(ratio[3:6], 1.0)
+        np.testing.assert_allclose(
+            offset.reference_energies[:3], self.compiled.reference_energies[:3] + 0.1
+        )
+        with self.assertRaises(ValueError):
+            self.compiled.with_energy_offsets({"X": 0.1})
+
+    def test_with_fixed_concentrations_scales_fixed_charge_states(self):
+        dopant = DefectSpecies(
+            "dopant",
+            1,
+            {
+                1: DefectChargeState(1, fixed_concentration=3e-6),
+                2: DefectChargeState(2, fixed_concentration=1e-6),
+            },
+        )
+        self.defect_system.defect_species.append(dopant)
+        compiled = self.defect_system.compile().with_fixed_concentrations(
+            {"dopant": 1e-3}
+        )
+        np.testing.assert_allclose(
+            compiled.charge_state_concentrations(0.7, 800)[-2:], [7.5e-4, 2.5e-4]
+        )
+        self.assertAlmostEqual(compiled.species_concentrations(0.7, 800)[-1], 1e-3)
+        dopant.charge_states[1].fix_concentration(0.0)
+        dopant.charge_states[2].fix_concentration(0.0)
+        with self.assertRaises(ValueError):
+            self.defect_system.compile().with_fixed_concentrations({"dopant": 1e-3})
+
+    def test_with_frozen_concentrations(self):
+        annealed = self.compiled.charge_state_concentrations([0.6, 0.8], 1500)
+        frozen = self.compiled.with_frozen_concentrations(annealed[:, None, :])
+        e_fermi = np.array([[0.2, 1.0], [0.5, 1.2]])
+        species = frozen.species_concentrations(e_fermi, 300)
+        self.assertEqual(species.shape, (2, 2, 3))
+        np.testing.assert_allclose(
+            species,
+            np.broadcast_to(
+                self.compiled._species_totals(annealed)[:, None, :], (2, 2, 3)
+            ),
+            rtol=1e-12,
+        )
+        # the charge states of each species re-equilibrate at the new
+        # temperature and Fermi energy
+        relaxed = frozen.charge_state_concentrations(e_fermi, 300)
+        self.assertGreater(np.max(np.abs(relaxed - annealed[:, None, :])), 0.0)
+        np.testing.assert_allclose(
+            np.exp(frozen.log_charge_state_concentrations(e_fermi, 300)),
+            frozen.charge_state_concentrations(e_fermi, 300),
+            rtol=1e-10,
+        )
+        frozen = self.compiled.with_frozen_concentrations(annealed, "charge_states")
+        np.testing.assert_array_equal(
+            frozen.charge_state_concentrations(np.array([0.2, 1.0]), 300), annealed
+        )
+        np.testing.assert_allclose(
+            np.exp(frozen.log_charge_state_concentrations(np.array([0.2, 1.0]), 300)),
+            annealed,
+            rtol=1e-12,
+        )
+        # the original is unchanged
+        np.testing.assert_array_equal(
+            self.compiled.charge_state_concentrations([0.6, 0.8], 1500), annealed
+        )
+
+    def test_with_frozen_concentrations_raises(self):
+        annealed = self.compiled.charge_state_concentrations(0.6, 1500)
+        with self.assertRaises(ValueError):
+            self.compiled.with_frozen_concentrations(annealed, "defects")
+        with self.assertRaises(ValueError):
+            self.compiled.with_frozen_concentrations(annealed[:-1])
+
+    def test_compile_is_a_snapshot(self):
+        self.defect_system.defect_species[0].fix_concentration(1e-3)
+        self.assertTrue(np.isnan(self.compiled.species_fixed_concentrations[0]))
+        self.assertEqual(
+            self.defect_system.compile().species_fixed_concentrations[0], 1e-3
+        )
+
+    def test_compile_is_cached(self):
+        self.assertIs(self.defect_system.compile(), self.compiled)
+        # changing a charge state, the volume or the species rebuilds it
+        self.defect_system.defect_species[1].charge_states[0].fix_concentration(1e-5)
+        compiled = self.defect_system.compile()
+        self.assertIsNot(compiled, self.compiled)
+        self.assertEqual(compiled.fixed_concentrations[3], 1e-5)
+        self.assertIs(self.defect_system.compile(), compiled)
+        self.defect_system.volume = 60.0
+        self.assertEqual(self.defect_system.compile().volume, 60.0)
+        self.defect_system.defect_species = self.defect_system.defect_species[:2]
+        self.assertEqual(self.defect_system.compile().species_names, ["V_O", "A_i"])
+
+    def test_species_with_every_charge_state_fixed(self):
+        # freeze the charge states of D_X, which also has a fixed total
+        # concentration, at their concentrations at 1200 K
+        self.defect_system.temperature = 1200
+        e_fermi = self.defect_system.get_sc_fermi()[0]
+        d_x = self.defect_system.defect_species[2]
+        frozen = d_x.charge_state_concentrations(e_fermi, 1200)
+        for q, concentration in frozen.items():
+            d_x.charge_states[q].fix_concentration(concentration)
+        self.defect_system.temperature = 300
+        compiled = self.defect_system.compile()
+        np.testing.assert_allclose(
+            compiled.charge_state_concentrations(0.5, 300)[6:],
+            [frozen[1], frozen[0], frozen[-1]],
+        )
+        self.assertTrue(np.isfinite(compiled.dq_tot_de_fermi(0.5, 300)))
+        for solver in ["bisection", "brent", "itp", "newton"]:
+            self.defect_system.solver = solver
+            e_fermi, residual = self.defect_system.get_sc_fermi()
+            self.assertLess(residual, self.defect_system.convergence_tolerance)
+            self.assertLess(
+                abs(self.defect_system.q_tot(e_fermi)),
+                10 * self.defect_system.convergence_tolerance,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,7 @@
 import unittest
+import copy
+import pickle
+import numpy as np
 from py_sc_fermi.defect_charge_state import DefectChargeState
 
 
@@ -49,6 +52,33 @@ class TestDefectChargeState(unittest.TestCase):
         self.defect_charge_state.fix_concentration(1)
         self.assertEqual(self.defect_charge_state.fixed_concentration, 1)
 
+    def test_formation_energy_at(self):
+        charge_state = DefectChargeState(
+            1, element_changes={"O": -1, "Zn": 1}, reference_energy=2.0
+        )
+        self.assertEqual(charge_state.energy, 2.0)
+        self.assertEqual(charge_state.element_changes, {"O": -1, "Zn": 1})
+        self.assertEqual(
+            charge_state.formation_energy_at({"O": -1.5, "Zn": -0.5}), 2.0 - 1.5 + 0.5
+        )
+        self.assertEqual(charge_state.formation_energy_at({"O": -1.5}), 0.5)
+        charge_state.set_chemical_potentials({"O": -1.5})
+        self.assertEqual(charge_state.energy, 0.5)
+        self.assertEqual(charge_state.reference_energy, 2.0)
+
+    def test_reference_energy_defaults_to_energy(self):
+        self.assertEqual(self.defect_charge_state.reference_energy, 0.1234)
+        self.assertEqual(self.defect_charge_state.element_changes, {})
+        self.defect_charge_state.set_chemical_potentials({"O": -1.5})
+        self.assertEqual(self.defect_charge_state.energy, 0.1234)
+
+    def test_formation_energy_at_raises(self):
+        charge_state = DefectChargeState(1, fixed_concentration=1e-5)
+        with self.assertRaises(ValueError):
+            charge_state.formation_energy_at({"O": -1.5})
+        charge_state.set_chemical_potentials({"O": -1.5})
+        self.assertEqual(charge_state.energy, None)
+
     def test_get_formation_energy(self):
         e_fermi = 1.2
         formation_energy = self.defect_charge_state.get_formation_energy(e_fermi)
@@ -65,7 +95,7 @@ class TestDefectChargeState(unittest.TestCase):
         conc = self.defect_charge_state.get_concentration(
             e_fermi=e_fermi, temperature=temperature
         )
-        self.assertEqual(conc, 8.311501552630706e-23)
+        np.testing.assert_allclose(conc, 8.311501552630706e-23, rtol=1e-8)
 
     def test_get_concentration_with_fixed_concentration(self):
         e_fermi = 1.2
@@ -76,6 +106,25 @@ class TestDefectChargeState(unittest.TestCase):
         )
         self.assertEqual(conc, 1.0)
 
+    def test_get_log_concentration(self):
+        log_conc = self.defect_charge_state.get_log_concentration(
+            e_fermi=1.2, temperature=298.0
+        )
+        self.assertAlmostEqual(
+            log_conc,
+            np.log(self.defect_charge_state.get_concentration(1.2, 298.0)),
+            places=10,
+        )
+        # finite where the linear concentration underflows to zero
+        self.assertEqual(self.defect_charge_state.get_concentration(1.2, 1.0), 0.0)
+        self.assertTrue(
+            np.isfinite(self.defect_charge_state.get_log_concentration(1.2, 1.0))
+        )
+        self.defect_charge_state.fix_concentration(1e-5)
+        self.assertEqual(
+            self.defect_charge_state.get_log_concentration(1.2, 298.0), np.log(1e-5)
+        )
+
     def test_defect_charge_state_from_string(self):
         string = "1 0.1234 2"
         defect_charge_state = DefectChargeState.from_string(string)
@@ -98,6 +147,22 @@ class TestDefectChargeState(unittest.TestCase):
         with self.assertRaises(ValueError):
             DefectChargeState.from_string(string, frozen=True, volume=None)
 
+    def test_slots(self):
+        self.assertFalse(hasattr(self.defect_charge_state, "__dict__"))
+        with self.assertRaises(AttributeError):
+            self.defect_charge_state.foo = 1
+        charge_state = DefectChargeState(
+            1, energy=0.5, fixed_concentration=1e-5, element_changes={"O": -1}
+        )
+        for copied in [
+            pickle.loads(pickle.dumps(charge_state)),
+            copy.deepcopy(charge_state),
+        ]:
+            self.assertEqual(copied.charge, 1)
+            self.assertEqual(copied.energy, 0.5)
+            self.assertEqual(copied.fixed_concentration, 1e-5)
+            self.assertEqual(copied.element_changes, {"O": -1})
+
     def test__repr__(self):
         self.assertEqual(
             str(self.defect_charge_state),
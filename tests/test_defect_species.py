@@ -2,11 +2,12 @@ import unittest
 from unittest.mock import Mock, PropertyMock, patch
 
 from copy import deepcopy
+import numpy as np
 
 from numpy.testing import assert_equal
 
-from py_sc_fermi.defect_species import DefectSpecies
-from py_sc_fermi.defect_charge_state import DefectChargeState
+from py_sc_fermi.defect_species import DefectSpecies, lower_envelope
+from py_sc_fermi.defect_charge_state import DefectChargeState, kboltz
 
 
 class TestDefectSpeciesInit(unittest.TestCase):
@@ -41,10 +42,20 @@ class TestDefectSpecies(unittest.TestCase):
         mock_charge_states[0].charge = 0
         mock_charge_states[1].charge = 1
         mock_charge_states[2].charge = 2
+        for charge_state in mock_charge_states.values():
+            charge_state._version = 0
         self.defect_species = DefectSpecies(
             name=name, nsites=nsites, charge_states=mock_charge_states
         )
 
+    def mock_method(self, name, **kwargs):
+        """replace a method of ``DefectSpecies`` with a ``Mock`` for the rest
+        of the test (methods cannot be replaced on an instance, as
+        ``DefectSpecies`` has ``__slots__``)"""
+        patcher = patch.object(DefectSpecies, name, Mock(**kwargs))
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
     def test_name_property(self):
         self.assertEqual(self.defect_species.name, self.defect_species._name)
 
@@ -78,12 +89,13 @@ class TestDefectSpecies(unittest.TestCase):
         self.defect_species.charge_states[2].get_formation_energy = Mock(
             return_value=0.5
         )
-        self.defect_species.variable_conc_charge_states = Mock(
+        self.mock_method(
+            "variable_conc_charge_states",
             return_value={
                 0: self.defect_species.charge_states[0],
                 1: self.defect_species.charge_states[1],
                 2: self.defect_species.charge_states[2],
-            }
+            },
         )
         sorted_charge_states = self.defect_species.charge_states_by_formation_energy(
             e_fermi=0.0
@@ -102,11 +114,12 @@ class TestDefectSpecies(unittest.TestCase):
         self.defect_species.charge_states[2].get_formation_energy = Mock(
             return_value=0.5
         )
-        self.defect_species.variable_conc_charge_states = Mock(
+        self.mock_method(
+            "variable_conc_charge_states",
             return_value={
                 0: self.defect_species.charge_states[0],
                 2: self.defect_species.charge_states[2],
-            }
+            },
         )
         sorted_charge_states = self.defect_species.charge_states_by_formation_energy(
             e_fermi=0.0
@@ -124,12 +137,13 @@ class TestDefectSpecies(unittest.TestCase):
         self.defect_species.charge_states[2].get_formation_energy = Mock(
             return_value=0.5
         )
-        self.defect_species.variable_conc_charge_states = Mock(
+        self.mock_method(
+            "variable_conc_charge_states",
             return_value={
                 0: self.defect_species.charge_states[0],
                 1: self.defect_species.charge_states[1],
                 2: self.defect_species.charge_states[2],
-            }
+            },
         )
         formation_energies_dict = self.defect_species.get_formation_energies(0.0)
         self.assertEqual(formation_energies_dict, {0: 0.3, 1: 0.1, 2: 0.5})
@@ -144,12 +158,13 @@ class TestDefectSpecies(unittest.TestCase):
         self.defect_species.charge_states[2].get_formation_energy = Mock(
             return_value=0.5
         )
-        self.defect_species.variable_conc_charge_states = Mock(
+        self.mock_method(
+            "variable_conc_charge_states",
             return_value={
                 0: self.defect_species.charge_states[0],
                 1: self.defect_species.charge_states[1],
                 2: self.defect_species.charge_states[2],
-            }
+            },
         )
         self.assertEqual(
             self.defect_species.min_energy_charge_state(0),
@@ -164,13 +179,14 @@ class TestDefectSpecies(unittest.TestCase):
             mock_fixed_concentration.return_value = 0.1234
             self.assertEqual(self.defect_species.get_concentration(1.5, 298), 0.1234)
 
-        self.defect_species.charge_state_concentrations = Mock(
-            return_value={0: 0.1234, 1: 0.1234, 2: 0.1234}
+        self.mock_method(
+            "charge_state_concentrations",
+            return_value={0: 0.1234, 1: 0.1234, 2: 0.1234},
         )
         self.assertEqual(self.defect_species.get_concentration(1.5, 298), 0.1234 * 3)
 
     def test_get_transition_level_and_energy(self):
-        self.defect_species.get_formation_energies = Mock(return_value={0: 1, 1: 0})
+        self.mock_method("get_formation_energies", return_value={0: 1, 1: 0})
         self.assertEqual(
             self.defect_species.get_transition_level_and_energy(0, 1), (1, 1)
         )
@@ -199,63 +215,180 @@ class TestDefectSpecies(unittest.TestCase):
             {2: self.defect_species.charge_states[2]},
         )
 
+    def set_concentration(self, charge_state, concentration, e_fermi, temperature):
+        """give a mock ``DefectChargeState`` the formation energy for which its
+        concentration per site is ``concentration``"""
+        charge_state.degeneracy = 1
+        kt = kboltz * temperature
+        charge_state.energy = -kt * np.log(concentration)
+        charge_state.energy -= charge_state.charge * e_fermi
+
     def test_charge_state_concentrations(self):
-        self.defect_species.charge_states[0].fixed_concentration = None
-        self.defect_species.charge_states[1].fixed_concentration = None
-        self.defect_species.charge_states[2].fixed_concentration = None
-        self.defect_species.charge_states[0].get_concentration = Mock(
-            return_value=0.1234
-        )
-        self.defect_species.charge_states[1].get_concentration = Mock(
-            return_value=0.1234
-        )
-        self.defect_species.charge_states[2].get_concentration = Mock(
-            return_value=0.1234
-        )
-        self.assertEqual(
-            self.defect_species.charge_state_concentrations(1.5, 298),
-            {
-                0: 0.1234 * self.defect_species.nsites,
-                1: 0.1234 * self.defect_species.nsites,
-                2: 0.1234 * self.defect_species.nsites,
-            },
-        )
+        for q in [0, 1, 2]:
+            self.defect_species.charge_states[q].fixed_concentration = None
+            charge_state = self.defect_species.charge_states[q]
+            self.set_concentration(charge_state, 0.1234, 1.5, 298)
+        concentrations = self.defect_species.charge_state_concentrations(1.5, 298)
+        self.assertEqual(list(concentrations), [0, 1, 2])
+        for q in [0, 1, 2]:
+            self.assertAlmostEqual(
+                concentrations[q], 0.1234 * self.defect_species.nsites, places=12
+            )
 
     def test_charge_state_concentrations_with_fixed_concentration(self):
-        self.defect_species.charge_states[0].fixed_concentration = None
-        self.defect_species.charge_states[1].fixed_concentration = None
-        self.defect_species.charge_states[2].fixed_concentration = None
-        self.defect_species.charge_states[0].get_concentration = Mock(
-            return_value=0.1234 / 3
-        )
-        self.defect_species.charge_states[1].get_concentration = Mock(
-            return_value=0.1234 / 3
-        )
-        self.defect_species.charge_states[2].get_concentration = Mock(
-            return_value=0.1234 / 3
-        )
+        for q in [0, 1, 2]:
+            self.defect_species.charge_states[q].fixed_concentration = None
+            self.set_concentration(
+                self.defect_species.charge_states[q], 0.1234 / 3, 1.5, 298
+            )
         self.defect_species._fixed_concentration = 0.1234
+        concentrations = self.defect_species.charge_state_concentrations(1.5, 298)
+        for q in [0, 1, 2]:
+            self.assertAlmostEqual(concentrations[q], 0.04113333333333333, places=12)
+
+    def test_slots(self):
+        defect = DefectSpecies("foo", 1, {0: DefectChargeState(0, energy=0.5)})
+        self.assertFalse(hasattr(defect, "__dict__"))
+        defect.get_concentration(0.2, 300)
+        copied = deepcopy(defect)
+        self.assertEqual(copied.name, "foo")
+        self.assertEqual(copied.charge_states[0].energy, 0.5)
         self.assertEqual(
-            self.defect_species.charge_state_concentrations(1.5, 298),
+            copied.get_concentration(0.2, 300), defect.get_concentration(0.2, 300)
+        )
+
+    def test_charge_state_partition_is_cached(self):
+        defect = DefectSpecies(
+            "foo",
+            1,
             {
-                0: 0.04113333333333333,
-                1: 0.04113333333333333,
-                2: 0.04113333333333333,
+                0: DefectChargeState(0, energy=1.0, degeneracy=1),
+                1: DefectChargeState(1, energy=0.5, degeneracy=1),
             },
         )
+        partition = defect._charge_state_partition()
+        self.assertIs(defect._charge_state_partition(), partition)
+        self.assertEqual(list(defect.variable_conc_charge_states()), [0, 1])
+        # fixing a charge state, changing a formation energy, or replacing a
+        # charge state rebuilds the partition
+        defect.charge_states[1].fix_concentration(1e-3)
+        self.assertEqual(list(defect.variable_conc_charge_states()), [0])
+        self.assertEqual(list(defect.fixed_conc_charge_states()), [1])
+        self.assertEqual(defect.charge_state_concentrations(0.2, 300)[1], 1e-3)
+        defect.charge_states[0] = DefectChargeState(
+            0, degeneracy=1, reference_energy=1.0, element_changes={"O": -1}
+        )
+        self.assertIsNot(defect._charge_state_partition(), partition)
+        defect.charge_states[0].set_chemical_potentials({"O": -1.0})
+        self.assertAlmostEqual(
+            defect.charge_state_concentrations(0.2, 300)[0],
+            np.exp(-0.0 / (kboltz * 300)),
+        )
+        # the returned dictionaries are copies
+        defect.variable_conc_charge_states().clear()
+        self.assertEqual(list(defect.variable_conc_charge_states()), [0])
+
+    def test_shared_charge_states_update_every_species(self):
+        charge_states = {
+            0: DefectChargeState(
+                0, degeneracy=1, reference_energy=1.0, element_changes={"O": -1}
+            ),
+            1: DefectChargeState(1, energy=0.5, degeneracy=1),
+        }
+        defects = [DefectSpecies("foo", 1, charge_states) for _ in range(2)]
+        partitions = [defect._charge_state_partition() for defect in defects]
+        self.assertIsNot(partitions[0], partitions[1])
+        # a change made through one species is seen by both
+        defects[0].charge_states[1].fix_concentration(1e-3)
+        for defect in defects:
+            self.assertEqual(list(defect.fixed_conc_charge_states()), [1])
+            self.assertEqual(defect.charge_state_concentrations(0.2, 300)[1], 1e-3)
+        charge_states[0].set_chemical_potentials({"O": -1.0})
+        for defect in defects:
+            self.assertAlmostEqual(
+                defect.charge_state_concentrations(0.2, 300)[0],
+                np.exp(-0.0 / (kboltz * 300)),
+            )
 
     def test_defect_charge_contributions(self):
-        self.defect_species.charge_state_concentrations = Mock(return_value={1: 0.1234})
+        self.mock_method("charge_state_concentrations", return_value={1: 0.1234})
         self.assertEqual(
             self.defect_species.defect_charge_contributions(1.5, 298), (0.1234, 0)
         )
-        self.defect_species.charge_state_concentrations = Mock(
-            return_value={-1: 0.1234}
-        )
+        self.mock_method("charge_state_concentrations", return_value={-1: 0.1234})
         self.assertEqual(
             self.defect_species.defect_charge_contributions(1.5, 298), (0, 0.1234)
         )
 
+    def test_defect_charge_derivative(self):
+        defect = DefectSpecies(
+            "foo",
+            2,
+            {
+                -1: DefectChargeState(-1, energy=1.0, degeneracy=1),
+                0: DefectChargeState(0, energy=0.8, degeneracy=2),
+                1: DefectChargeState(1, energy=0.5, degeneracy=1),
+            },
+        )
+
+        def net_charge(e_fermi):
+            lhs, rhs = defect.defect_charge_contributions(e_fermi, 500)
+            return rhs - lhs
+
+        for fixed_concentration in [None, 1e-3]:
+            defect._fixed_concentration = fixed_concentration
+            h = 1e-6
+            finite_difference = (net_charge(0.3 + h) - net_charge(0.3 - h)) / (2 * h)
+            self.assertAlmostEqual(
+                defect.defect_charge_derivative(0.3, 500) / finite_difference,
+                1.0,
+                places=6,
+            )
+
+    def test_log_charge_state_concentrations(self):
+        defect = DefectSpecies(
+            "foo",
+            2,
+            {
+                -1: DefectChargeState(-1, energy=1.0, degeneracy=1),
+                0: DefectChargeState(0, energy=0.8, degeneracy=2),
+                1: DefectChargeState(1, energy=0.5, degeneracy=1),
+                2: DefectChargeState(2, fixed_concentration=1e-5),
+            },
+        )
+        for fixed_concentration in [None, 1e-3]:
+            defect._fixed_concentration = fixed_concentration
+            concs = defect.charge_state_concentrations(0.3, 500)
+            log_concs = defect.log_charge_state_concentrations(0.3, 500)
+            self.assertEqual(list(log_concs.keys()), list(concs.keys()))
+            for q in concs:
+                self.assertAlmostEqual(log_concs[q], np.log(concs[q]), places=10)
+            self.assertAlmostEqual(
+                defect.get_log_concentration(0.3, 500),
+                np.log(defect.get_concentration(0.3, 500)),
+                places=10,
+            )
+            lhs, rhs = defect.defect_charge_contributions(0.3, 500)
+            log_lhs, log_rhs = defect.log_defect_charge_contributions(0.3, 500)
+            self.assertAlmostEqual(log_lhs, np.log(lhs), places=10)
+            self.assertAlmostEqual(log_rhs, np.log(rhs), places=10)
+
+    def test_log_charge_state_concentrations_low_temperature(self):
+        defect = DefectSpecies(
+            "foo",
+            1,
+            {
+                0: DefectChargeState(0, energy=1.0, degeneracy=1),
+                1: DefectChargeState(1, energy=1.5, degeneracy=1),
+            },
+            fixed_concentration=1e-3,
+        )
+        # every Boltzmann factor underflows, but the ratio is well defined
+        log_concs = defect.log_charge_state_concentrations(0.0, 1.0)
+        self.assertAlmostEqual(log_concs[0], np.log(1e-3))
+        self.assertTrue(np.isfinite(log_concs[1]))
+        self.assertEqual(defect.log_defect_charge_contributions(0.0, 1.0)[1], -np.inf)
+
     def test_tl_profile(self):
         # TODO: ideally, this test should more directly check the
         # functionality of this method
@@ -264,6 +397,46 @@ class TestDefectSpecies(unittest.TestCase):
         defect = DefectSpecies("foo", 1, {0: charge_state_1, 2: charge_state_2})
         assert_equal(defect.tl_profile(0, 5), [[0, -1], [1.5, 2], [5, 2]])
 
+    def test_tl_profile_excludes_fixed_charge_states(self):
+        defect = DefectSpecies(
+            "foo",
+            1,
+            {
+                0: DefectChargeState(0, energy=2),
+                1: DefectChargeState(1, energy=0.5, fixed_concentration=1e-3),
+                2: DefectChargeState(2, energy=-1),
+            },
+        )
+        assert_equal(defect.tl_profile(0, 5), [[0, -1], [1.5, 2], [5, 2]])
+        fixed = DefectChargeState(0, fixed_concentration=1e-3)
+        defect = DefectSpecies("bar", 1, {0: fixed})
+        with self.assertRaises(ValueError):
+            defect.tl_profile(0, 5)
+
+    def test_lower_envelope(self):
+        rng = np.random.default_rng(0)
+        charges = rng.integers(-6, 7, size=40)
+        energies = rng.uniform(-3, 3, size=40)
+        profile = lower_envelope(charges, energies, -1.0, 4.0)
+        e_fermi = np.linspace(-1.0, 4.0, 2001)
+        lowest = np.min(energies[:, None] + charges[:, None] * e_fermi, axis=0)
+        # the profile is piecewise linear between its points and follows the
+        # lowest formation energy
+        np.testing.assert_allclose(
+            np.interp(e_fermi, profile[:, 0], profile[:, 1]), lowest, atol=1e-12
+        )
+        self.assertTrue(np.all(np.diff(profile[:, 0]) > 0))
+        # every interior point is a kink, where the charge changes
+        slopes = np.diff(profile[:, 1]) / np.diff(profile[:, 0])
+        self.assertTrue(np.all(np.diff(slopes) < 0))
+
+    def test_lower_envelope_ties(self):
+        # three lines meeting at one point, and a repeated charge
+        profile = lower_envelope([1, 0, -1, 0], [0, 1, 2, 1.5], 0, 3)
+        assert_equal(profile, [[0, 0], [1, 1], [3, -1]])
+        # a kink at the end of the range is not repeated
+        assert_equal(lower_envelope([1, 0], [0, 1], 0, 1), [[0, 0], [1, 1]])
+
     def test__repr__(self):
         self.defect_species._charge_states = {
             2: DefectChargeState(2, energy=-1, degeneracy=1)
@@ -286,6 +459,24 @@ class TestDefectSpecies(unittest.TestCase):
         self.assertEqual(DefectSpecies.from_dict(d).charge_states[1].charge, 1)
         self.assertEqual(DefectSpecies.from_dict(d).charge_states[1].energy, 0)
 
+    def test_from_dict_with_element_changes(self):
+        d = {
+            "V_O": {
+                "nsites": 2,
+                "charge_states": {
+                    1: {
+                        "reference_energy": 2.5,
+                        "element_changes": {"O": -1},
+                        "degeneracy": 1,
+                    }
+                },
+            }
+        }
+        charge_state = DefectSpecies.from_dict(d).charge_states[1]
+        self.assertEqual(charge_state.energy, 2.5)
+        self.assertEqual(charge_state.reference_energy, 2.5)
+        self.assertEqual(charge_state.element_changes, {"O": -1})
+
     def test_from_dict_with_fixed_concentration(self):
         d = {
             "V_O": {
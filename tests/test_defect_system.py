@@ -2,10 +2,24 @@ import unittest
 from unittest.mock import Mock, PropertyMock, patch
 
 import os
+import numpy as np
 from py_sc_fermi.defect_species import DefectSpecies
 from py_sc_fermi.dos import DOS
 from py_sc_fermi.defect_system import DefectSystem
 from py_sc_fermi.defect_charge_state import DefectChargeState
+from py_sc_fermi.results import (
+    ChemicalPotentialSweep,
+    ConcentrationMap,
+    InverseSolution,
+    QuenchSweep,
+    SCFermiSolution,
+    TemperatureSweep,
+)
+from tests.model_systems import (
+    chemical_potential_defect_species,
+    defect_species,
+    parabolic_dos,
+)
 
 
 input_string = "1\n12\n0.1\n298\n1\nv_O 1 1\n 1 1 1\n1\nO_i 1e+22\n1\nO_i 1 1e+22\n"
@@ -24,6 +38,25 @@ test_exception_yaml_filename = os.path.join(
 )
 
 
+def model_defect_system(species=None, temperature=800):
+    """a ``DefectSystem`` of the model defects in ``tests.model_systems``, or of
+    ``species`` if given"""
+    return DefectSystem(
+        defect_species=defect_species() if species is None else species,
+        dos=parabolic_dos(),
+        volume=50.0,
+        temperature=temperature,
+    )
+
+
+def doped_defect_system():
+    """the defects of ``defect_species`` and a donor of fixed concentration"""
+    dopant = DefectSpecies(
+        "dopant", 1, {1: DefectChargeState(1, fixed_concentration=1e-6)}
+    )
+    return model_defect_system(defect_species() + [dopant], temperature=300)
+
+
 class TestDefectSystemInit(unittest.TestCase):
     def test_defect_system_is_initialised(self):
         volume = 100
@@ -37,8 +70,11 @@ class TestDefectSystemInit(unittest.TestCase):
             temperature=temperature,
             convergence_tolerance=1e-6,
             n_trial_steps=100,
+            solver="itp",
         )
         self.assertEqual(defect_system.volume, volume)
+        self.assertEqual(defect_system.solver, "itp")
+        self.assertEqual(defect_system.log_space, False)
         self.assertEqual(defect_system.dos, dos)
         self.assertEqual(defect_system.temperature, temperature)
         self.assertEqual(defect_system.defect_species[0], mock_defect_species[0])
@@ -98,13 +134,27 @@ class TestDefectSystem(unittest.TestCase):
         self.defect_system.total_defect_charge_contributions = Mock(return_value=(1, 1))
         self.assertEqual(self.defect_system.q_tot(2), 0)
 
+    def _solution(self, **kwargs):
+        values = dict(
+            fermi_energy=1,
+            residual=0.0,
+            iterations=1,
+            converged=True,
+            temperature=self.defect_system.temperature,
+            volume=self.defect_system.volume,
+            p0=1,
+            n0=1,
+            concentrations={"v_O": {1: 1}, "O_i": {-1: 1}},
+            species_concentrations={"v_O": 1, "O_i": 1},
+            nsites={"v_O": 1, "O_i": 1},
+            fixed_species=frozenset(),
+            fixed_charge_states={"v_O": frozenset(), "O_i": frozenset()},
+        )
+        values.update(kwargs)
+        return SCFermiSolution(**values)
+
     def test_as_dict(self):
-        self.defect_system.get_sc_fermi = Mock(return_value=[1, {}])
-        self.defect_system.dos.carrier_concentrations = Mock(return_value=(1, 1))
-        self.defect_system.defect_species[0].get_concentration = Mock(return_value=1)
-        self.defect_system.defect_species[1].get_concentration = Mock(return_value=1)
-        self.defect_system.defect_species[0].name = "v_O"
-        self.defect_system.defect_species[1].name = "O_i"
+        self.defect_system.solve = Mock(return_value=self._solution())
         volume = self.defect_system.volume
         self.assertEqual(
             self.defect_system.as_dict(),
@@ -120,38 +170,28 @@ class TestDefectSystem(unittest.TestCase):
             self.defect_system.as_dict(per_volume=False),
             {"Fermi Energy": 1, "p0": 1, "n0": 1, "O_i": 1, "v_O": 1},
         )
+        self.assertEqual(
+            self.defect_system.as_dict(decomposed=True, per_volume=False),
+            {"Fermi Energy": 1, "p0": 1, "n0": 1, "O_i": {-1: 1}, "v_O": {1: 1}},
+        )
 
     def test_site_percentages(self):
-        self.defect_system.get_sc_fermi = Mock(return_value=[1, {}])
-        self.defect_system.dos.carrier_concentrations = Mock(return_value=(1, 1))
-        self.defect_system.defect_species[0].get_concentration = Mock(return_value=1)
-        self.defect_system.defect_species[1].get_concentration = Mock(return_value=1)
-        self.defect_system.defect_species[0].nsites = 1
-        self.defect_system.defect_species[1].nsites = 1
-        self.defect_system.defect_species[0].name = "v_O"
-        self.defect_system.defect_species[1].name = "O_i"
+        self.defect_system.solve = Mock(return_value=self._solution())
         self.assertEqual(
             self.defect_system.site_percentages(), {"v_O": 100, "O_i": 100}
         )
 
     def test__get_report_string(self):
-        self.defect_system.get_sc_fermi = Mock(return_value=[0.5, {}])
-        self.defect_system.dos.carrier_concentrations = Mock(return_value=(100, 100))
-        self.defect_system.defect_species[0].name = "v_O"
-        self.defect_system.defect_species[0].charge_state_concentrations = Mock(
-            return_value={+1: 1000}
-        )
-        self.defect_system.defect_species[0].charge_states = {
-            1: DefectChargeState(charge=1, fixed_concentration=1000)
-        }
-        self.defect_system.defect_species[0].get_concentration = Mock(return_value=1000)
-        self.defect_system.defect_species[1].get_concentration = Mock(return_value=1000)
-        self.defect_system.defect_species[1].name = "O_i"
-        self.defect_system.defect_species[1].charge_states = {
-            -1: DefectChargeState(charge=-1, fixed_concentration=1000)
-        }
-        self.defect_system.defect_species[1].charge_state_concentrations = Mock(
-            return_value={-1: 1000}
+        self.defect_system.solve = Mock(
+            return_value=self._solution(
+                fermi_energy=0.5,
+                p0=100,
+                n0=100,
+                concentrations={"v_O": {1: 1000}, "O_i": {-1: 1000}},
+                species_concentrations={"v_O": 1000, "O_i": 1000},
+                fixed_species=frozenset(["v_O", "O_i"]),
+                fixed_charge_states={"v_O": frozenset([1]), "O_i": frozenset([-1])},
+            )
         )
 
         with open(test_report_filename, "r") as tst_string:
@@ -161,11 +201,39 @@ class TestDefectSystem(unittest.TestCase):
             self.defect_system._get_report_string().strip(), test_string.strip()
         )
 
+    def test_solve(self):
+        self.defect_system.dos.emin = Mock(return_value=-1)
+        self.defect_system.dos.emax = Mock(return_value=2)
+        kernel = Mock(
+            q_tot=lambda e_fermi, temperature: np.sinh((e_fermi - 0.4) / 0.0257),
+            carrier_concentrations=Mock(return_value=(1, 2)),
+            charge_state_concentrations=Mock(return_value=np.array([3, 4])),
+            species_concentrations=Mock(return_value=np.array([3, 4])),
+            species_names=["v_O", "O_i"],
+            charges=np.array([1, -1]),
+            species_index=np.array([0, 1]),
+            nsites=np.array([1, 1]),
+            fixed_concentrations=np.array([np.nan, 4]),
+            species_fixed_concentrations=np.array([np.nan, np.nan]),
+            volume=100,
+        )
+        self.defect_system.compile = Mock(return_value=kernel)
+        solution = self.defect_system.solve()
+        self.assertEqual(self.defect_system.compile.call_count, 1)
+        self.assertAlmostEqual(solution.fermi_energy, 0.4, places=12)
+        self.assertTrue(solution.converged)
+        self.assertEqual((solution.p0, solution.n0), (1, 2))
+        self.assertEqual(solution.concentrations, {"v_O": {1: 3}, "O_i": {-1: 4}})
+        self.assertEqual(solution.fixed_charge_states["O_i"], frozenset([-1]))
+        self.assertEqual(solution.fixed_species, frozenset())
+
     def test_get_sc_fermi(self):
         self.defect_system.dos.emin = Mock(return_value=0)
         self.defect_system.dos.emax = Mock(return_value=1)
         self.defect_system.dos.carrier_concentrations = Mock(return_value=(1, 1))
-        self.defect_system.q_tot = Mock(return_value=0)
+        self.defect_system.compile = Mock(
+            return_value=Mock(q_tot=Mock(return_value=0))
+        )
         self.assertEqual(
             self.defect_system.get_sc_fermi(),
             (0.5, 0),
@@ -174,28 +242,119 @@ class TestDefectSystem(unittest.TestCase):
     def test_get_sc_fermi_bottoms_out(self):
         self.defect_system.dos.emin = Mock(return_value=0)
         self.defect_system.dos.emax = Mock(return_value=1)
-        self.defect_system.q_tot = Mock(return_value=(0.1))
+        self.defect_system.compile = Mock(
+            return_value=Mock(q_tot=Mock(return_value=0.1))
+        )
         with self.assertRaises(RuntimeError):
             self.defect_system.get_sc_fermi()
 
     def test_get_sc_fermi_tops_out(self):
         self.defect_system.dos.emin = Mock(return_value=1)
         self.defect_system.dos.emax = Mock(return_value=0)
-        self.defect_system.q_tot = Mock(return_value=(-0.1))
+        self.defect_system.compile = Mock(
+            return_value=Mock(q_tot=Mock(return_value=-0.1))
+        )
         with self.assertRaises(RuntimeError):
             self.defect_system.get_sc_fermi()
 
+    def test_get_sc_fermi_unknown_solver_raises(self):
+        self.defect_system.dos.emin = Mock(return_value=0)
+        self.defect_system.dos.emax = Mock(return_value=1)
+        self.defect_system.compile = Mock(return_value=Mock())
+        self.defect_system.solver = "not_a_solver"
+        with self.assertRaises(ValueError):
+            self.defect_system.get_sc_fermi()
+
+    def test_get_sc_fermi_solvers_agree(self):
+        self.defect_system.dos.emin = Mock(return_value=-1)
+        self.defect_system.dos.emax = Mock(return_value=2)
+        self.defect_system.compile = Mock(
+            return_value=Mock(
+                q_tot=lambda e_fermi, temperature: np.sinh((e_fermi - 0.4) / 0.0257)
+            )
+        )
+        roots = []
+        for solver in ["bisection", "brent", "itp"]:
+            self.defect_system.solver = solver
+            roots.append(self.defect_system.get_sc_fermi()[0])
+        np.testing.assert_allclose(roots, 0.4, atol=1e-12)
+
+    def test_dq_tot_de_fermi(self):
+        self.defect_system.dos.carrier_derivatives = Mock(return_value=(-1, 2))
+        self.defect_system.defect_species[0].defect_charge_derivative = Mock(
+            return_value=3
+        )
+        self.defect_system.defect_species[1].defect_charge_derivative = Mock(
+            return_value=4
+        )
+        self.assertEqual(self.defect_system.dq_tot_de_fermi(0.5), 10)
+
+    def test_get_sc_fermi_newton(self):
+        self.defect_system.dos.emin = Mock(return_value=-1)
+        self.defect_system.dos.emax = Mock(return_value=2)
+        kernel = Mock(
+            q_tot=lambda e_fermi, temperature: np.sinh((e_fermi - 0.4) / 0.0257),
+            dq_tot_de_fermi=Mock(
+                side_effect=lambda e_fermi, temperature: np.cosh(
+                    (e_fermi - 0.4) / 0.0257
+                )
+                / 0.0257
+            ),
+        )
+        self.defect_system.compile = Mock(return_value=kernel)
+        self.defect_system.solver = "newton"
+        e_fermi, residual = self.defect_system.get_sc_fermi()
+        self.assertAlmostEqual(e_fermi, 0.4, places=12)
+        self.assertTrue(kernel.dq_tot_de_fermi.called)
+
+    def test_log_space_solvers_agree_with_linear(self):
+        defect_system = DefectSystem(
+            defect_species=defect_species(),
+            dos=parabolic_dos(),
+            volume=50.0,
+            temperature=800,
+        )
+        e_fermi, _ = defect_system.get_sc_fermi()
+        defect_system.log_space = True
+        for solver in ["bisection", "brent", "itp", "newton"]:
+            defect_system.solver = solver
+            solution = defect_system.solve()
+            self.assertAlmostEqual(solution.fermi_energy, e_fermi, places=10)
+            self.assertLess(solution.residual, 1e-20)
+
+    def test_log_space_low_temperature(self):
+        # a compensated donor / acceptor pair whose concentrations (and the
+        # carrier concentrations) all underflow at 5 K, with the Fermi energy
+        # pinned at 0.7 eV rather than at the middle of the gap
+        species = [
+            DefectSpecies("D", 1, {1: DefectChargeState(1, energy=-0.2)}),
+            DefectSpecies("A", 1, {-1: DefectChargeState(-1, energy=1.2)}),
+        ]
+        defect_system = DefectSystem(
+            defect_species=species, dos=parabolic_dos(), volume=50.0, temperature=5
+        )
+        self.assertNotAlmostEqual(defect_system.get_sc_fermi()[0], 0.7, places=3)
+        defect_system.log_space = True
+        for solver in ["brent", "newton"]:
+            defect_system.solver = solver
+            self.assertAlmostEqual(defect_system.get_sc_fermi()[0], 0.7, places=10)
+        sweep = defect_system.solve_temperatures([5, 10, 50], vectorised=True)
+        np.testing.assert_allclose(sweep.fermi_energies, 0.7, atol=1e-10)
+
     def test_get_transition_levels(self):
+        self.defect_system.dos.emin = Mock(return_value=0)
+        self.defect_system.dos.emax = Mock(return_value=2)
         self.defect_system.defect_species_by_name("v_O").tl_profile = Mock(
-            return_value=[[1, 2], [1, 2]]
+            return_value=np.array([[1, 2], [1, 2]])
         )
         self.defect_system.defect_species_by_name("O_i").tl_profile = Mock(
-            return_value=[[1, 2], [1, 2]]
-        )
-        self.assertEqual(
-            self.defect_system.get_transition_levels(),
-            {"v_O": [[1, 1], [2, 2]], "O_i": [[1, 1], [2, 2]]},
+            return_value=np.array([[1, 2], [1, 2]])
         )
+        transition_levels = self.defect_system.get_transition_levels()
+        self.assertEqual(list(transition_levels), ["v_O", "O_i"])
+        for profile in transition_levels.values():
+            np.testing.assert_array_equal(profile, [[1, 1], [2, 2]])
+        self.defect_system.defect_species[0].tl_profile.assert_called_once_with(0, 2)
 
     def test__repr__(self):
         self.defect_system.defect_species = []
@@ -207,5 +366,473 @@ class TestDefectSystem(unittest.TestCase):
         )
 
 
+class TestSolveTemperatures(unittest.TestCase):
+    def setUp(self):
+        self.defect_system = model_defect_system(temperature=300)
+        self.temperatures = np.linspace(100, 2000, 40)
+        self.reference = []
+        for temperature in self.temperatures:
+            self.defect_system.temperature = temperature
+            self.reference.append(self.defect_system.get_sc_fermi()[0])
+        self.defect_system.temperature = 300
+
+    def test_warm_started_sweep_matches_individual_solves(self):
+        sweep = self.defect_system.solve_temperatures(self.temperatures)
+        self.assertIsInstance(sweep, TemperatureSweep)
+        np.testing.assert_allclose(sweep.fermi_energies, self.reference, atol=1e-10)
+        self.assertEqual(self.defect_system.temperature, 300)
+
+    def test_warm_start_needs_fewer_evaluations(self):
+        sweep = self.defect_system.solve_temperatures(self.temperatures)
+        cold = []
+        for temperature in self.temperatures:
+            kernel = self.defect_system.compile()
+            cold.append(
+                self.defect_system._solve_kernel(kernel, temperature).iterations
+            )
+        self.assertLess(sweep.iterations[1:].sum(), np.sum(cold[1:]))
+
+    def test_vectorised_sweep_matches_individual_solves(self):
+        sweep = self.defect_system.solve_temperatures(
+            self.temperatures, vectorised=True
+        )
+        np.testing.assert_allclose(sweep.fermi_energies, self.reference, atol=1e-10)
+
+    def test_concentrations(self):
+        sweep = self.defect_system.solve_temperatures(self.temperatures)
+        i = 7
+        self.defect_system.temperature = self.temperatures[i]
+        e_fermi = sweep.fermi_energies[i]
+        as_dict = self.defect_system.as_dict(decomposed=True)
+        np.testing.assert_allclose(sweep.carriers()["p0"][i], as_dict["p0"], rtol=1e-6)
+        np.testing.assert_allclose(sweep.carriers()["n0"][i], as_dict["n0"], rtol=1e-6)
+        for ds in self.defect_system.defect_species:
+            np.testing.assert_allclose(
+                sweep.species_concentration(ds.name, per_volume=False)[i],
+                ds.get_concentration(e_fermi, self.temperatures[i]),
+                rtol=1e-6,
+            )
+            for q in ds.charge_states:
+                np.testing.assert_allclose(
+                    sweep.charge_state_concentration(ds.name, q)[i],
+                    as_dict[ds.name][q],
+                    rtol=1e-6,
+                )
+        with self.assertRaises(KeyError):
+            sweep.charge_state_concentration("V_O", -3)
+
+    def test_as_dict(self):
+        sweep = self.defect_system.solve_temperatures(self.temperatures)
+        summary = sweep.as_dict()
+        self.assertEqual(
+            list(summary.keys()),
+            ["temperature", "Fermi Energy", "p0", "n0", "V_O", "A_i", "D_X"],
+        )
+        self.assertEqual(summary["V_O"].shape, (40,))
+        decomposed = sweep.as_dict(decomposed=True)
+        self.assertEqual(sorted(decomposed["D_X"].keys()), [-1, 0, 1])
+
+
+class TestSCFermiSolution(unittest.TestCase):
+    def setUp(self):
+        self.defect_system = model_defect_system()
+        self.solution = self.defect_system.solve()
+
+    def test_solution(self):
+        self.assertIsInstance(self.solution, SCFermiSolution)
+        e_fermi, residual = self.defect_system.get_sc_fermi()
+        self.assertEqual(self.solution.fermi_energy, e_fermi)
+        self.assertEqual(self.solution.residual, residual)
+        self.assertTrue(self.solution.converged)
+        self.assertGreater(self.solution.iterations, 0)
+        self.assertEqual(self.solution.species_names, ["V_O", "A_i", "D_X"])
+        self.assertEqual(self.solution.fixed_species, frozenset(["D_X"]))
+        self.assertEqual(self.solution.fixed_charge_states["D_X"], frozenset([-1]))
+
+    def test_concentrations_match_defect_species(self):
+        e_fermi = self.solution.fermi_energy
+        p0, n0 = self.defect_system.dos.carrier_concentrations(e_fermi, 800)
+        self.assertAlmostEqual(self.solution.p0 / p0, 1.0, places=10)
+        self.assertAlmostEqual(self.solution.n0 / n0, 1.0, places=10)
+        for ds in self.defect_system.defect_species:
+            self.assertAlmostEqual(
+                self.solution.species_concentrations[ds.name]
+                / ds.get_concentration(e_fermi, 800),
+                1.0,
+                places=10,
+            )
+            expected = ds.charge_state_concentrations(e_fermi, 800)
+            for q, conc in self.solution.concentrations[ds.name].items():
+                self.assertAlmostEqual(conc / expected[q], 1.0, places=10)
+
+    def test_as_dict(self):
+        decomposed = self.solution.as_dict(decomposed=True, per_volume=False)
+        self.assertEqual(decomposed["D_X"][-1], 1e-6)
+        self.assertEqual(
+            list(self.solution.as_dict().keys()),
+            ["Fermi Energy", "p0", "n0", "V_O", "A_i", "D_X"],
+        )
+        self.assertAlmostEqual(
+            self.solution.as_dict()["D_X"], 1e-4 * 1e24 / 50.0, delta=1e-6
+        )
+
+    def test_site_percentages(self):
+        percentages = self.solution.site_percentages()
+        self.assertAlmostEqual(percentages["D_X"], 1e-2)
+        self.assertAlmostEqual(
+            percentages["A_i"],
+            self.solution.species_concentrations["A_i"] / 2 * 100,
+        )
+
+    def test_report_string(self):
+        report = self.solution.report_string()
+        self.assertIn(
+            f"SC Fermi level :      {self.solution.fermi_energy}  (eV)", report
+        )
+        self.assertIn("D_X            : 2e+18 cm^-3 [fixed]", report)
+        self.assertIn("percentage of defective sites", report)
+
+    def test_outputs_solve_once(self):
+        with patch.object(
+            DefectSystem, "compile", autospec=True, side_effect=DefectSystem.compile
+        ) as mock_compile:
+            self.defect_system.report()
+            self.assertEqual(mock_compile.call_count, 1)
+            self.defect_system.as_dict(decomposed=True)
+            self.assertEqual(mock_compile.call_count, 2)
+
+
+class TestSolveChemicalPotentials(unittest.TestCase):
+    def setUp(self):
+        self.defect_system = model_defect_system(chemical_potential_defect_species())
+        mu_o, mu_a = np.meshgrid(np.linspace(-1.0, 0.0, 5), np.linspace(-0.8, 0.0, 4))
+        self.chemical_potentials = np.column_stack([mu_o.ravel(), mu_a.ravel()])
+        self.elements = ["O", "A"]
+        self.reference = []
+        for mu_o, mu_a in self.chemical_potentials:
+            defect_system = model_defect_system(chemical_potential_defect_species())
+            defect_system.set_chemical_potentials({"O": mu_o, "A": mu_a})
+            self.reference.append(defect_system.get_sc_fermi()[0])
+
+    def test_formation_energies(self):
+        kernel = self.defect_system.compile()
+        self.assertEqual(kernel.elements, ["A", "O"])
+        energies = kernel.formation_energies(self.chemical_potentials[:, ::-1])
+        self.assertEqual(energies.shape, (20, 9))
+        mu_o, mu_a = self.chemical_potentials[3]
+        v_o = self.defect_system.defect_species[0].charge_states[2]
+        a_i = self.defect_system.defect_species[1].charge_states[-1]
+        self.assertAlmostEqual(energies[3, 2], v_o.formation_energy_at({"O": mu_o}))
+        self.assertAlmostEqual(energies[3, 4], a_i.formation_energy_at({"A": mu_a}))
+        # the D_X charge states do not depend on the chemical potentials
+        np.testing.assert_equal(energies[:, 6:8], [[0.4, 0.9]] * 20)
+        with self.assertRaises(ValueError):
+            kernel.formation_energies(np.zeros((20, 3)))
+
+    def test_sweep_matches_rebuilt_systems(self):
+        sweep = self.defect_system.solve_chemical_potentials(
+            self.chemical_potentials, self.elements
+        )
+        self.assertIsInstance(sweep, ChemicalPotentialSweep)
+        np.testing.assert_allclose(sweep.fermi_energies, self.reference, atol=1e-10)
+        # the DefectSystem itself is unchanged
+        v_o = self.defect_system.defect_species[0]
+        self.assertEqual(v_o.charge_states[0].energy, 2.5)
+
+    def test_vectorised_sweep_matches_rebuilt_systems(self):
+        sweep = self.defect_system.solve_chemical_potentials(
+            self.chemical_potentials, self.elements, vectorised=True
+        )
+        np.testing.assert_allclose(sweep.fermi_energies, self.reference, atol=1e-10)
+
+    def test_concentrations(self):
+        sweep = self.defect_system.solve_chemical_potentials(
+            self.chemical_potentials, self.elements
+        )
+        i = 7
+        mu_o, mu_a = self.chemical_potentials[i]
+        self.defect_system.set_chemical_potentials({"O": mu_o, "A": mu_a})
+        for ds in self.defect_system.defect_species:
+            np.testing.assert_allclose(
+                sweep.species_concentration(ds.name, per_volume=False)[i],
+                ds.get_concentration(sweep.fermi_energies[i], 800),
+                rtol=1e-8,
+            )
+        np.testing.assert_equal(
+            sweep.chemical_potential("A"), self.chemical_potentials[:, 1]
+        )
+        summary = sweep.as_dict()
+        self.assertEqual(
+            list(summary.keys()),
+            ["chemical_potentials", "Fermi Energy", "p0", "n0", "V_O", "A_i", "D_X"],
+        )
+        self.assertEqual(list(summary["chemical_potentials"].keys()), ["O", "A"])
+
+    def test_unused_and_missing_elements(self):
+        # an element that no defect depends on has no effect, and a missing
+        # element is taken to have a chemical potential of zero
+        sweep = self.defect_system.solve_chemical_potentials(
+            np.column_stack([self.chemical_potentials[:, 0], np.ones(20)]),
+            ["O", "Zn"],
+        )
+        self.defect_system.set_chemical_potentials(
+            {"O": self.chemical_potentials[4, 0], "A": 0.0}
+        )
+        self.assertAlmostEqual(
+            sweep.fermi_energies[4], self.defect_system.get_sc_fermi()[0], places=10
+        )
+        with self.assertRaises(ValueError):
+            self.defect_system.solve_chemical_potentials(
+                self.chemical_potentials, ["O"]
+            )
+
+
+class TestConcentrationMap(unittest.TestCase):
+    def setUp(self):
+        self.defect_system = model_defect_system()
+        self.e_fermi = np.linspace(0.0, 1.5, 31)
+
+    def test_matches_pointwise_evaluation(self):
+        concentration_map = self.defect_system.concentration_map(self.e_fermi, 600)
+        self.assertIsInstance(concentration_map, ConcentrationMap)
+        self.assertEqual(concentration_map.temperature, 600)
+        self.assertEqual(concentration_map.species_concentrations.shape, (31, 3))
+        self.assertEqual(concentration_map.charge_state_concentrations.shape, (31, 9))
+        scale = 1e24 / self.defect_system.volume
+        for i, e_fermi in enumerate(self.e_fermi):
+            p0, n0 = self.defect_system.dos.carrier_concentrations(e_fermi, 600)
+            self.assertAlmostEqual(concentration_map.p0[i] / p0, 1.0, places=10)
+            self.assertAlmostEqual(concentration_map.n0[i] / n0, 1.0, places=10)
+            for ds in self.defect_system.defect_species:
+                self.assertAlmostEqual(
+                    concentration_map.species_concentration(ds.name)[i]
+                    / (ds.get_concentration(e_fermi, 600) * scale),
+                    1.0,
+                    places=10,
+                )
+        np.testing.assert_allclose(
+            concentration_map.charge_state_concentration("V_O", 2),
+            [
+                self.defect_system.defect_species[0].charge_state_concentrations(
+                    e_fermi, 600
+                )[2]
+                * scale
+                for e_fermi in self.e_fermi
+            ],
+            rtol=1e-10,
+        )
+
+    def test_net_charge(self):
+        concentration_map = self.defect_system.concentration_map(self.e_fermi)
+        self.assertEqual(concentration_map.temperature, 800)
+        np.testing.assert_allclose(
+            concentration_map.net_charge,
+            [self.defect_system.q_tot(e_fermi) for e_fermi in self.e_fermi],
+            rtol=1e-10,
+            atol=1e-30,
+        )
+        np.testing.assert_array_equal(
+            concentration_map.residuals, np.abs(concentration_map.net_charge)
+        )
+        # the net charge changes sign at the self-consistent Fermi energy
+        e_fermi = self.defect_system.get_sc_fermi()[0]
+        crossing = np.flatnonzero(np.diff(np.sign(concentration_map.net_charge)))
+        self.assertEqual(len(crossing), 1)
+        self.assertTrue(
+            self.e_fermi[crossing[0]] <= e_fermi <= self.e_fermi[crossing[0] + 1]
+        )
+
+    def test_as_dict(self):
+        concentration_map = self.defect_system.concentration_map(0.5)
+        as_dict = concentration_map.as_dict(decomposed=True)
+        np.testing.assert_array_equal(as_dict["Fermi Energy"], [0.5])
+        self.assertEqual(set(as_dict["V_O"]), {0, 1, 2})
+
+
+class TestQuenchSweep(unittest.TestCase):
+    def setUp(self):
+        self.defect_system = model_defect_system()
+        self.anneal_temperatures = np.array([1000.0, 1500.0])
+        self.quench_temperatures = np.array([300.0, 500.0, 700.0])
+
+    def reference(self, anneal_temperature, quench_temperature, freeze):
+        """solve by fixing the concentrations of the ``DefectSpecies`` or
+        ``DefectChargeState`` objects of a new ``DefectSystem``"""
+        self.defect_system.temperature = anneal_temperature
+        annealed = self.defect_system.solve()
+        self.defect_system.temperature = 800
+        quenched = model_defect_system(temperature=quench_temperature)
+        for ds in quenched.defect_species:
+            if freeze == "species":
+                if ds.fixed_concentration is None:
+                    ds.fix_concentration(annealed.species_concentrations[ds.name])
+            else:
+                ds.fix_concentration(None)
+                for q, cs in ds.charge_states.items():
+                    cs.fix_concentration(annealed.concentrations[ds.name][q])
+        return quenched.solve()
+
+    def test_quench(self):
+        for freeze in ["species", "charge_states"]:
+            for log_space in [False, True]:
+                self.defect_system.log_space = log_space
+                sweep = self.defect_system.quench(
+                    self.anneal_temperatures, self.quench_temperatures, freeze
+                )
+                self.assertIsInstance(sweep, QuenchSweep)
+                self.assertEqual(sweep.freeze, freeze)
+                self.assertEqual(sweep.fermi_energies.shape, (2, 3))
+                self.assertEqual(sweep.species_concentrations.shape, (2, 3, 3))
+                self.assertEqual(sweep.charge_state_concentrations.shape, (2, 3, 9))
+                for i, anneal_temperature in enumerate(self.anneal_temperatures):
+                    for j, quench_temperature in enumerate(self.quench_temperatures):
+                        expected = self.reference(
+                            anneal_temperature, quench_temperature, freeze
+                        )
+                        self.assertAlmostEqual(
+                            sweep.fermi_energies[i, j], expected.fermi_energy, places=10
+                        )
+                        self.assertAlmostEqual(
+                            sweep.p0[i, j] / expected.p0, 1.0, places=8
+                        )
+                        self.assertLess(
+                            sweep.residuals[i, j],
+                            self.defect_system.convergence_tolerance,
+                        )
+                        for k, name in enumerate(sweep.species_names):
+                            self.assertAlmostEqual(
+                                sweep.species_concentrations[i, j, k]
+                                / expected.species_concentrations[name],
+                                1.0,
+                                places=8,
+                            )
+
+    def test_anneal(self):
+        sweep = self.defect_system.quench(self.anneal_temperatures, 300)
+        expected = self.defect_system.solve_temperatures(
+            self.anneal_temperatures, vectorised=True
+        )
+        np.testing.assert_array_equal(
+            sweep.anneal.fermi_energies, expected.fermi_energies
+        )
+        # the frozen species concentrations are the annealed concentrations
+        np.testing.assert_allclose(
+            sweep.species_concentrations[:, 0, :],
+            expected.species_concentrations,
+            rtol=1e-12,
+        )
+        # the DefectSystem itself is unchanged
+        self.assertEqual(self.defect_system.temperature, 800)
+        self.assertIsNone(self.defect_system.defect_species[0].fixed_concentration)
+
+    def test_as_dict(self):
+        sweep = self.defect_system.quench(1500, self.quench_temperatures)
+        as_dict = sweep.as_dict(decomposed=True)
+        np.testing.assert_array_equal(as_dict["anneal_temperature"], [1500.0])
+        np.testing.assert_array_equal(
+            as_dict["quench_temperature"], self.quench_temperatures
+        )
+        self.assertEqual(as_dict["Fermi Energy"].shape, (1, 3))
+        self.assertEqual(as_dict["V_O"][2].shape, (1, 3))
+        self.assertEqual(sweep.species_concentration("A_i").shape, (1, 3))
+
+    def test_bad_freeze_raises(self):
+        with self.assertRaises(ValueError):
+            self.defect_system.quench(1500, 300, freeze="defects")
+
+
+class TestSolveForTarget(unittest.TestCase):
+    def setUp(self):
+        self.defect_system = doped_defect_system()
+        self.scale = 1e24 / self.defect_system.volume
+
+    def test_dopant_concentration_for_electron_concentration(self):
+        result = self.defect_system.solve_for_target(
+            "n0", 1e18, "dopant", (1e15, 1e21)
+        )
+        self.assertIsInstance(result, InverseSolution)
+        self.assertTrue(result.converged)
+        self.assertAlmostEqual(result.target_value / 1e18, 1.0, places=5)
+        self.assertAlmostEqual(
+            result.solution.n0 * self.scale / result.target_value, 1.0, places=12
+        )
+        self.assertAlmostEqual(
+            result.solution.species_concentrations["dopant"] * self.scale
+            / result.unknown_value,
+            1.0,
+            places=12,
+        )
+        # fixing the dopant concentration found gives the target
+        expected = doped_defect_system()
+        expected.defect_species_by_name("dopant").charge_states[1].fix_concentration(
+            result.unknown_value / self.scale
+        )
+        self.assertAlmostEqual(
+            expected.solve().n0 * self.scale / 1e18, 1.0, places=5
+        )
+        # warm-started solves need far fewer evaluations than solving from
+        # scratch at each step
+        self.assertLess(result.iterations, 15)
+        self.assertLess(result.evaluations, 20 * result.iterations)
+        # the DefectSystem itself is unchanged
+        self.assertEqual(
+            self.defect_system.defect_species_by_name("dopant")
+            .charge_states[1]
+            .fixed_concentration,
+            1e-6,
+        )
+
+    def test_concentration_for_hole_concentration(self):
+        result = self.defect_system.solve_for_target(
+            "p0", 1e12, "A_i", (1e10, 1e22)
+        )
+        self.assertTrue(result.converged)
+        expected = doped_defect_system()
+        expected.defect_species_by_name("A_i").fix_concentration(
+            result.unknown_value / self.scale
+        )
+        self.assertAlmostEqual(
+            expected.solve().p0 * self.scale / 1e12, 1.0, places=5
+        )
+
+    def test_energy_offset_for_fermi_energy(self):
+        result = self.defect_system.solve_for_target(
+            "fermi_energy", 0.8, "A_i", (-2.0, 0.0), unknown="energy_offset"
+        )
+        self.assertTrue(result.converged)
+        self.assertAlmostEqual(result.target_value, 0.8, places=6)
+        self.assertEqual(result.solution.fermi_energy, result.target_value)
+        expected = doped_defect_system()
+        a_i = expected.defect_species_by_name("A_i")
+        for q, cs in a_i.charge_states.items():
+            a_i.charge_states[q] = DefectChargeState(
+                q, energy=cs.energy + result.unknown_value, degeneracy=cs.degeneracy
+            )
+        self.assertAlmostEqual(expected.solve().fermi_energy, 0.8, places=6)
+
+    def test_energy_offset_for_defect_concentration(self):
+        result = self.defect_system.solve_for_target(
+            "V_O", 1e-14, "V_O", (-4.0, 0.0), unknown="energy_offset", per_volume=False
+        )
+        self.assertTrue(result.converged)
+        self.assertAlmostEqual(result.target_value / 1e-14, 1.0, places=5)
+        self.assertAlmostEqual(
+            result.solution.species_concentrations["V_O"] / 1e-14, 1.0, places=5
+        )
+
+    def test_bad_arguments_raise(self):
+        with self.assertRaises(ValueError):
+            self.defect_system.solve_for_target("q", 1e18, "dopant", (1e15, 1e21))
+        with self.assertRaises(ValueError):
+            self.defect_system.solve_for_target("n0", 1e18, "X", (1e15, 1e21))
+        with self.assertRaises(ValueError):
+            self.defect_system.solve_for_target(
+                "n0", 1e18, "dopant", (1e15, 1e21), unknown="nsites"
+            )
+        # the target is out of reach within the bounds
+        with self.assertRaises(RuntimeError):
+            self.defect_system.solve_for_target("n0", 1e18, "dopant", (1e15, 1e16))
+
+
 if __name__ == "__main__":
     unittest.main()
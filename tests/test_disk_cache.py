@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import patch
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from py_sc_fermi.disk_cache import DiskCache
+from py_sc_fermi.inputs import InputSet, read_dos_data
+
+test_data_dir = os.path.join(os.path.dirname(__file__), "dummy_inputs")
+test_sc_fermi_input_filename = os.path.join(test_data_dir, "input_fermi.dat")
+test_unitcell_filename = os.path.join(test_data_dir, "unitcell.dat")
+test_dos_filename = os.path.join(test_data_dir, "totdos.dat")
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmpdir.name, "cache")
+        self.cache = DiskCache(self.directory)
+        self.dos = read_dos_data(0.8084, 18, test_dos_filename)
+        self.key = ("totdos", test_dos_filename, 0.8084, 18)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_dos_round_trip(self):
+        self.assertNotIn(self.key, self.cache)
+        self.cache[self.key] = self.dos
+        # a new DiskCache, as in a later run, reads the DOS from disk
+        dos = DiskCache(self.directory)[self.key]
+        self.assertIsInstance(dos.edos, np.memmap)
+        np.testing.assert_array_equal(dos.edos, self.dos.edos)
+        np.testing.assert_array_equal(dos.dos, self.dos.dos)
+        self.assertEqual(dos.bandgap, 0.8084)
+        self.assertEqual(dos.nelect, 18)
+        self.assertEqual(
+            dos.carrier_concentrations(0.4, 300),
+            self.dos.carrier_concentrations(0.4, 300),
+        )
+
+    def test_keys_depend_on_parameters(self):
+        self.cache[self.key] = self.dos
+        self.assertNotIn(("totdos", test_dos_filename, 0.8084, 20), self.cache)
+
+    def test_keys_depend_on_file_contents(self):
+        copied = os.path.join(self.tmpdir.name, "copied.dat")
+        shutil.copy(test_dos_filename, copied)
+        self.cache[self.key] = self.dos
+        # the same contents at a different path share an entry
+        self.assertIn(("totdos", copied, 0.8084, 18), self.cache)
+        with open(copied, "a") as f:
+            f.write("  10.0  0.0\n")
+        self.assertNotIn(("totdos", copied, 0.8084, 18), DiskCache(self.directory))
+
+    def test_volume_round_trip(self):
+        self.cache[("volume", test_unitcell_filename)] = 544.7
+        cache = DiskCache(self.directory)
+        self.assertEqual(cache[("volume", test_unitcell_filename)], 544.7)
+
+    def test_missing_file_is_not_cached(self):
+        self.assertNotIn(("volume", "not_a_file"), self.cache)
+
+    def test_eviction(self):
+        self.cache[self.key] = self.dos
+        entry_size = self.cache.size()
+        self.cache.max_bytes = int(1.5 * entry_size)
+        key = ("totdos", test_dos_filename, 0.8084, 20)
+        self.cache[key] = read_dos_data(0.8084, 20, test_dos_filename)
+        self.assertLessEqual(self.cache.size(), self.cache.max_bytes)
+        cache = DiskCache(self.directory)
+        self.assertNotIn(self.key, cache)
+        self.assertIn(key, cache)
+        cache.clear()
+        self.assertEqual(cache.size(), 0)
+
+    def test_from_sc_fermi_inputs_with_disk_cache(self):
+        InputSet.from_sc_fermi_inputs(
+            test_sc_fermi_input_filename,
+            test_unitcell_filename,
+            test_dos_filename,
+            cache=self.cache,
+        )
+        with patch("py_sc_fermi.inputs.read_dos_data") as mock_read_dos_data:
+            input_set = InputSet.from_sc_fermi_inputs(
+                test_sc_fermi_input_filename,
+                test_unitcell_filename,
+                test_dos_filename,
+                cache=DiskCache(self.directory),
+            )
+            mock_read_dos_data.assert_not_called()
+        self.assertEqual(input_set.volume, 544.7091796190017)
+        self.assertEqual(input_set.dos.nelect, 18)
+
+
+if __name__ == "__main__":
+    unittest.main()
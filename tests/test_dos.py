@@ -4,6 +4,7 @@ from unittest.mock import Mock, patch
 import numpy as np
 import os
 from py_sc_fermi.dos import DOS
+import py_sc_fermi.dos as dos_module
 
 test_data_dir = "dummy_inputs/"
 test_vasprun_filename = os.path.join(
@@ -92,6 +93,57 @@ class TestDos(unittest.TestCase):
             1.7780649634855188e-30,
         )
 
+    def test_carrier_concentrations_array(self):
+        e_fermi = np.linspace(-1.0, 4.0, 11)
+        temperature = np.array([[300.0], [1000.0]])
+        p0, n0 = self.dos.carrier_concentrations_array(e_fermi, temperature)
+        self.assertEqual(p0.shape, (2, 11))
+        self.assertEqual(n0.shape, (2, 11))
+        for i, t in enumerate(temperature[:, 0]):
+            for j, e in enumerate(e_fermi):
+                np.testing.assert_allclose(
+                    (p0[i, j], n0[i, j]),
+                    self.dos.carrier_concentrations(e, t),
+                    rtol=1e-12,
+                )
+
+    def test_carrier_concentrations_array_scalar(self):
+        p0, n0 = self.dos.carrier_concentrations_array(1.5, 298)
+        np.testing.assert_allclose(
+            (p0, n0), self.dos.carrier_concentrations(1.5, 298), rtol=1e-12
+        )
+
+    def test_carrier_derivatives(self):
+        h = 1e-6
+        for e_fermi in [0.5, 1.5, 2.5]:
+            p_plus, n_plus = self.dos.carrier_concentrations(e_fermi + h, 1000)
+            p_minus, n_minus = self.dos.carrier_concentrations(e_fermi - h, 1000)
+            dp0, dn0 = self.dos.carrier_derivatives(e_fermi, 1000)
+            self.assertLess(dp0, 0)
+            self.assertGreater(dn0, 0)
+            np.testing.assert_allclose(dp0, (p_plus - p_minus) / (2 * h), rtol=1e-6)
+            np.testing.assert_allclose(dn0, (n_plus - n_minus) / (2 * h), rtol=1e-6)
+
+    def test_log_carrier_concentrations(self):
+        e_fermi = np.linspace(-1.0, 4.0, 11)
+        log_p0, log_n0 = self.dos.log_carrier_concentrations(e_fermi, 1000)
+        p0, n0 = self.dos.carrier_concentrations_array(e_fermi, 1000)
+        np.testing.assert_allclose(np.exp(log_p0), p0, rtol=1e-10)
+        np.testing.assert_allclose(np.exp(log_n0), n0, rtol=1e-10)
+        # finite where the linear concentrations underflow to zero
+        self.assertEqual(self.dos.carrier_concentrations_array(1.5, 5.0)[0], 0.0)
+        self.assertTrue(
+            np.all(np.isfinite(self.dos.log_carrier_concentrations(1.5, 5.0)))
+        )
+
+    def test_log_carrier_derivatives(self):
+        for e_fermi in [0.5, 1.5, 2.5]:
+            p0, n0 = self.dos.carrier_concentrations(e_fermi, 1000)
+            dp0, dn0 = self.dos.carrier_derivatives(e_fermi, 1000)
+            dlog_p0, dlog_n0 = self.dos.log_carrier_derivatives(e_fermi, 1000)
+            np.testing.assert_allclose(dlog_p0, dp0 / p0, rtol=1e-8)
+            np.testing.assert_allclose(dlog_n0, dn0 / n0, rtol=1e-8)
+
     def test_from_vasprun(self):
         dos = self.dos.from_vasprun(test_vasprun_filename, nelect=320)
         self.assertEqual(dos.nelect, 320)
@@ -139,5 +191,163 @@ class TestDos(unittest.TestCase):
     #         )
 
 
+class TestDosCompress(unittest.TestCase):
+    def setUp(self):
+        edos = np.linspace(-20.0, 21.5, 20001)
+        noise = 1.0 + 0.3 * np.random.default_rng(0).random(len(edos))
+        dos = np.sqrt(np.clip(-edos, 0, None)) + np.sqrt(np.clip(edos - 1.5, 0, None))
+        self.dos = DOS(dos=dos * noise, edos=edos, bandgap=1.5, nelect=8)
+
+    def relative_error(self, compressed, e_fermi, temperature):
+        log_c = compressed.log_carrier_concentrations(e_fermi, temperature)
+        log_e = self.dos.log_carrier_concentrations(e_fermi, temperature)
+        return np.max(np.abs(np.expm1(np.subtract(log_c, log_e))))
+
+    def test_compress(self):
+        compressed = self.dos.compress(1000.0, tolerance=1e-6)
+        self.assertLess(len(compressed.edos), len(self.dos.edos) / 2)
+        self.assertLess(len(compressed._plan.e_valence), 1000)
+        e_fermi = np.linspace(0.0, 1.5, 151)
+        for temperature in [1000.0, 600.0, 300.0, 100.0]:
+            self.assertLessEqual(
+                self.relative_error(compressed, e_fermi, temperature), 1e-6
+            )
+        self.assertEqual(compressed.nelect, 8)
+        self.assertEqual(compressed.bandgap, 1.5)
+        self.assertLessEqual(compressed.emin(), 0.0)
+        self.assertGreaterEqual(compressed.emax(), 1.5)
+
+    def test_compress_keeps_normalisation(self):
+        compressed = self.dos.compress(1000.0, tolerance=1e-6)
+        # no states are added, and the states kept are not scaled up
+        self.assertLessEqual(compressed.sum_dos(), self.dos.sum_dos())
+        np.testing.assert_allclose(
+            np.sum(compressed._plan.w_conduction[:100]),
+            np.sum(self.dos._plan.w_conduction[:100]),
+        )
+
+    def test_compress_with_e_fermi_window(self):
+        compressed = self.dos.compress(
+            500.0, tolerance=1e-8, e_fermi_window=(-0.5, 2.0)
+        )
+        self.assertLessEqual(compressed.emin(), -0.5)
+        self.assertGreaterEqual(compressed.emax(), 2.0)
+        e_fermi = np.linspace(-0.5, 2.0, 101)
+        self.assertLessEqual(self.relative_error(compressed, e_fermi, 500.0), 1e-8)
+
+    def test_compress_keeps_quadrature(self):
+        e_fermi = np.linspace(0.0, 1.5, 31)
+        for quadrature in ["simpson", "linear"]:
+            dos = self.dos.with_quadrature(quadrature)
+            compressed = dos.compress(1000.0, tolerance=1e-6)
+            self.assertEqual(compressed.quadrature, quadrature)
+            self.assertLess(len(compressed.edos), len(dos.edos) / 2)
+            np.testing.assert_allclose(
+                compressed.carrier_concentrations_array(e_fermi, 1000.0),
+                dos.carrier_concentrations_array(e_fermi, 1000.0),
+                rtol=1e-6,
+            )
+
+
+class TestDosQuadrature(unittest.TestCase):
+    def setUp(self):
+        # a density-of-states that is linear between the energies of a coarse
+        # grid, so that the "linear" rule is exact on that grid
+        self.fine = self.ramp_dos(np.linspace(-5.0, 6.5, 4601))
+        self.coarse = self.ramp_dos(np.linspace(-5.0, 6.5, 47))
+        self.e_fermi = np.linspace(0.0, 1.5, 7)
+
+    def ramp_dos(self, edos):
+        # the conduction band energies are those above the band gap, so the
+        # gap is narrowed to keep the conduction band edge at 1.5 eV
+        dos = np.clip(-edos, 0, None) + np.clip(edos - 1.5, 0, None)
+        return DOS._from_normalised(dos=dos, edos=edos, bandgap=1.4, nelect=8)
+
+    def test_quadrature_property(self):
+        self.assertEqual(self.fine.quadrature, "trapezoid")
+        dos = self.fine.with_quadrature("simpson")
+        self.assertEqual(dos.quadrature, "simpson")
+        self.assertIs(dos.dos, self.fine.dos)
+
+    def test_unknown_quadrature_raises(self):
+        with self.assertRaises(ValueError):
+            self.fine.with_quadrature("gauss")
+        with self.assertRaises(ValueError):
+            DOS(
+                dos=np.ones(101),
+                edos=np.linspace(-5.0, 5.0, 101),
+                bandgap=1.0,
+                nelect=4,
+                quadrature="gauss",
+            )
+
+    def test_simpson_weights(self):
+        x = np.sort(np.random.default_rng(1).uniform(0.0, 2.0, 9))
+        x[0], x[-1] = 0.0, 2.0
+        weights = dos_module._simpson_weights(x)
+        # Simpson's rule is exact for quadratics over each pair of intervals
+        self.assertAlmostEqual(np.dot(weights, x ** 2 - x), 2.0 / 3.0)
+        # and falls back to the trapezoid rule over an odd last interval
+        np.testing.assert_allclose(
+            dos_module._simpson_weights(np.array([0.0, 1.0])), [0.5, 0.5]
+        )
+
+    def test_sum_dos_simpson(self):
+        dos = DOS(
+            dos=np.sqrt(np.clip(-self.fine.edos, 0, None)),
+            edos=self.fine.edos,
+            bandgap=1.4,
+            nelect=8,
+            quadrature="simpson",
+        )
+        self.assertAlmostEqual(dos.sum_dos(), 8.0)
+
+    def test_linear_quadrature_is_exact_on_coarse_grid(self):
+        fine = self.fine.with_quadrature("linear")
+        coarse = self.coarse.with_quadrature("linear")
+        for temperature in [100.0, 1000.0]:
+            np.testing.assert_allclose(
+                coarse.carrier_concentrations_array(self.e_fermi, temperature),
+                fine.carrier_concentrations_array(self.e_fermi, temperature),
+                rtol=1e-10,
+            )
+        # the trapezoid rule is not, when the grid is coarse compared to kT
+        p0, _ = self.coarse.carrier_concentrations(0.5, 300.0)
+        exact_p0, _ = coarse.carrier_concentrations(0.5, 300.0)
+        self.assertGreater(abs(p0 / exact_p0 - 1.0), 0.5)
+
+    def test_linear_quadrature_converges_to_trapezoid(self):
+        fine = self.fine.with_quadrature("linear")
+        np.testing.assert_allclose(
+            fine.carrier_concentrations_array(self.e_fermi, 1000.0),
+            self.fine.carrier_concentrations_array(self.e_fermi, 1000.0),
+            rtol=1e-3,
+        )
+
+    def test_linear_quadrature_derivatives(self):
+        dos = self.coarse.with_quadrature("linear")
+        h = 1e-6
+        for e_fermi in [-0.2, 0.3, 1.2]:
+            p_plus, n_plus = dos.carrier_concentrations(e_fermi + h, 500.0)
+            p_minus, n_minus = dos.carrier_concentrations(e_fermi - h, 500.0)
+            dp0, dn0 = dos.carrier_derivatives(e_fermi, 500.0)
+            self.assertAlmostEqual(dp0 / ((p_plus - p_minus) / (2 * h)), 1.0, places=5)
+            self.assertAlmostEqual(dn0 / ((n_plus - n_minus) / (2 * h)), 1.0, places=5)
+            dlog_p0, dlog_n0 = dos.log_carrier_derivatives(e_fermi, 500.0)
+            p0, n0 = dos.carrier_concentrations(e_fermi, 500.0)
+            self.assertAlmostEqual(dlog_p0, dp0 / p0)
+            self.assertAlmostEqual(dlog_n0, dn0 / n0)
+
+    def test_quadrature_convergence(self):
+        convergence = self.fine.quadrature_convergence(300.0, strides=(1, 100))
+        self.assertEqual(convergence.strides, (1, 100))
+        self.assertEqual(convergence.npoints[0], 4601)
+        self.assertEqual(set(convergence.errors), {"trapezoid", "simpson", "linear"})
+        self.assertEqual(convergence.errors["linear"][0], 0.0)
+        self.assertLess(convergence.errors["linear"][1], 1e-10)
+        self.assertGreater(convergence.errors["trapezoid"][1], 0.1)
+        self.assertIn("trapezoid", convergence.report_string())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,197 @@
+import unittest
+from unittest.mock import patch
+import gzip
+import os
+import tempfile
+import numpy as np
+
+from py_sc_fermi.dos import DOS
+from py_sc_fermi.dos_readers import read_vasprun_dos, read_doscar, read_totdos
+
+test_data_dir = "dummy_inputs/"
+test_dos_filename = os.path.join(os.path.dirname(__file__), test_data_dir, "totdos.dat")
+
+energies = np.linspace(-5.0, 7.0, 121)
+densities = np.array(
+    [
+        np.where((energies < 0.0) | (energies > 2.0), 1.0, 0.0),
+        np.where((energies < 0.0) | (energies > 2.5), 2.0, 0.0),
+    ]
+)
+
+
+def _rows(array: np.ndarray) -> str:
+    return "\n".join(
+        "<r>" + " ".join(f"{x:.6f}" for x in row) + "</r>" for row in array
+    )
+
+
+def _eigenvalues(vbm: float, cbm: float) -> str:
+    """eigenvalues of two spins at two k-points, with the highest occupied
+    state at ``vbm`` and the lowest unoccupied state at ``cbm``"""
+    spins = ""
+    for spin, shift in [(1, 0.0), (2, 0.1)]:
+        kpoints = ""
+        for k, dk in [(1, 0.3), (2, 0.0)]:
+            states = [
+                [vbm - 1.0, 1.0],
+                [vbm - dk - shift, 1.0],
+                [cbm + dk + shift, 0.0],
+            ]
+            kpoints += f'<set comment="kpoint {k}">{_rows(np.array(states))}</set>'
+        spins += f'<set comment="spin {spin}">{kpoints}</set>'
+    return f"<array><dimension>band</dimension><set>{spins}</set></array>"
+
+
+def vasprun_string(efermi=0.1, vbm=0.0, cbm=2.0) -> str:
+    total = "".join(
+        f'<set comment="spin {i + 1}">'
+        + _rows(np.array([energies, d, np.cumsum(d)]).T)
+        + "</set>"
+        for i, d in enumerate(densities)
+    )
+    return f"""<?xml version="1.0" encoding="ISO-8859-1"?>
+<modeling>
+ <generator><i name="program" type="string">vasp </i></generator>
+ <calculation>
+  <eigenvalues>{_eigenvalues(vbm - 3.0, cbm + 3.0)}</eigenvalues>
+ </calculation>
+ <calculation>
+  <eigenvalues>{_eigenvalues(vbm, cbm)}</eigenvalues>
+  <projected>
+   <eigenvalues>{_eigenvalues(vbm + 5.0, cbm + 5.0)}</eigenvalues>
+  </projected>
+  <dos>
+   <i name="efermi">{efermi}</i>
+   <total>
+    <array>
+     <dimension dim="1">gridpoints</dimension>
+     <dimension dim="2">spin</dimension>
+     <field>energy</field>
+     <field>total</field>
+     <field>integrated</field>
+     <set>{total}</set>
+    </array>
+   </total>
+   <partial>
+    <array><set><set comment="ion 1"><set comment="spin 1">
+     {_rows(np.ones((3, 4)))}
+    </set></set></set></array>
+   </partial>
+  </dos>
+ </calculation>
+</modeling>
+"""
+
+
+def doscar_string(efermi=0.1) -> str:
+    header = [
+        "   2   2   1   0",
+        "  0.1E+02  0.1E-08  0.1E-08  0.1E-08  0.5E-15",
+        "  1.0E-004",
+        "  CAR ",
+        " unknown system",
+        f"  7.0 -5.0 {len(energies)} {efermi} 1.0",
+    ]
+    integrated = np.cumsum(densities, axis=1)
+    data = np.array([energies, *densities, *integrated]).T
+    rows = [" ".join(f"{x:.6E}" for x in row) for row in data]
+    # a projected density-of-states block, which is not read
+    rows += [header[5], "1.0 2.0 3.0"]
+    return "\n".join(header + rows) + "\n"
+
+
+class TestReadVasprunDOS(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "vasprun.xml")
+        with open(self.filename, "w") as f:
+            f.write(vasprun_string(efermi=0.1, vbm=0.2, cbm=1.9))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_read_vasprun_dos(self):
+        data = read_vasprun_dos(self.filename)
+        np.testing.assert_allclose(data.energies, energies)
+        np.testing.assert_allclose(data.densities, densities)
+        self.assertEqual(data.efermi, 0.1)
+        self.assertAlmostEqual(data.vbm, 0.2)
+        self.assertAlmostEqual(data.bandgap, 1.7)
+
+    def test_read_gzipped_vasprun_dos(self):
+        with open(self.filename, "rb") as f_in:
+            with gzip.open(self.filename + ".gz", "wb") as f_out:
+                f_out.write(f_in.read())
+        data = read_vasprun_dos(self.filename + ".gz")
+        np.testing.assert_allclose(data.densities, densities)
+        self.assertAlmostEqual(data.bandgap, 1.7)
+
+    def test_read_vasprun_dos_without_dos_raises(self):
+        with open(self.filename, "w") as f:
+            f.write("<modeling><calculation></calculation></modeling>")
+        with self.assertRaises(ValueError):
+            read_vasprun_dos(self.filename)
+
+    def test_read_vasprun_dos_without_efermi_raises(self):
+        with open(self.filename, "w") as f:
+            f.write(vasprun_string().replace('<i name="efermi">0.1</i>', ""))
+        with self.assertRaisesRegex(ValueError, "Fermi energy"):
+            read_vasprun_dos(self.filename)
+
+    def test_dos_from_vasprun(self):
+        dos = DOS.from_vasprun(self.filename, nelect=10)
+        self.assertTrue(dos.spin_polarised)
+        self.assertAlmostEqual(dos.bandgap, 1.7)
+        np.testing.assert_allclose(dos.edos, energies - 0.2, atol=1e-12)
+        dos = DOS.from_vasprun(self.filename, nelect=10, bandgap=1.5)
+        self.assertEqual(dos.bandgap, 1.5)
+
+    def test_dos_from_vasprun_falls_back_to_pymatgen(self):
+        with open(self.filename, "w") as f:
+            f.write("<modeling><calculation>")
+        with patch("py_sc_fermi.dos.DOS._from_pymatgen_vasprun") as mock_from_pymatgen:
+            DOS.from_vasprun(self.filename, nelect=10)
+            mock_from_pymatgen.assert_called_once_with(self.filename, 10, None)
+
+
+class TestReadDoscar(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "DOSCAR")
+        with open(self.filename, "w") as f:
+            f.write(doscar_string(efermi=0.1))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_read_doscar(self):
+        data = read_doscar(self.filename)
+        np.testing.assert_allclose(data.energies, energies)
+        np.testing.assert_allclose(data.densities, densities)
+        self.assertEqual(data.efermi, 0.1)
+
+    def test_dos_from_doscar(self):
+        dos = DOS.from_doscar(self.filename, nelect=10, bandgap=2.0)
+        self.assertTrue(dos.spin_polarised)
+        np.testing.assert_allclose(dos.edos, energies - 0.1, atol=1e-12)
+        dos = DOS.from_doscar(self.filename, nelect=10, bandgap=2.0, vbm=0.0)
+        np.testing.assert_allclose(dos.edos, energies)
+
+    def test_read_truncated_doscar_raises(self):
+        with open(self.filename, "w") as f:
+            f.write("\n".join(doscar_string().split("\n")[:20]))
+        with self.assertRaises(ValueError):
+            read_doscar(self.filename)
+
+
+class TestReadTotdos(unittest.TestCase):
+    def test_read_totdos(self):
+        data = np.loadtxt(test_dos_filename)
+        edos, dos = read_totdos(test_dos_filename)
+        np.testing.assert_array_equal(edos, data[:, 0])
+        np.testing.assert_array_equal(dos, np.abs(data[:, 1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
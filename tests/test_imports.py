@@ -0,0 +1,30 @@
+import unittest
+import subprocess
+import sys
+
+# modules needed to read a .yaml input and solve a DefectSystem
+core_modules = [
+    "py_sc_fermi.defect_system",
+    "py_sc_fermi.inputs",
+    "py_sc_fermi.batch",
+    "py_sc_fermi.cli.sc_fermi_solve",
+]
+
+
+class TestImports(unittest.TestCase):
+    def test_core_does_not_import_pymatgen_or_scipy(self):
+        code = (
+            f"import sys\n"
+            f"for module in {core_modules!r}:\n"
+            f"    __import__(module)\n"
+            f"print(sorted({{m.split('.')[0] for m in sys.modules}}"
+            f" & {{'pymatgen', 'scipy'}}))\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        self.assertEqual(output.stdout.strip(), "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
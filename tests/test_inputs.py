@@ -1,9 +1,11 @@
 import unittest
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 import numpy as np
 from py_sc_fermi.defect_species import DefectSpecies
 from py_sc_fermi.dos import DOS
 import os
+import tempfile
+import yaml
 
 from py_sc_fermi.inputs import (
     volume_from_structure,
@@ -61,6 +63,8 @@ class TestInputsSetInit(unittest.TestCase):
         self.assertEqual(input_set.temperature, temperature)
         self.assertEqual(input_set.convergence_tolerance, conv)
         self.assertEqual(input_set.n_trial_steps, n_trial)
+        self.assertEqual(input_set.solver, "brent")
+        self.assertEqual(input_set.log_space, False)
 
 
 class TestInputSet(unittest.TestCase):
@@ -72,6 +76,23 @@ class TestInputSet(unittest.TestCase):
         self.assertEqual(input_set.temperature, 300)
         self.assertEqual(len(input_set.defect_species), 3)
 
+    def test_from_yaml_with_chemical_potentials(self):
+        with open(test_defect_system_yaml_filename) as f:
+            input_dict = yaml.safe_load(f)
+        input_dict["chemical_potentials"] = {"Ga": -0.5}
+        charge_state = input_dict["defect_species"][0]["V_Ga"]["charge_states"][0]
+        charge_state["reference_energy"] = charge_state.pop("formation_energy")
+        charge_state["element_changes"] = {"Ga": -1}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "defect_system.yaml")
+            with open(filename, "w") as f:
+                yaml.dump(input_dict, f)
+            input_set = InputSet.from_yaml(filename)
+        v_ga = input_set.defect_species[0].charge_states[0]
+        self.assertAlmostEqual(v_ga.energy, 2.4451 - 0.5)
+        self.assertEqual(v_ga.reference_energy, 2.4451)
+        self.assertEqual(input_set.defect_species[0].charge_states[-2].energy, 2.3469)
+
     def test_from_yaml_no_dos_raises(self):
         with self.assertRaises(ValueError):
             InputSet.from_yaml(test_dos_exception_yaml_filename)
@@ -106,6 +127,26 @@ class TestInputSet(unittest.TestCase):
         self.assertEqual(input_set.temperature, 100)
         self.assertEqual(len(input_set.defect_species), 2)
 
+    def test_from_sc_fermi_inputs_reuses_cached_files(self):
+        cache = {}
+        first = InputSet.from_sc_fermi_inputs(
+            test_sc_fermi_input_filename,
+            test_unitcell_filename,
+            test_dos_filename,
+            cache=cache,
+        )
+        self.assertEqual(len(cache), 2)
+        with patch("py_sc_fermi.inputs.read_dos_data") as mock_read_dos_data:
+            second = InputSet.from_yaml(
+                test_defect_system_yaml_filename,
+                dos_file=test_dos_filename,
+                structure_file=test_unitcell_filename,
+                cache=cache,
+            )
+            mock_read_dos_data.assert_not_called()
+        self.assertIs(second.dos, first.dos)
+        self.assertEqual(second.volume, first.volume)
+
 
 class TestInputs(unittest.TestCase):
     def test_volume_from_structure(self):
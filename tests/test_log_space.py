@@ -0,0 +1,34 @@
+import unittest
+
+import numpy as np
+
+from py_sc_fermi.log_space import logsumexp, log_occupation, safe_log
+
+
+class TestLogSpace(unittest.TestCase):
+    def test_logsumexp(self):
+        a = np.array([[1.0, 2.0, 3.0], [-1.0, 0.0, -np.inf]])
+        np.testing.assert_allclose(logsumexp(a), np.log(np.exp(a).sum(axis=-1)))
+        np.testing.assert_allclose(
+            logsumexp(a, axis=0), np.log(np.exp(a).sum(axis=0))
+        )
+        self.assertAlmostEqual(logsumexp([-1000.0, -1000.0]), -1000.0 + np.log(2))
+        self.assertAlmostEqual(logsumexp([1000.0, 1000.0]), 1000.0 + np.log(2))
+
+    def test_logsumexp_of_nothing(self):
+        self.assertEqual(logsumexp([]), -np.inf)
+        self.assertEqual(logsumexp([-np.inf, -np.inf]), -np.inf)
+        np.testing.assert_equal(logsumexp(np.zeros((3, 0))), [-np.inf] * 3)
+
+    def test_log_occupation(self):
+        x = np.array([-2000.0, -1.0, 0.0, 1.0, 2000.0])
+        np.testing.assert_allclose(log_occupation(x[1:4]), -np.log1p(np.exp(x[1:4])))
+        self.assertEqual(log_occupation(-2000.0), 0.0)
+        self.assertEqual(log_occupation(2000.0), -2000.0)
+
+    def test_safe_log(self):
+        np.testing.assert_equal(safe_log(np.array([0.0, 1.0])), [-np.inf, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import unittest
+import numpy as np
+
+from py_sc_fermi.batch import solve_batch
+from py_sc_fermi.defect_system import DefectSystem
+from py_sc_fermi.dos import DOS
+from py_sc_fermi.parabolic_bands import (
+    ParabolicBandDOS,
+    electron_mass,
+    electron_charge,
+    hbar,
+    log_fermi_dirac_half,
+)
+from tests.model_systems import defect_species
+
+
+def parabolic_band_dos(bandgap, electron_effective_mass, hole_effective_mass, volume):
+    """a ``DOS`` of the parabolic bands of a ``ParabolicBandDOS`` on a fine
+    energy grid, to be integrated numerically"""
+    edos = np.linspace(-3.0, bandgap + 3.0, 60001)
+    # density of states per eV per unit cell of a band with unit mass
+    prefactor = (
+        volume
+        * 1e-30
+        / (2 * np.pi ** 2)
+        * (2 * electron_mass * electron_charge / hbar ** 2) ** 1.5
+    )
+    dos = prefactor * (
+        hole_effective_mass ** 1.5 * np.sqrt(np.clip(-edos, 0, None))
+        + electron_effective_mass ** 1.5 * np.sqrt(np.clip(edos - bandgap, 0, None))
+    )
+    nelect = np.trapz(dos[edos <= 0], edos[edos <= 0])
+    return DOS(dos=dos, edos=edos, bandgap=bandgap, nelect=nelect)
+
+
+class TestFermiDiracHalf(unittest.TestCase):
+    def test_log_fermi_dirac_half(self):
+        # F_1/2(0) = (1 - 1 / sqrt(2)) zeta(3/2)
+        self.assertAlmostEqual(
+            np.exp(log_fermi_dirac_half(0.0)), 0.765147, delta=0.004 * 0.765147
+        )
+        # non-degenerate and degenerate limits
+        self.assertAlmostEqual(log_fermi_dirac_half(-1e4), -1e4)
+        self.assertAlmostEqual(
+            np.exp(log_fermi_dirac_half(1e3)),
+            4 / (3 * np.sqrt(np.pi)) * 1e3 ** 1.5,
+            delta=1e-3 * 1e3 ** 1.5,
+        )
+
+
+class TestParabolicBandDOS(unittest.TestCase):
+    def setUp(self):
+        self.bands = ParabolicBandDOS(
+            bandgap=1.1,
+            electron_effective_mass=1.08,
+            hole_effective_mass=0.81,
+            volume=160.0,
+        )
+
+    def test_effective_densities_of_states(self):
+        nv, nc = self.bands.effective_densities_of_states(300.0)
+        # the effective densities of states of silicon, per cm^3
+        self.assertAlmostEqual(nc * 1e24 / 160.0 / 2.8e19, 1.0, delta=0.01)
+        self.assertAlmostEqual(nv * 1e24 / 160.0 / 1.83e19, 1.0, delta=0.01)
+
+    def test_emin_emax(self):
+        self.assertEqual(self.bands.emin(), -2.0)
+        self.assertEqual(self.bands.emax(), 3.1)
+
+    def test_carrier_concentrations_match_dos(self):
+        dos = parabolic_band_dos(1.1, 1.08, 0.81, 160.0)
+        e_fermi = np.linspace(-0.2, 1.3, 31)
+        for temperature in [300.0, 1000.0]:
+            p0, n0 = self.bands.carrier_concentrations(e_fermi, temperature)
+            expected_p0, expected_n0 = dos.carrier_concentrations_array(
+                e_fermi, temperature
+            )
+            np.testing.assert_allclose(p0, expected_p0, rtol=5e-3)
+            np.testing.assert_allclose(n0, expected_n0, rtol=5e-3)
+
+    def test_log_carrier_concentrations(self):
+        log_p0, log_n0 = self.bands.log_carrier_concentrations(-50.0, 10.0)
+        self.assertTrue(np.isfinite(log_p0))
+        self.assertTrue(np.isfinite(log_n0))
+        p0, n0 = self.bands.carrier_concentrations(0.3, 300.0)
+        np.testing.assert_allclose(
+            self.bands.log_carrier_concentrations(0.3, 300.0), np.log([p0, n0])
+        )
+
+    def test_derivatives(self):
+        h = 1e-6
+        for e_fermi in [-0.3, 0.2, 0.55, 1.3]:
+            p_plus, n_plus = self.bands.carrier_concentrations(e_fermi + h, 500.0)
+            p_minus, n_minus = self.bands.carrier_concentrations(e_fermi - h, 500.0)
+            dp0, dn0 = self.bands.carrier_derivatives(e_fermi, 500.0)
+            self.assertAlmostEqual(dp0 / ((p_plus - p_minus) / (2 * h)), 1.0, places=5)
+            self.assertAlmostEqual(dn0 / ((n_plus - n_minus) / (2 * h)), 1.0, places=5)
+
+    def test_dict_round_trip(self):
+        bands = ParabolicBandDOS.from_dict(self.bands.as_dict())
+        self.assertEqual(bands.as_dict(), self.bands.as_dict())
+
+    def test_negative_effective_mass_raises(self):
+        with self.assertRaises(ValueError):
+            ParabolicBandDOS(1.0, -1.0, 1.0, 100.0)
+
+
+class TestDefectSystemWithParabolicBands(unittest.TestCase):
+    def setUp(self):
+        self.bands = ParabolicBandDOS(1.5, 0.3, 0.8, 50.0)
+        self.kwargs = dict(defect_species=defect_species(), volume=50.0)
+
+    def test_solve_matches_dos(self):
+        dos = parabolic_band_dos(1.5, 0.3, 0.8, 50.0)
+        for solver, log_space in [("brent", False), ("newton", False), ("itp", True)]:
+            solution = DefectSystem(
+                dos=self.bands,
+                temperature=800.0,
+                solver=solver,
+                log_space=log_space,
+                **self.kwargs,
+            ).solve()
+            expected = DefectSystem(dos=dos, temperature=800.0, **self.kwargs).solve()
+            self.assertAlmostEqual(
+                solution.fermi_energy, expected.fermi_energy, places=3
+            )
+
+    def test_solve_batch(self):
+        defect_system = DefectSystem(dos=self.bands, temperature=800.0, **self.kwargs)
+        overrides = [{"temperature": t} for t in [600.0, 800.0, 1000.0]]
+        solutions = solve_batch(defect_system, overrides, processes=2)
+        self.assertAlmostEqual(
+            solutions[1].fermi_energy, defect_system.solve().fermi_energy
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import csv
+import os
+import tempfile
+
+from py_sc_fermi.cli.sc_fermi_solve import expand_input_files, main
+
+test_data_dir = os.path.join(os.path.dirname(__file__), "dummy_inputs")
+test_sc_fermi_input_filename = os.path.join(test_data_dir, "input_fermi.dat")
+test_unitcell_filename = os.path.join(test_data_dir, "unitcell.dat")
+test_dos_filename = os.path.join(test_data_dir, "totdos.dat")
+
+
+class TestExpandInputFiles(unittest.TestCase):
+    def test_expand_input_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name in ["b.yaml", "a.yaml", "c.dat"]:
+                open(os.path.join(tmpdir, name), "w").close()
+            manifest = os.path.join(tmpdir, "manifest.txt")
+            with open(manifest, "w") as f:
+                f.write("# inputs\n\nc.dat\n")
+            input_files = expand_input_files(
+                [os.path.join(tmpdir, "*.yaml")], manifest=manifest
+            )
+            self.assertEqual(
+                input_files,
+                [os.path.join(tmpdir, name) for name in ["a.yaml", "b.yaml", "c.dat"]],
+            )
+            with self.assertRaises(ValueError):
+                expand_input_files([os.path.join(tmpdir, "*.xml")])
+
+
+class TestMain(unittest.TestCase):
+    def test_main_with_several_inputs(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = os.path.join(tmpdir, "out.csv")
+            main(
+                [
+                    test_sc_fermi_input_filename,
+                    test_sc_fermi_input_filename,
+                    "-s",
+                    test_unitcell_filename,
+                    "-d",
+                    test_dos_filename,
+                    "-o",
+                    output,
+                ]
+            )
+            with open(output, "r") as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(
+            list(rows[0].keys()),
+            ["input", "temperature", "Fermi Energy", "p0", "n0", "V_Ga", "Ga_Sb"],
+        )
+        self.assertEqual(rows[0], rows[1])
+        self.assertEqual(rows[0]["temperature"], "100")
+
+
+if __name__ == "__main__":
+    unittest.main()
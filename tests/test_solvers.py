@@ -0,0 +1,139 @@
+import unittest
+
+import numpy as np
+
+from py_sc_fermi.solvers import (
+    RootResult,
+    bisection,
+    brent,
+    itp,
+    newton,
+    get_solver,
+    vectorised_bisection,
+    vectorised_illinois,
+    SOLVERS,
+)
+
+
+def steep(x):
+    # monotonic and strongly nonlinear, like the net charge of a DefectSystem
+    return np.exp((x - 0.3) / 0.025) - np.exp(-(x - 0.3) / 0.025)
+
+
+def steep_prime(x):
+    return (np.exp((x - 0.3) / 0.025) + np.exp(-(x - 0.3) / 0.025)) / 0.025
+
+
+def solve(solver, func, a, b, **kwargs):
+    if solver is newton:
+        kwargs["fprime"] = steep_prime
+    return solver(func, a, b, **kwargs)
+
+
+class TestSolvers(unittest.TestCase):
+    def test_solvers_find_root(self):
+        for solver in SOLVERS.values():
+            result = solve(solver, steep, -1.0, 2.0, ftol=1e-12, maxiter=500)
+            self.assertIsInstance(result, RootResult)
+            self.assertTrue(result.converged)
+            self.assertAlmostEqual(result.root, 0.3, places=12)
+            self.assertLess(result.residual, 1e-12)
+
+    def test_brent_beats_bisection(self):
+        n_bisection = bisection(steep, -1.0, 2.0, ftol=1e-12, maxiter=500).iterations
+        n_brent = brent(steep, -1.0, 2.0, ftol=1e-12, maxiter=500).iterations
+        self.assertLess(n_brent, n_bisection)
+
+    def test_itp_worst_case_matches_bisection(self):
+        # ITP never needs more than n0 = 1 step beyond bisection to reach xtol
+        n_bisection = bisection(steep, -1.0, 2.0, ftol=0.0, maxiter=500).iterations
+        n_itp = itp(steep, -1.0, 2.0, ftol=0.0, maxiter=500).iterations
+        self.assertLessEqual(n_itp, n_bisection + 1)
+
+    def test_newton_beats_brent(self):
+        n_brent = brent(steep, -1.0, 2.0, ftol=1e-12, maxiter=500).iterations
+        n_newton = solve(newton, steep, -1.0, 2.0, ftol=1e-12, maxiter=500).iterations
+        self.assertLess(n_newton, n_brent)
+
+    def test_newton_with_zero_derivative_bisects(self):
+        result = newton(
+            steep, -1.0, 2.0, ftol=1e-12, maxiter=500, fprime=lambda x: 0.0
+        )
+        self.assertAlmostEqual(result.root, 0.3, places=12)
+
+    def test_initial_guess_is_evaluated_first(self):
+        result = brent(steep, -1.0, 2.0, ftol=1e-12, maxiter=500, x0=0.3)
+        self.assertEqual(result.iterations, 1)
+        self.assertEqual(result.root, 0.3)
+
+    def test_reversed_bracket(self):
+        for solver in SOLVERS.values():
+            result = solve(solver, steep, 2.0, -1.0, ftol=1e-12, maxiter=500)
+            self.assertAlmostEqual(result.root, 0.3, places=12)
+
+    def test_unreachable_tolerance_stops_at_machine_precision(self):
+        for solver in [bisection, brent, itp]:
+            result = solver(lambda x: x - 0.1, -1.0, 2.0, ftol=0.0, maxiter=500)
+            self.assertFalse(result.converged)
+            self.assertLess(result.iterations, 500)
+            self.assertAlmostEqual(result.root, 0.1, places=14)
+        # Newton lands on the root of a linear function exactly, but with
+        # ftol = 0 even a zero residual is not reported as converged; the
+        # search stops once the bracket collapses onto the root
+        result = newton(
+            lambda x: x - 0.1, -1.0, 2.0, ftol=0.0, maxiter=500, fprime=lambda x: 1.0
+        )
+        self.assertFalse(result.converged)
+        self.assertEqual(result.root, 0.1)
+        self.assertEqual(result.residual, 0.0)
+        self.assertEqual(result.iterations, 4)
+
+    def test_maxiter(self):
+        result = bisection(steep, -1.0, 2.0, ftol=0.0, maxiter=10)
+        self.assertEqual(result.iterations, 10)
+        self.assertFalse(result.converged)
+
+    def test_no_sign_change_raises(self):
+        for solver in SOLVERS.values():
+            with self.assertRaises(RuntimeError):
+                solve(solver, lambda x: x + 10.0, -1.0, 2.0, ftol=1e-12, maxiter=500)
+
+    def test_get_solver(self):
+        self.assertIs(get_solver("brent"), brent)
+        with self.assertRaises(ValueError):
+            get_solver("newton-raphson-but-misspelled")
+
+
+class TestVectorisedSolvers(unittest.TestCase):
+    def setUp(self):
+        self.roots = np.linspace(-0.4, 0.9, 7)
+        self.func = lambda x: np.tanh(3.0 * (x - self.roots)) + 0.1 * (x - self.roots)
+
+    def test_illinois_finds_roots(self):
+        roots, residuals, nfev = vectorised_illinois(
+            self.func, np.full(7, -1.0), np.full(7, 2.0), ftol=1e-12, maxiter=100
+        )
+        np.testing.assert_allclose(roots, self.roots, atol=1e-10)
+        self.assertTrue(np.all(residuals < 1e-12))
+        _, _, bisection_nfev = vectorised_bisection(
+            self.func, np.full(7, -1.0), np.full(7, 2.0), ftol=1e-12, maxiter=100
+        )
+        self.assertLess(nfev, bisection_nfev)
+
+    def test_illinois_with_infinite_values_bisects(self):
+        roots, _, _ = vectorised_illinois(
+            lambda x: np.where(np.abs(x) > 0.5, np.sign(x) * np.inf, x - 0.1),
+            -1.0,
+            [1.0, 2.0],
+            ftol=1e-14,
+            maxiter=200,
+        )
+        np.testing.assert_allclose(roots, 0.1, atol=1e-14)
+
+    def test_illinois_no_sign_change_raises(self):
+        with self.assertRaises(RuntimeError):
+            vectorised_illinois(self.func, np.full(7, 1.0), 2.0, 1e-12, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()